@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ERROR_SUPPRESSION_WINDOW = int(os.getenv('ERROR_SUPPRESSION_WINDOW', 3600))
+ERROR_FINGERPRINTS = int(os.getenv('ERROR_FINGERPRINTS', 32))
+
+ERROR_REPEATS_MESSAGE = (
+    'Сбой в работе программы повторился {repeats} раз с {since}: {error}')
+SINCE_FORMAT = '%d.%m.%Y %H:%M'
+
+# Изменчивые части текста ошибки: адреса, словари параметров и заголовков,
+# строки в кавычках, адреса объектов и числа.
+VARIABLE_PARTS = (
+    (re.compile(r'\w+://\S+'), '<url>'),
+    (re.compile(r'\{[^{}]*\}'), '<dict>'),
+    (re.compile(r'\'[^\']*\'|"[^"]*"'), '<str>'),
+    (re.compile(r'0x[0-9a-fA-F]+'), '<addr>'),
+    (re.compile(r'\d+(?:\.\d+)?'), '<num>'),
+)
+
+
+def error_fingerprint(error: Exception) -> str:
+    """Отпечаток ошибки: тип и шаблон текста без изменчивых деталей.
+
+    Ошибки, которые различаются только временем, параметрами запроса или
+    адресом, получают одинаковый отпечаток.
+    """
+    text = str(error)
+    for pattern, placeholder in VARIABLE_PARTS:
+        text = pattern.sub(placeholder, text)
+    return f'{type(error).__name__}: {text}'
+
+
+class FailureNotifier:
+    """Решает, о каких сбоях сообщать в Telegram.
+
+    О новой ошибке сообщается сразу текстом template. Повторы ошибки с тем
+    же отпечатком подавляются в течение window секунд, после чего приходит
+    одна сводка "повторился N раз с ...". Так на каждый вид ошибки уходит
+    не больше одного сообщения за окно, сколько бы ни длился сбой.
+    Помнятся последние limit отпечатков; dump и restore переносят их через
+    перезапуск, чтобы тот не сбрасывал подавление.
+    """
+
+    __slots__ = ('template', 'window', 'limit', 'clock', '_seen')
+
+    def __init__(self, template: str,
+                 window: float = ERROR_SUPPRESSION_WINDOW,
+                 limit: int = ERROR_FINGERPRINTS, clock=time.time) -> None:
+        self.template = template
+        self.window = window
+        self.limit = limit
+        self.clock = clock
+        # отпечаток -> [время последнего сообщения, число повторов после него]
+        self._seen = {}
+
+    def check(self, error: Exception):
+        """Сообщение о сбое или None, если его нужно подавить.
+
+        Сообщение считается отправленным только после вызова delivered.
+        """
+        seen = self._seen.get(error_fingerprint(error))
+        if seen is None:
+            return self.template.format(error=error)
+        seen[1] += 1
+        if self.clock() - seen[0] < self.window:
+            return None
+        return ERROR_REPEATS_MESSAGE.format(
+            repeats=seen[1], error=error,
+            since=datetime.fromtimestamp(seen[0]).strftime(SINCE_FORMAT))
+
+    def delivered(self, error: Exception) -> None:
+        """Отмечает, что сообщение о сбое доставлено."""
+        fingerprint = error_fingerprint(error)
+        self._seen.pop(fingerprint, None)
+        self._seen[fingerprint] = [self.clock(), 0]
+        while len(self._seen) > self.limit:
+            del self._seen[next(iter(self._seen))]
+
+    def dump(self) -> str:
+        """Отпечатки с временем сообщения и числом повторов в JSON."""
+        return json.dumps(self._seen, ensure_ascii=False) if self._seen else ''
+
+    def restore(self, dump: str) -> None:
+        """Восстанавливает отпечатки, сохранённые dump.
+
+        Пустую или повреждённую строку считает отсутствием отпечатков.
+        """
+        try:
+            seen = json.loads(dump) if dump else {}
+        except ValueError:
+            return
+        if isinstance(seen, dict):
+            self._seen = {
+                fingerprint: list(value)
+                for fingerprint, value in list(seen.items())[-self.limit:]}
@@ -0,0 +1,209 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from breaker import CircuitBreaker
+from deadline import CYCLE_DEADLINE, Deadline, DeadlineExceeded
+from engine import (ENGINE_WORKERS, CycleStats, advance_cursor,
+                    failure_delivered, failure_message, persist_tenants,
+                    request_options, restore_tenants, status_updates)
+from fanout import FanOut
+from health import HEALTH, WATCHDOG_INTERVAL
+from metrics import CYCLE_SECONDS
+from profiling import PROFILER
+from scheduler import PollPolicy
+from singleflight import SingleFlight
+from storage import StateStorage
+from tenants import TenantRegistry, load_tenants
+from transport import PooledTransport
+
+# Сообщения асинхронного движка
+ASYNC_ENGINE_START_MESSAGE = (
+    'Асинхронный движок запущен: подписчиков %d, '
+    'потоков для блокирующих вызовов %d')
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPollingEngine:
+    """Опрашивает подписчиков корутинами в одном цикле событий.
+
+    Блокирующие вызовы requests и telegram.Bot выполняются в пуле потоков
+    через run_in_executor, поэтому цикл событий никогда не ждёт сеть.
+    Проверка ответа и разбор статуса - те же функции, что и в main().
+    """
+
+    def __init__(self, bot: telegram.Bot, registry: TenantRegistry,
+                 workers: int = ENGINE_WORKERS,
+                 transport: PooledTransport = None,
+                 storage: StateStorage = None,
+                 policy: PollPolicy = None,
+                 breaker: CircuitBreaker = None,
+                 cycle_deadline: float = CYCLE_DEADLINE,
+                 flight: SingleFlight = None,
+                 fanout: FanOut = None) -> None:
+        self.bot = bot
+        self.flight = flight or SingleFlight('engine')
+        self.fanout = fanout or FanOut()
+        self.breaker = breaker or CircuitBreaker()
+        self.cycle_deadline = cycle_deadline
+        self.policy = policy or PollPolicy()
+        self.registry = registry
+        self.workers = workers
+        self.transport = transport or PooledTransport(pool_maxsize=workers)
+        self.storage = storage or StateStorage()
+        # подписчик -> время начала текущего прохода по часам HEALTH
+        self.in_flight = {}
+        restore_tenants(self.storage, registry)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='async-io')
+
+    async def _blocking(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs))
+
+    async def fetch(self, tenant, deadline: Deadline = None) -> dict:
+        """Запрашивает ответ API для подписчика.
+
+        Запросы с общим токеном и курсором склеиваются, как в PollingEngine.
+        """
+        return await self._blocking(
+            self.flight.do, (tenant.token, tenant.timestamp),
+            homework.request_api_answer, tenant.timestamp, tenant.headers,
+            deadline=deadline,
+            **request_options(self.transport, self.breaker, deadline))
+
+    async def notify(self, tenant, message: str,
+                     deadline: Deadline = None) -> bool:
+        """Отправляет сообщение во все чаты подписчика параллельно."""
+        result = await self._blocking(
+            self.fanout.deliver, tenant.chat_ids, message,
+            lambda chat_id: homework.send_message_to(
+                self.bot, chat_id, message, deadline),
+            key=(tenant.name, message))
+        return result.delivered
+
+    async def poll_tenant(self, tenant, deadline: Deadline = None) -> tuple:
+        """Выполняет один шаг опроса подписчика.
+
+        Возвращает пару (число отправленных сообщений, была ли ошибка).
+        После истечения срока deadline шаг прерывается без ошибки.
+        """
+        sent = 0
+        try:
+            response = await self.fetch(tenant, deadline)
+            updates = status_updates(tenant, response)
+            for work, message in updates:
+                if await self.notify(tenant, message, deadline):
+                    tenant.homeworks.commit(work)
+                    sent += 1
+            if sent == len(updates):
+                advance_cursor(tenant, response)
+            tenant.failures = 0
+            return sent, False
+        except DeadlineExceeded:
+            return sent, False
+        except Exception as error:
+            await self.fail(tenant, error, deadline)
+            return 0, True
+
+    async def fail(self, tenant, error: Exception,
+                   deadline: Deadline = None) -> None:
+        """Учитывает сбой опроса и сообщает о нём в пределах срока."""
+        tenant.failures += 1
+        message = failure_message(tenant, error)
+        try:
+            if message is not None and await self.notify(
+                    tenant, message, deadline):
+                failure_delivered(tenant, error)
+        except DeadlineExceeded:
+            pass
+
+    async def run_cycle(self) -> CycleStats:
+        """Опрашивает всех подписчиков один раз и возвращает итоги."""
+        started = time.monotonic()
+        deadline = Deadline(self.cycle_deadline)
+        results = await asyncio.gather(
+            *(self.poll_tenant(tenant, deadline) for tenant in self.registry))
+        await self._blocking(persist_tenants, self.storage, self.registry)
+        duration = time.monotonic() - started
+        CYCLE_SECONDS.observe(duration)
+        deadline.finish()
+        return CycleStats(
+            tenants=len(results),
+            sent=sum(sent for sent, _ in results),
+            errors=sum(error for _, error in results),
+            duration=duration,
+        )
+
+    async def run_tenant(self, tenant) -> None:
+        """Бесконечно опрашивает одного подписчика по его расписанию.
+
+        Начало прохода запоминается в in_flight до его конца; в HEALTH
+        проходы отмечает heartbeat.
+        """
+        while True:
+            self.in_flight[tenant.name] = HEALTH.clock()
+            try:
+                await self.poll_tenant(tenant, Deadline(self.cycle_deadline))
+                await self._blocking(
+                    self.storage.remember, tenant.name, tenant.timestamp,
+                    tenant.alerts, tenant.homeworks)
+            finally:
+                del self.in_flight[tenant.name]
+            await asyncio.sleep(self.policy.next_interval(tenant))
+
+    async def heartbeat(self, interval: float = WATCHDOG_INTERVAL) -> None:
+        """Отмечает ход опроса в HEALTH от имени всего цикла событий.
+
+        Корутины подписчиков идут вперемешку, и отметки каждой из них
+        затирали бы друг друга. Поэтому раз в interval секунд отмечается
+        самый старый незаконченный проход, а если таких нет - ожидание
+        следующей отметки. Так /health и сторож видят и зависший опрос
+        подписчика, и вставший цикл событий. Для PROFILER циклом считается
+        промежуток между отметками: профилируется весь поток цикла событий.
+        """
+        while True:
+            PROFILER.cycle_finished()
+            oldest = min(self.in_flight.values(), default=None)
+            if oldest is None:
+                HEALTH.cycle_finished(interval)
+            else:
+                HEALTH.cycle_started(oldest)
+            PROFILER.cycle_started()
+            await asyncio.sleep(interval)
+
+    async def run(self) -> None:
+        """Запускает heartbeat и по корутине-опросчику на подписчика."""
+        logger.info(
+            ASYNC_ENGINE_START_MESSAGE, len(self.registry), self.workers)
+        await asyncio.gather(
+            self.heartbeat(),
+            *(self.run_tenant(tenant) for tenant in self.registry))
+
+    def close(self) -> None:
+        """Останавливает пул потоков, закрывает соединения и хранилище."""
+        self.executor.shutdown(wait=True)
+        self.fanout.close()
+        self.transport.close()
+        self.storage.close()
+
+
+def run_async_engine(tenants_file: str) -> None:
+    """Запускает асинхронный опрос подписчиков из файла реестра."""
+    registry = load_tenants(tenants_file, timestamp=int(time.time()))
+    bot = telegram.Bot(
+        token=homework.TELEGRAM_TOKEN,
+        request=Request(con_pool_size=ENGINE_WORKERS))
+    engine = AsyncPollingEngine(bot, registry)
+    try:
+        asyncio.run(engine.run())
+    finally:
+        engine.close()
@@ -0,0 +1,41 @@
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from records import encode_date
+
+load_dotenv()
+
+BACKFILL_WINDOW = int(os.getenv('BACKFILL_WINDOW', 24 * 60 * 60))
+
+# Сообщения догоняющего опроса
+BACKFILL_MESSAGE = 'Пропущенные изменения с %d: работ %d, %.3f с'
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_backfill(fetch, since: int, until: int,
+                   window: int = BACKFILL_WINDOW):
+    """Запрашивает изменения, пропущенные с момента since.
+
+    fetch(from_date) возвращает пару (список работ, current_date). У API
+    есть только нижняя граница from_date, поэтому ответ на запрос с since
+    уже содержит все изменения до текущего момента: делить промежуток на
+    окна бессмысленно, ответы поздних окон повторяли бы часть первого.
+    Запрос один, работы сортируются по дате обновления. Возвращает пару
+    (работы, current_date) или None, если промежуток до until короче
+    window и его покроет обычный опрос. Ошибка запроса бросается наружу:
+    курсор тогда не сдвигается, и следующий опрос начнёт с него же.
+    """
+    if until - since < window:
+        return None
+    started = time.monotonic()
+    homeworks, current_date = fetch(since)
+    homeworks = sorted(
+        homeworks,
+        key=lambda homework: encode_date(homework.get('date_updated')))
+    logger.info(
+        BACKFILL_MESSAGE, since, len(homeworks), time.monotonic() - started)
+    return homeworks, current_date
@@ -0,0 +1,87 @@
+import argparse
+import json
+import time
+import tracemalloc
+
+import streaming
+
+
+def make_payload(homeworks: int) -> bytes:
+    """Ответ API с длинной историей работ."""
+    return json.dumps({
+        'homeworks': [
+            {
+                'id': index,
+                'homework_name': f'student__hw{index}.zip',
+                'status': 'approved',
+                'reviewer_comment': 'Хорошая работа, есть замечания. ' * 8,
+                'date_updated': '2023-01-01T00:00:00Z',
+                'lesson_name': f'Спринт {index % 20}',
+            }
+            for index in range(homeworks)
+        ],
+        'current_date': 1700000000,
+    }, ensure_ascii=False).encode()
+
+
+def iter_chunks(payload: bytes, size: int = streaming.CHUNK_SIZE):
+    """Отдаёт тело ответа кусками, как response.iter_content."""
+    for index in range(0, len(payload), size):
+        yield payload[index:index + size]
+
+
+def json_path(payload: bytes):
+    """Текущий путь: response.json() строит всё дерево объектов."""
+    return json.loads(payload)
+
+
+def streaming_path(payload: bytes):
+    """Потоковый разбор с отбором полей."""
+    return streaming.decode_answer(iter_chunks(payload))
+
+
+def measure(function, payload: bytes) -> dict:
+    """Время и пиковая дополнительная память одного разбора."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(payload)
+    duration = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(result['homeworks'])
+    return {'seconds': duration, 'peak_bytes': peak}
+
+
+def run(homeworks: int = 10000, repeat: int = 3) -> dict:
+    """Сравнивает пути разбора и возвращает лучшие результаты."""
+    payload = make_payload(homeworks)
+    result = {'homeworks': homeworks, 'payload_bytes': len(payload)}
+    for name, function in (('json', json_path),
+                           ('streaming', streaming_path)):
+        runs = [measure(function, payload) for _ in range(repeat)]
+        result[name] = {
+            'seconds': min(run['seconds'] for run in runs),
+            'peak_bytes': min(run['peak_bytes'] for run in runs),
+        }
+    result['peak_memory_ratio'] = (
+        result['streaming']['peak_bytes'] / result['json']['peak_bytes'])
+    return result
+
+
+def main(argv: list = None) -> dict:
+    """Запускает сравнение и сохраняет результат в JSON."""
+    parser = argparse.ArgumentParser(
+        description='Сравнение response.json() и потокового разбора')
+    parser.add_argument('--homeworks', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_decode.json')
+    args = parser.parse_args(argv)
+    result = run(args.homeworks, args.repeat)
+    with open(args.output, 'w', encoding='UTF-8') as file:
+        json.dump(result, file, indent=2)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
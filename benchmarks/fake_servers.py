@@ -0,0 +1,179 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+class FakeServer:
+    """HTTP-сервер в фоновом потоке с настраиваемой задержкой и ошибками."""
+
+    handler_class = None
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        handler = type('Handler', (self.handler_class,), {'fake': self})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Базовый адрес сервера."""
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeServer':
+        """Запускает сервер."""
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def should_fail(self) -> bool:
+        """Выполняет задержку и решает, ответить ли ошибкой."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            failed = self.rng.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    """Обработчик с keep-alive и JSON-ответами."""
+
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def reply(self, status: int, data: dict) -> None:
+        """Отправляет JSON-ответ."""
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Отключает журнал запросов http.server."""
+
+
+class PracticumHandler(JSONHandler):
+    """Отвечает на запросы статусов домашних работ."""
+
+    def do_GET(self):
+        """Возвращает статусы работ токена из заголовка Authorization."""
+        if self.fake.should_fail():
+            return self.reply(500, {})
+        token = self.headers.get('Authorization', '').split()[-1]
+        query = parse_qs(urlparse(self.path).query)
+        from_date = int(query.get('from_date', ['0'])[0])
+        self.reply(200, self.fake.answer(token, from_date))
+
+
+class FakePracticum(FakeServer):
+    """Заглушка API Практикума.
+
+    У каждого токена одна отслеживаемая работа с именем, равным токену;
+    её статус меняется при вызове advance(). Остальные payload_size - 1
+    работ неизменны и лишь увеличивают размер ответа.
+    """
+
+    handler_class = PracticumHandler
+
+    def __init__(self, payload_size: int = 1, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.payload_size = payload_size
+        self.epoch = 0
+        self.changed_at = {}
+
+    def advance(self) -> None:
+        """Меняет статус отслеживаемой работы у всех токенов."""
+        with self.lock:
+            self.epoch += 1
+            self.changed_at[self.epoch] = time.monotonic()
+
+    def answer(self, token: str, from_date: int) -> dict:
+        """Формирует ответ API для токена."""
+        epoch = self.epoch
+        homeworks = [{
+            'id': 0,
+            'homework_name': f'{token}#{epoch}',
+            'status': STATUSES[epoch % len(STATUSES)],
+            'date_updated': str(epoch),
+        }]
+        homeworks.extend(
+            {
+                'id': index,
+                'homework_name': f'static {index}',
+                'status': 'approved',
+                'lesson_name': 'x' * 64,
+                'reviewer_comment': 'y' * 128,
+                'date_updated': '0',
+            }
+            for index in range(1, self.payload_size)
+        )
+        return {'homeworks': homeworks, 'current_date': from_date}
+
+
+class TelegramHandler(JSONHandler):
+    """Принимает вызовы sendMessage."""
+
+    def do_POST(self):
+        """Запоминает сообщение или отвечает ошибкой 429."""
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.fake.should_fail():
+            return self.reply(429, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            })
+        self.fake.record(payload)
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': 1,
+            'date': int(time.time()),
+            'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }})
+
+
+class FakeTelegram(FakeServer):
+    """Заглушка Telegram Bot API, запоминающая время получения сообщений."""
+
+    handler_class = TelegramHandler
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.messages = []
+
+    @property
+    def base_url(self) -> str:
+        """Значение base_url для telegram.Bot."""
+        return self.url + '/bot'
+
+    def record(self, payload: dict) -> None:
+        """Запоминает сообщение и время его получения."""
+        with self.lock:
+            self.messages.append((time.monotonic(), payload.get('text', '')))
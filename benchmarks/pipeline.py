@@ -0,0 +1,154 @@
+import argparse
+import json
+import re
+import resource
+import sys
+import time
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from benchmarks.fake_servers import FakePracticum, FakeTelegram
+from engine import PollingEngine
+from outbox import TelegramOutbox
+from staged_engine import StagedPollingEngine
+from storage import StateStorage
+from tenants import Tenant, TenantRegistry
+
+EPOCH_PATTERN = re.compile(r'#(\d+)"')
+
+
+def percentile(values: list, share: float) -> float:
+    """Перцентиль share (от 0 до 1) по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+def notification_latencies(practicum: FakePracticum,
+                           telegram_server: FakeTelegram) -> list:
+    """Время от смены статуса в API до получения сообщения в Telegram."""
+    latencies = []
+    for received_at, text in telegram_server.messages:
+        match = EPOCH_PATTERN.search(text)
+        if match:
+            changed_at = practicum.changed_at[int(match.group(1))]
+            latencies.append(received_at - changed_at)
+    return latencies
+
+
+def max_rss_kb() -> int:
+    """Пиковый размер резидентной памяти процесса в килобайтах."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run(tenants: int = 100, cycles: int = 5, workers: int = 32,
+        api_latency: float = 0.0, api_error_rate: float = 0.0,
+        telegram_latency: float = 0.0, telegram_error_rate: float = 0.0,
+        payload_size: int = 1, chat_rate: float = 1000.0,
+        global_rate: float = 100000.0, engine: str = 'threads') -> dict:
+    """Прогоняет конвейер опроса против заглушек и возвращает метрики."""
+    practicum = FakePracticum(
+        payload_size=payload_size, latency=api_latency,
+        error_rate=api_error_rate, seed=1)
+    telegram_server = FakeTelegram(
+        latency=telegram_latency, error_rate=telegram_error_rate, seed=2)
+    with practicum, telegram_server:
+        endpoint = homework.ENDPOINT
+        homework.ENDPOINT = practicum.url + '/api/user_api/homework_statuses/'
+        bot = telegram.Bot(
+            token='1234:benchmark', base_url=telegram_server.base_url,
+            request=Request(con_pool_size=workers))
+        outbox = TelegramOutbox(
+            bot, workers=workers, global_rate=global_rate,
+            chat_rate=chat_rate, chat_burst=cycles).start()
+        registry = TenantRegistry(
+            Tenant(f'tenant{index}', f'token{index}', str(index))
+            for index in range(tenants))
+        if engine == 'staged':
+            engine = StagedPollingEngine(
+                bot, registry, fetch_workers=workers, outbox=outbox,
+                storage=StateStorage(':memory:'))
+        else:
+            engine = PollingEngine(
+                bot, registry, workers=workers, outbox=outbox,
+                storage=StateStorage(':memory:'))
+        started = time.monotonic()
+        try:
+            for _ in range(cycles):
+                practicum.advance()
+                engine.run_cycle()
+            outbox.join(timeout=60)
+        finally:
+            duration = time.monotonic() - started
+            transport = engine.transport.stats()
+            engine.close()
+            outbox.close(timeout=5)
+            homework.ENDPOINT = endpoint
+        latencies = notification_latencies(practicum, telegram_server)
+        return {
+            'config': {
+                'tenants': tenants, 'cycles': cycles, 'workers': workers,
+                'api_latency': api_latency, 'api_error_rate': api_error_rate,
+                'telegram_latency': telegram_latency,
+                'telegram_error_rate': telegram_error_rate,
+                'payload_size': payload_size,
+                'engine': type(engine).__name__,
+            },
+            'duration': duration,
+            'cycles_per_sec': cycles / duration,
+            'polls_per_sec': tenants * cycles / duration,
+            'api_requests': practicum.requests,
+            'api_errors': practicum.errors,
+            'messages_delivered': len(telegram_server.messages),
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p99': percentile(latencies, 0.99),
+            'max_rss_kb': max_rss_kb(),
+            'transport': transport,
+        }
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """Относительное изменение ключевых метрик против прошлого прогона."""
+    keys = ('cycles_per_sec', 'latency_p50', 'latency_p99', 'max_rss_kb')
+    return {
+        key: (result[key] - baseline[key]) / baseline[key]
+        for key in keys if baseline.get(key)
+    }
+
+
+def main(argv: list = None) -> dict:
+    """Разбирает аргументы, запускает бенчмарк и сохраняет JSON."""
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк конвейера опроса на локальных заглушках')
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--api-latency', type=float, default=0.0)
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-latency', type=float, default=0.0)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--payload-size', type=int, default=1)
+    parser.add_argument(
+        '--engine', choices=('threads', 'staged'), default='threads')
+    parser.add_argument('--output', default='bench_pipeline.json')
+    parser.add_argument('--baseline')
+    args = parser.parse_args(argv)
+    options = vars(args).copy()
+    output, baseline = options.pop('output'), options.pop('baseline')
+    result = run(**options)
+    if baseline:
+        with open(baseline, encoding='UTF-8') as file:
+            result['change'] = compare(result, json.load(file))
+    with open(output, 'w', encoding='UTF-8') as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
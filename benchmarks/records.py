@@ -0,0 +1,83 @@
+import argparse
+import json
+import tracemalloc
+
+from state import HomeworkStateStore
+
+
+def make_homeworks(count: int) -> list:
+    """Работы в том виде, в котором их отдаёт API."""
+    return [
+        {
+            'id': index,
+            'homework_name': f'student__hw{index}.zip',
+            'status': ('approved', 'reviewing', 'rejected')[index % 3],
+            'date_updated': f'2023-01-{index % 28 + 1:02d}T12:00:00Z',
+        }
+        for index in range(count)
+    ]
+
+
+def tuple_states(homeworks: list) -> dict:
+    """Прежнее хранение: кортеж (status, date_updated) на каждую работу."""
+    return {
+        homework['id']: (homework['status'], homework['date_updated'])
+        for homework in homeworks
+    }
+
+
+def packed_states(homeworks: list) -> HomeworkStateStore:
+    """Текущее хранение: упакованное целое на каждую работу."""
+    store = HomeworkStateStore()
+    for homework in homeworks:
+        store.commit(homework)
+    store.drain_changes()
+    return store
+
+
+def measure(function, count: int) -> float:
+    """Память в байтах на одну работу, удерживаемая хранилищем.
+
+    Ответ API разбирается под трассировкой и затем освобождается, так что
+    учитываются и строки ответа, которые хранилище продолжает держать.
+    """
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    homeworks = make_homeworks(count)
+    result = function(homeworks)
+    del homeworks
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(result) == count
+    return (after - before) / count
+
+
+def run(homeworks: int = 100000) -> dict:
+    """Сравнивает память прежнего и компактного хранения статусов."""
+    result = {
+        'homeworks': homeworks,
+        'tuple_bytes_per_homework': measure(tuple_states, homeworks),
+        'packed_bytes_per_homework': measure(packed_states, homeworks),
+    }
+    result['memory_ratio'] = (
+        result['packed_bytes_per_homework']
+        / result['tuple_bytes_per_homework'])
+    return result
+
+
+def main(argv: list = None) -> dict:
+    """Запускает сравнение и сохраняет результат в JSON."""
+    parser = argparse.ArgumentParser(
+        description='Память на одну отслеживаемую работу')
+    parser.add_argument('--homeworks', type=int, default=100000)
+    parser.add_argument('--output', default='bench_records.json')
+    args = parser.parse_args(argv)
+    result = run(args.homeworks)
+    with open(args.output, 'w', encoding='UTF-8') as file:
+        json.dump(result, file, indent=2)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import logging
+import time
+
+import telegram
+from telegram.utils.request import Request
+
+from benchmarks.fake_servers import FakeTelegram
+from benchmarks.pipeline import max_rss_kb
+from cassette import ReplayTransport
+from engine import PollingEngine
+from staged_engine import StagedPollingEngine
+from storage import StateStorage
+from tenants import Tenant, TenantRegistry
+
+
+def run(cassette: str, tenants: int = 100, cycles: int = 5,
+        workers: int = 32, speed: float = 1.0,
+        engine: str = 'threads') -> dict:
+    """Прогоняет конвейер на записанном трафике API и возвращает метрики.
+
+    Ответы API берутся из кассеты с исходными задержками, ускоренными в
+    speed раз, а сообщения уходят в локальную заглушку Telegram.
+    """
+    transport = ReplayTransport(cassette, speed=speed)
+    telegram_server = FakeTelegram(seed=2)
+    with telegram_server:
+        bot = telegram.Bot(
+            token='1234:benchmark', base_url=telegram_server.base_url,
+            request=Request(con_pool_size=workers))
+        registry = TenantRegistry(
+            Tenant(f'tenant{index}', f'token{index}', str(index))
+            for index in range(tenants))
+        options = dict(
+            transport=transport, storage=StateStorage(':memory:'))
+        if engine == 'staged':
+            engine = StagedPollingEngine(
+                bot, registry, fetch_workers=workers, **options)
+        else:
+            engine = PollingEngine(bot, registry, workers=workers, **options)
+        logging.disable(logging.CRITICAL)
+        started = time.monotonic()
+        try:
+            errors = sum(engine.run_cycle().errors for _ in range(cycles))
+        finally:
+            duration = time.monotonic() - started
+            logging.disable(logging.NOTSET)
+            engine.close()
+        return {
+            'config': {
+                'cassette': cassette, 'tenants': tenants, 'cycles': cycles,
+                'workers': workers, 'speed': speed,
+                'engine': type(engine).__name__,
+            },
+            'recorded_requests': len(transport.entries),
+            'duration': duration,
+            'cycles_per_sec': cycles / duration,
+            'polls_per_sec': tenants * cycles / duration,
+            'poll_errors': errors,
+            'messages_delivered': len(telegram_server.messages),
+            'max_rss_kb': max_rss_kb(),
+            'transport': transport.stats(),
+        }
+
+
+def main(argv: list = None) -> dict:
+    """Разбирает аргументы, запускает воспроизведение и сохраняет JSON."""
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк конвейера на записанном трафике API')
+    parser.add_argument('cassette')
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument(
+        '--engine', choices=('threads', 'staged'), default='threads')
+    parser.add_argument('--output', default='bench_replay.json')
+    args = parser.parse_args(argv)
+    options = vars(args).copy()
+    output = options.pop('output')
+    result = run(**options)
+    with open(output, 'w', encoding='UTF-8') as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
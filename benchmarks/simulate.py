@@ -0,0 +1,236 @@
+import argparse
+import json
+import logging
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+import requests
+
+import homework
+from breaker import BREAKER_REJECTED, CircuitBreaker
+from clock import VirtualClock
+from engine import PollingEngine
+from scheduler import PollPolicy, PollScheduler
+from storage import StateStorage
+from tenants import Tenant, TenantRegistry
+from benchmarks.pipeline import percentile
+
+DAY = 24 * 60 * 60
+START = 1700000000.0
+MESSAGE_PATTERN = re.compile(r'работы "(.+)"\. (.+)$')
+VERDICT_STATUSES = {
+    verdict: status for status, verdict in homework.HOMEWORK_VERDICTS.items()}
+
+
+def iso(timestamp: float) -> str:
+    """Дата в формате date_updated API Практикума."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%SZ')
+
+
+class SimulatedResponse:
+    """Ответ заглушки с интерфейсом requests.Response."""
+
+    status_code = 200
+
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def json(self) -> dict:
+        """Тело ответа."""
+        return self.data
+
+
+class SimulatedPracticum:
+    """API Практикума, живущее по виртуальным часам.
+
+    Каждый подписчик сдаёт работы по очереди: работа уходит на проверку,
+    через случайное время принимается или возвращается, после возврата
+    сдаётся снова. Во время простоев API запрос завершается ошибкой
+    соединения. Метод get совместим с requests.get.
+    """
+
+    def __init__(self, clock: VirtualClock, tenants: int, days: float,
+                 outages: list = (), seed: int = 1) -> None:
+        self.clock = clock
+        self.outages = list(outages)
+        self.requests = 0
+        self.failed = 0
+        self.events = {}
+        self.timelines = {}
+        rng = random.Random(seed)
+        for index in range(tenants):
+            self.timelines[f'OAuth token{index}'] = self._timeline(
+                index, rng, START + days * DAY)
+
+    def _timeline(self, index: int, rng: random.Random, end: float) -> list:
+        timeline = []
+        moment = START + rng.uniform(0, DAY)
+        number = 0
+        while moment < end:
+            name = f'hw{number}'
+            moment += rng.uniform(600, 6 * 3600)
+            timeline.append((moment, name, 'reviewing'))
+            moment += rng.expovariate(1 / (12 * 3600))
+            status = 'approved' if rng.random() < 0.6 else 'rejected'
+            timeline.append((moment, name, status))
+            if status == 'approved':
+                number += 1
+                moment += rng.uniform(0, DAY)
+        for moment, name, status in timeline:
+            self.events[(str(index), name, status)] = moment
+        return timeline
+
+    def is_down(self, now: float) -> bool:
+        """Идёт ли сейчас простой API."""
+        return any(start <= now < end for start, end in self.outages)
+
+    def get(self, url: str = None, headers: dict = None,
+            params: dict = None, timeout=None, stream: bool = False):
+        """Отвечает как API Практикума на текущий момент часов."""
+        self.requests += 1
+        now = self.clock.time()
+        if self.is_down(now):
+            self.failed += 1
+            raise requests.ConnectionError('Simulated outage')
+        since = params['from_date']
+        latest = {}
+        for moment, name, status in self.timelines[headers['Authorization']]:
+            if moment > now:
+                break
+            latest[name] = (moment, status)
+        return SimulatedResponse({
+            'homeworks': [
+                {'homework_name': name, 'status': status,
+                 'date_updated': iso(moment)}
+                for name, (moment, status) in latest.items()
+                if moment >= since
+            ],
+            'current_date': int(now),
+        })
+
+    def forget(self, headers: dict) -> None:
+        """Совместимость с PooledTransport."""
+
+    def stats(self) -> dict:
+        """Счётчики запросов."""
+        return {'requests': self.requests, 'failed': self.failed}
+
+    def close(self) -> None:
+        """Совместимость с PooledTransport."""
+
+
+class SimulatedBot:
+    """Бот, запоминающий виртуальное время отправки каждого сообщения."""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        self.clock = clock
+        self.messages = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs) -> None:
+        """Запоминает сообщение."""
+        self.messages.append((self.clock.time(), chat_id, text))
+
+
+def notification_delays(practicum: SimulatedPracticum,
+                        bot: SimulatedBot) -> list:
+    """Задержки от смены статуса в API до сообщения подписчику."""
+    delays = []
+    for sent_at, chat_id, text in bot.messages:
+        match = MESSAGE_PATTERN.search(text)
+        if not match:
+            continue
+        status = VERDICT_STATUSES.get(match.group(2))
+        changed_at = practicum.events.get((chat_id, match.group(1), status))
+        if changed_at is not None:
+            delays.append(sent_at - changed_at)
+    return delays
+
+
+def run(tenants: int = 1000, days: float = 3.0, workers: int = 4,
+        outage_start: float = 1.0, outage_hours: float = 2.0,
+        reviewing: float = 120, idle: float = 3600,
+        default: float = homework.RETRY_PERIOD, error_base: float = 30,
+        error_max: float = 3600, seed: int = 1) -> dict:
+    """Моделирует days суток опроса и возвращает метрики политики."""
+    clock = VirtualClock(START)
+    outage = START + outage_start * DAY
+    practicum = SimulatedPracticum(
+        clock, tenants, days, [(outage, outage + outage_hours * 3600)], seed)
+    bot = SimulatedBot(clock)
+    policy = PollPolicy(
+        default=default, reviewing=reviewing, idle=idle,
+        error_base=error_base, error_max=error_max,
+        rng=random.Random(seed))
+    engine = PollingEngine(
+        bot,
+        TenantRegistry(
+            Tenant(f'tenant{index}', f'token{index}', str(index),
+                   timestamp=int(START))
+            for index in range(tenants)),
+        workers=workers, transport=practicum,
+        storage=StateStorage(':memory:'), scheduler=PollScheduler(policy),
+        breaker=CircuitBreaker('simulation', clock=clock.monotonic),
+        clock=clock)
+    rejected = BREAKER_REJECTED.value(breaker='simulation')
+    logging.disable(logging.CRITICAL)
+    started = time.perf_counter()
+    try:
+        engine.run(until=START + days * DAY)
+    finally:
+        wall = time.perf_counter() - started
+        logging.disable(logging.NOTSET)
+        engine.close()
+    delays = notification_delays(practicum, bot)
+    return {
+        'config': {
+            'tenants': tenants, 'days': days, 'workers': workers,
+            'outage_start_day': outage_start, 'outage_hours': outage_hours,
+            'reviewing': reviewing, 'idle': idle, 'default': default,
+            'error_base': error_base, 'error_max': error_max,
+        },
+        'wall_seconds': wall,
+        'simulated_seconds_per_wall_second': days * DAY / wall,
+        'api_requests': practicum.requests,
+        'api_requests_failed': practicum.failed,
+        'requests_per_tenant_day': practicum.requests / tenants / days,
+        'breaker_rejected': (
+            BREAKER_REJECTED.value(breaker='simulation') - rejected),
+        'messages': len(bot.messages),
+        'status_notifications': len(delays),
+        'delay_p50': percentile(delays, 0.5),
+        'delay_p99': percentile(delays, 0.99),
+    }
+
+
+def main(argv: list = None) -> dict:
+    """Разбирает аргументы, запускает моделирование и сохраняет JSON."""
+    parser = argparse.ArgumentParser(
+        description='Моделирование политики опроса на виртуальных часах')
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--days', type=float, default=3.0)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--outage-start', type=float, default=1.0)
+    parser.add_argument('--outage-hours', type=float, default=2.0)
+    parser.add_argument('--reviewing', type=float, default=120)
+    parser.add_argument('--idle', type=float, default=3600)
+    parser.add_argument('--default', type=float,
+                        default=homework.RETRY_PERIOD)
+    parser.add_argument('--error-base', type=float, default=30)
+    parser.add_argument('--error-max', type=float, default=3600)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_simulate.json')
+    args = parser.parse_args(argv)
+    options = vars(args).copy()
+    output = options.pop('output')
+    result = run(**options)
+    with open(output, 'w', encoding='UTF-8') as file:
+        json.dump(result, file, indent=2)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import functools
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from requests.exceptions import RequestException
+
+from deadline import DeadlineExceeded
+from metrics import REGISTRY
+
+load_dotenv()
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv('BREAKER_RECOVERY_TIMEOUT', 30))
+BREAKER_MAX_RECOVERY_TIMEOUT = float(
+    os.getenv('BREAKER_MAX_RECOVERY_TIMEOUT', 600))
+BREAKER_PROBES = int(os.getenv('BREAKER_PROBES', 1))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Сообщения предохранителя
+CIRCUIT_OPEN_MESSAGE = (
+    'API недоступно, запросы приостановлены ещё на {remaining:.0f} с')
+BREAKER_STATE_MESSAGE = 'Предохранитель API: %s -> %s после %d сбоев подряд'
+
+BREAKER_STATE = REGISTRY.gauge(
+    'homework_bot_breaker_state',
+    'Состояние предохранителя: 0 - замкнут, 1 - пробный, 2 - разомкнут',
+    ('breaker',))
+BREAKER_REJECTED = REGISTRY.counter(
+    'homework_bot_breaker_rejected_total',
+    'Запросы, не отправленные из-за разомкнутого предохранителя',
+    ('breaker',))
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RequestException):
+    """Запрос не отправлен: предохранитель разомкнут.
+
+    Наследует RequestException, поэтому request_api_answer превращает его
+    в ConnectionError, как и обычный сбой соединения.
+    """
+
+
+def is_failure(response) -> bool:
+    """Ответ говорит о неисправности API, а не о проблеме подписчика."""
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class CircuitBreaker:
+    """Предохранитель для запросов к API, общий для всех подписчиков.
+
+    Замкнут - запросы идут как обычно. После failure_threshold сбоев
+    подряд размыкается, и запросы сразу завершаются CircuitOpenError.
+    Через recovery_timeout секунд переходит в пробное состояние и
+    пропускает не более probes запросов: успех замыкает цепь, сбой снова
+    размыкает её с вдвое большим таймаутом (до max_recovery_timeout).
+    Сбоем считаются ошибки соединения и ответы 5xx и 429; ответы
+    вроде 401 относятся к токену подписчика и цепь не размыкают.
+    """
+
+    def __init__(self, name: str = 'practicum',
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT,
+                 max_recovery_timeout: float = BREAKER_MAX_RECOVERY_TIMEOUT,
+                 probes: int = BREAKER_PROBES,
+                 clock=time.monotonic) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max_recovery_timeout
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.timeout = recovery_timeout
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(STATE_CODES[CLOSED], breaker=name)
+
+    def _transition(self, state: str) -> None:
+        logger.warning(BREAKER_STATE_MESSAGE, self.state, state, self.failures)
+        self.state = state
+        BREAKER_STATE.set(STATE_CODES[state], breaker=self.name)
+
+    def allow(self) -> None:
+        """Разрешает запрос или бросает CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.timeout - self.clock()
+                if remaining > 0:
+                    BREAKER_REJECTED.inc(breaker=self.name)
+                    raise CircuitOpenError(
+                        CIRCUIT_OPEN_MESSAGE.format(remaining=remaining))
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.in_flight >= self.probes:
+                    BREAKER_REJECTED.inc(breaker=self.name)
+                    raise CircuitOpenError(
+                        CIRCUIT_OPEN_MESSAGE.format(remaining=0))
+                self.in_flight += 1
+
+    def record_success(self) -> None:
+        """Учитывает успешный запрос."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.in_flight = 0
+                self._transition(CLOSED)
+                self.timeout = self.recovery_timeout
+            self.failures = 0
+
+    def release(self) -> None:
+        """Освобождает место пробного запроса, не учитывая его исход."""
+        with self._lock:
+            if self.state == HALF_OPEN and self.in_flight:
+                self.in_flight -= 1
+
+    def record_failure(self) -> None:
+        """Учитывает сбой запроса."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.timeout = min(
+                    self.timeout * 2, self.max_recovery_timeout)
+            elif self.state != CLOSED or (
+                    self.failures < self.failure_threshold):
+                return
+            self.opened_at = self.clock()
+            self.in_flight = 0
+            self._transition(OPEN)
+
+    def wrap(self, get):
+        """Оборачивает функцию с интерфейсом requests.get.
+
+        DeadlineExceeded сбоем не считается: запрос прервал срок цикла, а
+        не неисправность API.
+        """
+        @functools.wraps(get)
+        def guarded(*args, **kwargs):
+            self.allow()
+            try:
+                response = get(*args, **kwargs)
+            except DeadlineExceeded:
+                self.release()
+                raise
+            except Exception:
+                self.record_failure()
+                raise
+            if is_failure(response):
+                self.record_failure()
+            else:
+                self.record_success()
+            return response
+        return guarded
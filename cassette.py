@@ -0,0 +1,212 @@
+import atexit
+import functools
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import threading
+
+from dotenv import load_dotenv
+import requests
+
+from breaker import CircuitOpenError
+from clock import SYSTEM_CLOCK, SystemClock
+
+load_dotenv()
+
+RECORD_CASSETTE = os.getenv('RECORD_CASSETTE')
+CASSETTE_VERSION = 1
+
+# Сообщения кассеты
+CASSETTE_EMPTY_MESSAGE = 'В кассете {path} нет записанных запросов'
+CASSETTE_VERSION_MESSAGE = 'Неподдерживаемая версия кассеты {version}'
+
+_default_recorder = None
+_default_lock = threading.Lock()
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='UTF-8')
+    return open(path, mode, encoding='UTF-8')
+
+
+def tenant_key(headers: dict) -> str:
+    """Короткий отпечаток токена: сам токен в кассету не пишется."""
+    token = (headers or {}).get('Authorization', '')
+    return hashlib.sha1(token.encode()).hexdigest()[:8]
+
+
+class CassetteRecorder:
+    """Дописывает запросы к API в кассету - файл JSON Lines.
+
+    Первая строка - заголовок с версией и временем начала записи, далее по
+    строке на запрос: [смещение начала, длительность, отпечаток токена,
+    from_date, код ответа, тело]. У неудачных запросов код - null, а тело -
+    "Тип: текст ошибки". Файл с расширением .gz пишется сжатым.
+    """
+
+    def __init__(self, path: str, clock: SystemClock = SYSTEM_CLOCK) -> None:
+        self.path = path
+        self.clock = clock
+        self.started = clock.monotonic()
+        self._lock = threading.Lock()
+        self._file = _open(path, 'a')
+        self._write({'version': CASSETTE_VERSION, 'started': clock.time()})
+
+    def _write(self, entry) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+
+    def record(self, started: float, latency: float, headers: dict,
+               params: dict, status, body: str) -> None:
+        """Дописывает один запрос."""
+        self._write([
+            round(started - self.started, 6), round(latency, 6),
+            tenant_key(headers), (params or {}).get('from_date'),
+            status, body,
+        ])
+
+    def wrap(self, get):
+        """Оборачивает функцию с интерфейсом requests.get записью в кассету.
+
+        Тело ответа читается целиком, после чего response.json() и
+        response.iter_content() работают как обычно. Отказы разомкнутого
+        предохранителя не пишутся: такой запрос не доходил до API.
+        """
+        @functools.wraps(get)
+        def recording(*args, headers=None, params=None, **kwargs):
+            started = self.clock.monotonic()
+            try:
+                response = get(
+                    *args, headers=headers, params=params, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as error:
+                self.record(
+                    started, self.clock.monotonic() - started, headers,
+                    params, None, f'{type(error).__name__}: {error}')
+                raise
+            body = response.content.decode('UTF-8', 'replace')
+            self.record(
+                started, self.clock.monotonic() - started, headers, params,
+                response.status_code, body)
+            return response
+        return recording
+
+    def close(self) -> None:
+        """Дописывает буфер и закрывает файл."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def default_recorder():
+    """Запись в кассету из RECORD_CASSETTE или None, если она не задана."""
+    global _default_recorder
+    if not RECORD_CASSETTE:
+        return None
+    with _default_lock:
+        if _default_recorder is None:
+            _default_recorder = CassetteRecorder(RECORD_CASSETTE)
+            atexit.register(_default_recorder.close)
+    return _default_recorder
+
+
+def load_cassette(path: str) -> list:
+    """Читает записи кассеты, пропуская заголовки."""
+    entries = []
+    with _open(path, 'r') as file:
+        for line in file:
+            entry = json.loads(line)
+            if isinstance(entry, dict):
+                if entry.get('version') != CASSETTE_VERSION:
+                    raise ValueError(CASSETTE_VERSION_MESSAGE.format(
+                        version=entry.get('version')))
+                continue
+            entries.append(entry)
+    if not entries:
+        raise ValueError(CASSETTE_EMPTY_MESSAGE.format(path=path))
+    return entries
+
+
+class ReplayResponse:
+    """Записанный ответ с интерфейсом requests.Response."""
+
+    def __init__(self, status_code: int, body: str) -> None:
+        self.status_code = status_code
+        self.content = body.encode()
+        self.text = body
+        self.reason = ''
+
+    def json(self):
+        """Тело ответа как JSON."""
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size: int = 1):
+        """Тело ответа кусками, как при stream=True."""
+        for index in range(0, len(self.content), chunk_size):
+            yield self.content[index:index + chunk_size]
+
+    def close(self) -> None:
+        """Совместимость с requests.Response."""
+
+
+def replay_error(body: str) -> Exception:
+    """Исключение requests, соответствующее записанной ошибке."""
+    name, _, message = body.partition(': ')
+    error = getattr(requests.exceptions, name, None)
+    if not (isinstance(error, type)
+            and issubclass(error, requests.RequestException)):
+        error = requests.RequestException
+    return error(message)
+
+
+class ReplayTransport:
+    """Воспроизводит кассету вместо запросов к API.
+
+    Запросы получают записанные ответы по порядку, независимо от токена,
+    так что сохраняются и размеры ответов, и серии ошибок. Длительность
+    каждого запроса повторяется, делённая на speed; speed=0 отвечает
+    сразу. С loop=True кассета идёт по кругу, иначе по её окончании
+    бросается StopIteration. Метод get совместим с requests.get.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True,
+                 clock: SystemClock = SYSTEM_CLOCK) -> None:
+        self.entries = load_cassette(path)
+        self.speed = speed
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._order = (
+            itertools.cycle(self.entries) if loop else iter(self.entries))
+        self.requests = 0
+        self.errors = 0
+
+    def get(self, url: str = None, headers: dict = None,
+            params: dict = None, timeout=None, stream: bool = False):
+        """Возвращает следующий записанный ответ."""
+        with self._lock:
+            _, latency, _, _, status, body = next(self._order)
+            self.requests += 1
+            if status is None:
+                self.errors += 1
+        if self.speed:
+            self.clock.sleep(latency / self.speed)
+        if status is None:
+            raise replay_error(body)
+        return ReplayResponse(status, body)
+
+    def forget(self, headers: dict) -> None:
+        """Совместимость с PooledTransport."""
+
+    def stats(self) -> dict:
+        """Счётчики воспроизведённых запросов."""
+        return {'requests': self.requests, 'errors': self.errors}
+
+    def close(self) -> None:
+        """Совместимость с PooledTransport."""
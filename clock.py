@@ -0,0 +1,50 @@
+import threading
+import time
+
+
+class SystemClock:
+    """Настоящее время процесса."""
+
+    def time(self) -> float:
+        """Текущее время в секундах от эпохи."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Монотонное время для измерения интервалов."""
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Ждёт указанное число секунд."""
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Виртуальное время для моделирования опроса.
+
+    sleep не ждёт, а сразу переводит часы вперёд, поэтому цикл опроса
+    проживает сутки за доли секунды. time и monotonic показывают одно и
+    то же виртуальное время.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        """Текущее виртуальное время."""
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, seconds: float) -> None:
+        """Переводит часы на seconds вперёд без ожидания."""
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """Переводит часы вперёд."""
+        if seconds > 0:
+            with self._lock:
+                self.now += seconds
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -0,0 +1,226 @@
+import collections
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from deadline import SEND_TIMEOUT
+from metrics import REGISTRY
+
+load_dotenv()
+
+COMMANDS_ENABLED = os.getenv('TELEGRAM_COMMANDS', '') == '1'
+COMMAND_POLL_TIMEOUT = int(os.getenv('COMMAND_POLL_TIMEOUT', 30))
+COMMAND_HISTORY_SIZE = int(os.getenv('COMMAND_HISTORY_SIZE', 10))
+COMMAND_RETRY_DELAY = 5.0
+CHECKED_FORMAT = '%d.%m.%Y %H:%M'
+
+# Сообщения команд Telegram
+STATUS_HEADER = 'Последняя проверка статусов: {checked}'
+STATUS_LINE = '"{name}": {verdict}'
+STATUS_EMPTY = 'С момента запуска бота статусы работ не менялись.'
+STATUS_NOT_CHECKED = 'Статусы ещё не проверялись, дождитесь первого опроса.'
+HISTORY_LINE = '{changed}: "{name}" - {verdict}'
+HISTORY_EMPTY = 'С момента запуска бота статусы работ не менялись.'
+UNKNOWN_COMMAND = 'Доступные команды: /status, /history'
+COMMAND_LISTENER_START_MESSAGE = 'Приём команд Telegram запущен'
+COMMAND_POLL_FAILURE_MESSAGE = 'Не удалось получить команды Telegram: %s'
+COMMAND_FAILURE_MESSAGE = 'Не удалось ответить на команду %s: %s'
+
+COMMANDS_TOTAL = REGISTRY.counter(
+    'homework_bot_commands_total', 'Команды, полученные от пользователей',
+    ('command',))
+COMMAND_SECONDS = REGISTRY.histogram(
+    'homework_bot_command_seconds', 'Время ответа на команду',
+    ('command',))
+
+logger = logging.getLogger(__name__)
+
+
+def command_name(text: str) -> str:
+    """Команда из текста сообщения без аргументов и имени бота."""
+    return text.split()[0].split('@')[0].lower()
+
+
+class _ChatStatus:
+    """Известные статусы работ одного чата и история их смены."""
+
+    __slots__ = ('checked_at', 'statuses', 'history')
+
+    def __init__(self, history_size: int) -> None:
+        self.checked_at = None
+        self.statuses = {}
+        self.history = collections.deque(maxlen=history_size)
+
+
+class StatusCache:
+    """Статусы работ, которые видел опрос, для ответов на команды.
+
+    Кэш заполняется циклом опроса, а команды читают только его, поэтому
+    ответ на команду не стоит запроса к API Практикума. Для каждого чата
+    хранятся последний статус каждой работы, время последней проверки и
+    последние history_size смен статуса.
+    """
+
+    def __init__(self, verdicts: dict,
+                 history_size: int = COMMAND_HISTORY_SIZE,
+                 clock=time.time) -> None:
+        self.verdicts = verdicts
+        self.history_size = history_size
+        self.clock = clock
+        self._chats = {}
+        self._lock = threading.Lock()
+
+    def checked(self, chat_id: str, homeworks: list) -> None:
+        """Запоминает успешный ответ API для чата."""
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _ChatStatus(self.history_size)
+            chat.checked_at = self.clock()
+            for homework in homeworks:
+                name = homework.get('homework_name')
+                status = homework.get('status')
+                if chat.statuses.get(name) == status:
+                    continue
+                chat.statuses[name] = status
+                chat.history.append(
+                    (homework.get('date_updated') or '', name, status))
+
+    def verdict(self, status: str) -> str:
+        """Текст вердикта для статуса."""
+        return self.verdicts.get(status, status)
+
+    def render_status(self, chat_id: str) -> str:
+        """Ответ на /status: последние известные статусы работ."""
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is None or chat.checked_at is None:
+                return STATUS_NOT_CHECKED
+            checked = datetime.fromtimestamp(chat.checked_at).strftime(
+                CHECKED_FORMAT)
+            statuses = list(chat.statuses.items())
+        lines = [STATUS_HEADER.format(checked=checked)]
+        lines += [
+            STATUS_LINE.format(name=name, verdict=self.verdict(status))
+            for name, status in statuses
+        ] or [STATUS_EMPTY]
+        return '\n'.join(lines)
+
+    def render_history(self, chat_id: str) -> str:
+        """Ответ на /history: последние смены статусов, новые внизу."""
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            history = list(chat.history) if chat else []
+        if not history:
+            return HISTORY_EMPTY
+        return '\n'.join(
+            HISTORY_LINE.format(
+                changed=changed, name=name, verdict=self.verdict(status))
+            for changed, name, status in history
+        )
+
+
+class CommandListener:
+    """Принимает команды через long polling getUpdates в фоновом потоке.
+
+    Отвечает только чатам, за которыми следит бот: остальные сообщения
+    пропускаются, чтобы посторонний не узнал чужие статусы. Ответы берутся
+    из StatusCache, к API Практикума слушатель не обращается. Если задан
+    key, все чаты читают из кэша запись key, иначе - каждый свою.
+    """
+
+    def __init__(self, bot, cache: StatusCache, chats, key: str = None,
+                 timeout: int = COMMAND_POLL_TIMEOUT,
+                 retry_delay: float = COMMAND_RETRY_DELAY) -> None:
+        self.bot = bot
+        self.cache = cache
+        self.chats = {
+            str(chat_id): key or str(chat_id) for chat_id in chats}
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.offset = None
+        self.thread = None
+        self._stopped = threading.Event()
+        self.commands = {
+            '/status': cache.render_status,
+            '/history': cache.render_history,
+        }
+
+    def answer(self, chat_id: str, text: str):
+        """Ответ на сообщение или None, если отвечать не нужно."""
+        if chat_id not in self.chats or not text.startswith('/'):
+            return None
+        command = command_name(text)
+        render = self.commands.get(command)
+        if render is None:
+            COMMANDS_TOTAL.inc(command='unknown')
+            return UNKNOWN_COMMAND
+        COMMANDS_TOTAL.inc(command=command)
+        return render(self.chats[chat_id])
+
+    def handle(self, update) -> None:
+        """Отвечает на одно обновление Telegram."""
+        message = update.effective_message
+        if message is None or not message.text:
+            return
+        started = time.perf_counter()
+        reply = self.answer(str(message.chat_id), message.text)
+        if reply is None:
+            return
+        self.bot.send_message(message.chat_id, reply, timeout=SEND_TIMEOUT)
+        command = command_name(message.text)
+        COMMAND_SECONDS.observe(
+            time.perf_counter() - started,
+            command=command if command in self.commands else 'unknown')
+
+    def poll(self) -> int:
+        """Забирает и обрабатывает одну пачку обновлений."""
+        updates = self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout,
+            allowed_updates=['message'])
+        for update in updates:
+            self.offset = update.update_id + 1
+            try:
+                self.handle(update)
+            except Exception as error:
+                logger.exception(
+                    COMMAND_FAILURE_MESSAGE, update.update_id, error)
+        return len(updates)
+
+    def run(self) -> None:
+        """Принимает команды, пока слушатель не остановлен."""
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception as error:
+                logger.warning(COMMAND_POLL_FAILURE_MESSAGE, error)
+                self._stopped.wait(self.retry_delay)
+
+    def start(self) -> 'CommandListener':
+        """Запускает приём команд в фоновом потоке."""
+        self.thread = threading.Thread(
+            target=self.run, name='commands', daemon=True)
+        self.thread.start()
+        logger.info(COMMAND_LISTENER_START_MESSAGE)
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        """Останавливает приём после текущего запроса getUpdates."""
+        self._stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+def start_command_listener(bot, cache: StatusCache, chats,
+                           key: str = None):
+    """Запускает приём команд, если он включён TELEGRAM_COMMANDS=1.
+
+    Иначе возвращает None.
+    """
+    if not COMMANDS_ENABLED:
+        return None
+    return CommandListener(bot, cache, chats, key).start()
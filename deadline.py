@@ -0,0 +1,103 @@
+import functools
+import os
+import time
+
+from dotenv import load_dotenv
+from requests.exceptions import Timeout
+
+from metrics import REGISTRY
+
+load_dotenv()
+
+CYCLE_DEADLINE = float(os.getenv('CYCLE_DEADLINE', 60))
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT', 30))
+SEND_TIMEOUT = float(os.getenv('SEND_TIMEOUT', 20))
+
+# Сообщения сроков выполнения
+DEADLINE_EXCEEDED_MESSAGE = 'Срок цикла опроса истёк перед этапом {stage}'
+
+DEADLINE_OVERRUNS = REGISTRY.counter(
+    'homework_bot_deadline_overruns_total',
+    'Этапы, отменённые из-за истечения срока цикла', ('stage',))
+SKIPPED_TENANTS = REGISTRY.counter(
+    'homework_bot_deadline_skipped_tenants_total',
+    'Подписчики, до опроса которых не дошла очередь за срок цикла')
+CYCLE_OVERRUN_SECONDS = REGISTRY.histogram(
+    'homework_bot_cycle_overrun_seconds',
+    'На сколько цикл опроса превысил свой срок')
+
+
+class DeadlineExceeded(TimeoutError):
+    """Срок цикла истёк, оставшаяся работа отменена."""
+
+
+class Deadline:
+    """Срок выполнения цикла опроса.
+
+    Каждый сетевой вызов получает таймауты, урезанные до остатка срока,
+    а этап, начинающийся после срока, не выполняется вовсе. Так зависшее
+    соединение не задерживает цикл дольше срока.
+    """
+
+    __slots__ = ('budget', 'expires', 'clock')
+
+    def __init__(self, budget: float = CYCLE_DEADLINE,
+                 clock=time.monotonic) -> None:
+        self.budget = budget
+        self.clock = clock
+        self.expires = clock() + budget
+
+    def remaining(self) -> float:
+        """Остаток срока в секундах, не меньше нуля."""
+        return max(0.0, self.expires - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        """Истёк ли срок."""
+        return self.clock() >= self.expires
+
+    def check(self, stage: str) -> float:
+        """Возвращает остаток срока или бросает DeadlineExceeded."""
+        remaining = self.expires - self.clock()
+        if remaining <= 0:
+            DEADLINE_OVERRUNS.inc(stage=stage)
+            raise DeadlineExceeded(
+                DEADLINE_EXCEEDED_MESSAGE.format(stage=stage))
+        return remaining
+
+    def timeouts(self, stage: str, connect: float = CONNECT_TIMEOUT,
+                 read: float = READ_TIMEOUT) -> tuple:
+        """Пара (connect, read) для requests в пределах остатка срока."""
+        remaining = self.check(stage)
+        return min(connect, remaining), min(read, remaining)
+
+    def timeout(self, stage: str, limit: float = SEND_TIMEOUT) -> float:
+        """Таймаут одного вызова в пределах остатка срока."""
+        return min(limit, self.check(stage))
+
+    def guard(self, get, stage: str):
+        """Оборачивает функцию с интерфейсом requests.get.
+
+        Таймаут, случившийся после истечения срока, вызван урезанием
+        таймаутов до остатка срока, а не сбоем API: вместо него
+        бросается DeadlineExceeded.
+        """
+        @functools.wraps(get)
+        def guarded(*args, **kwargs):
+            try:
+                return get(*args, **kwargs)
+            except Timeout as error:
+                if not self.expired:
+                    raise
+                DEADLINE_OVERRUNS.inc(stage=stage)
+                raise DeadlineExceeded(
+                    DEADLINE_EXCEEDED_MESSAGE.format(stage=stage)) from error
+        return guarded
+
+    def finish(self) -> float:
+        """Учитывает превышение срока по окончании цикла и возвращает его."""
+        overrun = max(0.0, self.clock() - self.expires)
+        if overrun:
+            CYCLE_OVERRUN_SECONDS.observe(overrun)
+        return overrun
@@ -0,0 +1,444 @@
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+from alerts import FailureNotifier
+from breaker import CircuitBreaker
+from clock import SYSTEM_CLOCK, SystemClock
+from deadline import (CYCLE_DEADLINE, DEADLINE_EXCEEDED_MESSAGE,
+                      SKIPPED_TENANTS, Deadline, DeadlineExceeded)
+from fanout import FanOut
+from health import HEALTH
+from tenants import TenantRegistry, load_tenants, measure_tenant_footprint
+from metrics import CYCLE_SECONDS, QUEUE_DEPTH
+from outbox import GLOBAL_RATE, OUTBOX_STATS_MESSAGE, TelegramOutbox
+from profiling import PROFILER
+from scheduler import PollScheduler
+from singleflight import SingleFlight
+from storage import StateStorage
+from streaming import decode_response
+from transport import PooledTransport
+
+ENGINE_WORKERS = int(os.getenv('ENGINE_WORKERS', 32))
+ENGINE_MODE = os.getenv('ENGINE_MODE', 'threads')
+ENGINE_PROCESSES = int(os.getenv('ENGINE_PROCESSES', 1))
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', '') == '1'
+
+# Сообщения движка опроса
+ENGINE_START_MESSAGE = (
+    'Движок опроса запущен: подписчиков %d, потоков %d, '
+    '~%.0f байт на подписчика')
+TENANT_FAILURE_MESSAGE = 'Сбой опроса подписчика %s: %s'
+CYCLE_STATS_MESSAGE = (
+    'Цикл опроса: подписчиков %d, отправлено %d, ошибок %d, '
+    'не дошла очередь %d, %.3f с, %.1f подписчиков/с')
+TRANSPORT_STATS_MESSAGE = (
+    'Соединения с API: запросов %(requests)d, '
+    'открыто %(connections_opened)d, '
+    'переиспользовано %(connections_reused)d')
+FLIGHT_STATS_MESSAGE = (
+    'Склейка запросов к API: выполнено %(misses)d, сэкономлено %(hits)d')
+
+logger = logging.getLogger(__name__)
+
+
+def request_options(transport: PooledTransport,
+                    breaker: CircuitBreaker = None,
+                    deadline: Deadline = None) -> dict:
+    """Функции запроса и разбора ответа для request_api_answer.
+
+    При STREAM_RESPONSES=1 тело ответа разбирается потоково и от работ
+    остаются только поля, нужные для разбора статуса. Если передан
+    предохранитель, запросы идут через него. Таймаут после истечения
+    срока deadline становится DeadlineExceeded ещё до предохранителя,
+    поэтому сбоем API не считается.
+    """
+    get = transport.get
+    if STREAM_RESPONSES:
+        get = functools.partial(transport.get, stream=True)
+    if deadline is not None:
+        get = deadline.guard(get, 'get_api_answer')
+    options = {'get': breaker.wrap(get) if breaker else get}
+    if STREAM_RESPONSES:
+        options['decode'] = decode_response
+    return options
+
+
+def status_updates(tenant, response: dict) -> list:
+    """Проверяет ответ API и возвращает пары (работа, сообщение).
+
+    В список попадают только работы, статус которых изменился.
+    """
+    homeworks = homework.check_response(response)
+    if not homeworks:
+        logger.debug(homework.NO_HOMEWORK_MESSAGE)
+    updates = homework.collect_updates(tenant.homeworks, homeworks)
+    if not updates:
+        logger.debug(homework.HOMEWORK_STATUS_NOT_CHANGED)
+    return updates
+
+
+def advance_cursor(tenant, response: dict) -> None:
+    """Сдвигает курсор подписчика на дату ответа API."""
+    tenant.timestamp = response.get('current_date', tenant.timestamp)
+
+
+def failure_message(tenant, error: Exception, clock=time.time):
+    """Логирует сбой опроса и возвращает сообщение о нём.
+
+    Если о такой ошибке уже сообщали в окне подавления, возвращает None.
+    Отпечатки сбоев восстанавливаются из tenant.alerts и сохраняются туда
+    же, поэтому перезапуск не повторяет уже отправленные сообщения.
+    """
+    logger.exception(TENANT_FAILURE_MESSAGE, tenant.name, error)
+    if tenant.notifier is None:
+        tenant.notifier = FailureNotifier(
+            homework.PROGRAMM_FAILURE_ERROR_MESSAGE, clock=clock)
+        tenant.notifier.restore(tenant.alerts)
+    message = tenant.notifier.check(error)
+    tenant.alerts = tenant.notifier.dump()
+    if message is None:
+        logger.debug(homework.MESSAGE_NOT_SENT_ERROR)
+    return message
+
+
+def failure_delivered(tenant, error: Exception) -> None:
+    """Запоминает доставленное подписчику сообщение о сбое."""
+    tenant.notifier.delivered(error)
+    tenant.alerts = tenant.notifier.dump()
+
+
+def restore_tenants(storage: StateStorage, registry: TenantRegistry) -> None:
+    """Восстанавливает курсоры и статусы подписчиков из хранилища."""
+    saved = storage.load()
+    for tenant in registry:
+        if tenant.name in saved:
+            tenant.timestamp, tenant.alerts, homeworks = saved[
+                tenant.name]
+            tenant.homeworks.restore(homeworks)
+
+
+def persist_tenants(storage: StateStorage, registry: TenantRegistry) -> None:
+    """Ставит состояние всех подписчиков в очередь на запись."""
+    for tenant in registry:
+        storage.remember(
+            tenant.name, tenant.timestamp, tenant.alerts,
+            tenant.homeworks)
+
+
+class CycleStats:
+    """Итоги одного цикла опроса всех подписчиков.
+
+    skipped - подписчики, до опроса которых очередь не дошла за срок цикла.
+    """
+
+    __slots__ = ('tenants', 'sent', 'errors', 'duration', 'skipped')
+
+    def __init__(self, tenants: int, sent: int, errors: int,
+                 duration: float, skipped: list = ()) -> None:
+        self.tenants = tenants
+        self.sent = sent
+        self.errors = errors
+        self.duration = duration
+        self.skipped = list(skipped)
+
+    @classmethod
+    def collect(cls, results, duration: float) -> 'CycleStats':
+        """Итоги по парам (подписчик, результат шага poll_tenant).
+
+        Пропущенные подписчики учитываются метрикой
+        homework_bot_deadline_skipped_tenants_total.
+        """
+        results = list(results)
+        skipped = [tenant for tenant, (_, _, skip) in results if skip]
+        SKIPPED_TENANTS.inc(len(skipped))
+        return cls(
+            tenants=len(results),
+            sent=sum(sent for _, (sent, _, _) in results),
+            errors=sum(error for _, (_, error, _) in results),
+            duration=duration,
+            skipped=skipped,
+        )
+
+    @property
+    def throughput(self) -> float:
+        """Число опрошенных подписчиков в секунду."""
+        if not self.duration:
+            return float(self.tenants)
+        return self.tenants / self.duration
+
+
+class PollingEngine:
+    """Опрашивает всех подписчиков реестра в общем пуле потоков."""
+
+    def __init__(self, bot: telegram.Bot, registry: TenantRegistry,
+                 workers: int = ENGINE_WORKERS,
+                 transport: PooledTransport = None,
+                 storage: StateStorage = None,
+                 outbox: TelegramOutbox = None,
+                 scheduler: PollScheduler = None,
+                 breaker: CircuitBreaker = None,
+                 cycle_deadline: float = CYCLE_DEADLINE,
+                 clock: SystemClock = SYSTEM_CLOCK,
+                 flight: SingleFlight = None,
+                 fanout: FanOut = None) -> None:
+        self.bot = bot
+        self.clock = clock
+        self.flight = flight or SingleFlight('engine')
+        self.fanout = fanout or FanOut()
+        self.breaker = breaker or CircuitBreaker(clock=clock.monotonic)
+        self.cycle_deadline = cycle_deadline
+        self.outbox = outbox
+        self.scheduler = scheduler or PollScheduler()
+        QUEUE_DEPTH.set_function(
+            lambda: len(self.scheduler), queue='scheduler')
+        if outbox is not None:
+            QUEUE_DEPTH.set_function(lambda: outbox.depth, queue='outbox')
+        HEALTH.set_backlog(self.backlog)
+        self.registry = registry
+        self.workers = workers
+        self.transport = transport or PooledTransport(pool_maxsize=workers)
+        self.storage = storage or StateStorage()
+        restore_tenants(self.storage, registry)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='poller')
+
+    def backlog(self) -> int:
+        """Сообщения, ждущие отправки в очереди или повтора рассылки."""
+        depth = self.outbox.depth if self.outbox is not None else 0
+        return depth + self.fanout.pending()
+
+    def fetch(self, tenant, deadline: Deadline = None) -> dict:
+        """Запрашивает ответ API для подписчика.
+
+        Подписчики с общим токеном и курсором, опрашиваемые одновременно,
+        получают ответ одного запроса.
+        """
+        return self.flight.do(
+            (tenant.token, tenant.timestamp), homework.request_api_answer,
+            tenant.timestamp, tenant.headers, deadline=deadline,
+            **request_options(self.transport, self.breaker, deadline))
+
+    def send(self, chat_id: str, message: str,
+             deadline: Deadline = None) -> bool:
+        """Отправляет сообщение в чат подписчика.
+
+        Если задана очередь отправки, сообщение ставится в неё с учётом
+        лимитов Telegram, и результат ждётся в пределах срока deadline:
+        состояние подписчика сохраняется только после настоящей отправки.
+        Не дождавшись, бросает DeadlineExceeded; сообщение остаётся в
+        очереди, и следующий цикл ждёт его, а не ставит повторно.
+        """
+        if self.outbox is None:
+            return homework.send_message_to(
+                self.bot, chat_id, message, deadline)
+        future = self.outbox.put(chat_id, message)
+        if future is None:
+            return False
+        try:
+            return future.result(deadline.remaining() if deadline else None)
+        except FutureTimeout:
+            deadline.check('send_message')
+            raise DeadlineExceeded(
+                DEADLINE_EXCEEDED_MESSAGE.format(stage='send_message'))
+
+    def notify(self, tenant, message: str, deadline: Deadline = None) -> bool:
+        """Отправляет сообщение во все чаты подписчика параллельно.
+
+        Возвращает True, когда сообщение дошло до каждого чата. Доставленные
+        чаты запоминаются для этого подписчика: у другого подписчика с тем
+        же текстом и общим чатом рассылка своя.
+        """
+        return self.fanout.deliver(
+            tenant.chat_ids, message,
+            lambda chat_id: self.send(chat_id, message, deadline),
+            key=(tenant.name, message)).delivered
+
+    def deliver(self, tenant, response: dict, updates: list,
+                deadline: Deadline = None) -> int:
+        """Отправляет сообщения об изменениях и сдвигает курсор.
+
+        Возвращает число отправленных сообщений. Если срок цикла истёк,
+        неотправленные сообщения и курсор остаются до следующего опроса.
+        """
+        sent = 0
+        try:
+            for work, message in updates:
+                if self.notify(tenant, message, deadline):
+                    tenant.homeworks.commit(work)
+                    sent += 1
+        except DeadlineExceeded:
+            return sent
+        if sent == len(updates):
+            advance_cursor(tenant, response)
+        tenant.failures = 0
+        return sent
+
+    def fail(self, tenant, error: Exception,
+             deadline: Deadline = None) -> None:
+        """Учитывает сбой опроса и сообщает о нём подписчику.
+
+        Уведомление ждётся в пределах срока deadline; если он истёк,
+        сообщение остаётся в очереди отправки, а сбой будет сообщён
+        повторно в следующем цикле.
+        """
+        tenant.failures += 1
+        message = failure_message(tenant, error, self.clock.time)
+        try:
+            if message is not None and self.notify(tenant, message, deadline):
+                failure_delivered(tenant, error)
+        except DeadlineExceeded:
+            pass
+
+    def poll_tenant(self, tenant, deadline: Deadline = None) -> tuple:
+        """Выполняет один шаг опроса подписчика.
+
+        Возвращает тройку (число отправленных сообщений, была ли ошибка,
+        пропущен ли шаг). Если срок цикла истёк до запроса, шаг
+        пропускается без ошибки.
+        """
+        try:
+            response = self.fetch(tenant, deadline)
+            updates = status_updates(tenant, response)
+            sent = self.deliver(tenant, response, updates, deadline)
+            return sent, False, False
+        except DeadlineExceeded:
+            return 0, False, True
+        except Exception as error:
+            self.fail(tenant, error, deadline)
+            return 0, True, False
+
+    def run_cycle(self, tenants: list = None) -> CycleStats:
+        """Опрашивает подписчиков параллельно и возвращает итоги.
+
+        По умолчанию опрашиваются все подписчики реестра. Подписчики, до
+        которых очередь не дошла за cycle_deadline секунд, пропускаются и
+        попадают в CycleStats.skipped.
+        """
+        if tenants is None:
+            tenants = list(self.registry)
+        started = self.clock.monotonic()
+        deadline = Deadline(self.cycle_deadline, self.clock.monotonic)
+        results = list(self.executor.map(
+            functools.partial(self.poll_tenant, deadline=deadline), tenants))
+        persist_tenants(self.storage, tenants)
+        duration = self.clock.monotonic() - started
+        CYCLE_SECONDS.observe(duration)
+        deadline.finish()
+        return CycleStats.collect(zip(tenants, results), duration)
+
+    def poll_due(self, now: float) -> CycleStats:
+        """Опрашивает подписчиков, чей срок опроса наступил.
+
+        Следующий опрос каждого планируется по его состоянию, а
+        подписчики, до которых не дошла очередь, ставятся в начало
+        следующего цикла: иначе при нехватке срока одни и те же подписчики
+        из хвоста пропускались бы каждый цикл.
+        """
+        due = [
+            tenant for tenant in self.scheduler.pop_due(now)
+            if tenant.name in self.registry
+            and self.registry.get(tenant.name) is tenant
+        ]
+        stats = self.run_cycle(due)
+        now = self.clock.time()
+        skipped = {id(tenant) for tenant in stats.skipped}
+        for tenant in due:
+            if id(tenant) in skipped:
+                self.scheduler.schedule(tenant, now, delay=0)
+            else:
+                self.scheduler.schedule(tenant, now)
+        return stats
+
+    def run(self, until: float = None) -> None:
+        """Опрашивает подписчиков по расписанию планировщика.
+
+        Время и ожидание берутся из часов движка, так что с VirtualClock
+        можно прогнать дни опроса за секунды. until - время по часам
+        движка, после которого опрос останавливается; без него опрос
+        бесконечен.
+        """
+        logger.info(
+            ENGINE_START_MESSAGE, len(self.registry), self.workers,
+            measure_tenant_footprint())
+        clock = self.clock
+        now = clock.time()
+        for tenant in self.registry:
+            self.scheduler.schedule(tenant, now, delay=0)
+        while until is None or clock.time() < until:
+            HEALTH.cycle_started()
+            PROFILER.cycle_started()
+            stats = self.poll_due(clock.time())
+            if stats.tenants:
+                self.log_stats(stats)
+            next_due = self.scheduler.next_due() or (
+                clock.time() + homework.RETRY_PERIOD)
+            if until is not None:
+                next_due = min(next_due, until)
+            PROFILER.cycle_finished()
+            delay = max(0.0, next_due - clock.time())
+            HEALTH.cycle_finished(delay)
+            clock.sleep(delay)
+
+    def log_stats(self, stats: CycleStats) -> None:
+        """Пишет в лог итоги цикла, пула соединений и очереди отправки."""
+        logger.info(
+            CYCLE_STATS_MESSAGE, stats.tenants, stats.sent, stats.errors,
+            len(stats.skipped), stats.duration, stats.throughput)
+        logger.info(TRANSPORT_STATS_MESSAGE, self.transport.stats())
+        logger.info(FLIGHT_STATS_MESSAGE, self.flight.stats())
+        if self.outbox is not None:
+            logger.info(OUTBOX_STATS_MESSAGE, self.outbox.stats())
+
+    def close(self) -> None:
+        """Останавливает пул потоков, закрывает соединения и хранилище."""
+        self.executor.shutdown(wait=True)
+        self.fanout.close()
+        self.transport.close()
+        self.storage.close()
+
+
+def create_engine(registry: TenantRegistry,
+                  processes: int = 1) -> PollingEngine:
+    """Создаёт движок с ботом Telegram и запущенной очередью отправки.
+
+    При ENGINE_MODE=staged запрос, разбор и отправка идут отдельными
+    этапами с собственными пулами потоков. processes - число процессов,
+    делящих бота: общий лимит отправки делится между ними поровну.
+    """
+    bot = telegram.Bot(
+        token=homework.TELEGRAM_TOKEN,
+        request=Request(con_pool_size=ENGINE_WORKERS))
+    outbox = TelegramOutbox(bot, global_rate=GLOBAL_RATE / processes).start()
+    if ENGINE_MODE == 'staged':
+        from staged_engine import StagedPollingEngine
+        return StagedPollingEngine(bot, registry, outbox=outbox)
+    return PollingEngine(bot, registry, outbox=outbox)
+
+
+def run_engine(tenants_file: str) -> None:
+    """Запускает опрос подписчиков из файла реестра."""
+    if not homework.TELEGRAM_TOKEN:
+        message = homework.ERROR_MESSAGE_TOKENS.format(['TELEGRAM_TOKEN'])
+        logger.critical(message)
+        raise ValueError(message)
+    if ENGINE_PROCESSES > 1:
+        from supervisor import run_supervisor
+        return run_supervisor(tenants_file, ENGINE_PROCESSES)
+    if ENGINE_MODE == 'async':
+        from async_engine import run_async_engine
+        return run_async_engine(tenants_file)
+    registry = load_tenants(tenants_file, timestamp=int(time.time()))
+    engine = create_engine(registry)
+    try:
+        engine.run()
+    finally:
+        engine.close()
+        engine.outbox.close()
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from deadline import DeadlineExceeded
+from metrics import REGISTRY
+
+load_dotenv()
+
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', 8))
+FANOUT_PENDING_LIMIT = int(os.getenv('FANOUT_PENDING_LIMIT', 1000))
+
+# Сообщения рассылки по нескольким чатам
+FANOUT_SEND_FAILURE_MESSAGE = 'Сбой отправки в чат %s: %s'
+FANOUT_PARTIAL_MESSAGE = (
+    'Сообщение доставлено не во все чаты: не доставлено в %s, '
+    'доставлено в %d из %d, %.3f с')
+
+FANOUT_SECONDS = REGISTRY.histogram(
+    'homework_bot_fanout_seconds',
+    'Время рассылки одного сообщения по всем чатам подписчика')
+FANOUT_SENDS = REGISTRY.counter(
+    'homework_bot_fanout_sends_total',
+    'Отправки в отдельные чаты при рассылке', ('result',))
+
+logger = logging.getLogger(__name__)
+
+
+def parse_chat_ids(value) -> list:
+    """Список чатов из строки через запятую или из списка."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(',')
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+class FanOutResult:
+    """Итог рассылки: {чат: (доставлено ли, длительность)} и общее время."""
+
+    __slots__ = ('results', 'duration')
+
+    def __init__(self, results: dict, duration: float) -> None:
+        self.results = results
+        self.duration = duration
+
+    @property
+    def failed(self) -> list:
+        """Чаты, в которые сообщение не доставлено."""
+        return [chat_id for chat_id, (ok, _) in self.results.items()
+                if not ok]
+
+    @property
+    def delivered(self) -> bool:
+        """Доставлено ли сообщение во все чаты."""
+        return not self.failed
+
+
+class FanOut:
+    """Рассылает сообщение в несколько чатов параллельно.
+
+    Отправки идут через общий ограниченный пул потоков, поэтому медленный
+    или недоступный чат не задерживает остальные. Рассылка считается
+    доставленной, когда сообщение дошло до всех чатов; чаты, которые уже
+    получили сообщение, запоминаются по ключу рассылки, и при её повторе
+    сообщение уходит только в недоставленные. Помнятся последние
+    pending_limit недоставленных рассылок.
+    """
+
+    def __init__(self, workers: int = FANOUT_WORKERS,
+                 pending_limit: int = FANOUT_PENDING_LIMIT) -> None:
+        self.workers = workers
+        self.pending_limit = pending_limit
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='fanout')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _send(self, send, chat_id: str) -> tuple:
+        started = time.monotonic()
+        expired = None
+        try:
+            ok = bool(send(chat_id))
+        except DeadlineExceeded as error:
+            ok, expired = False, error
+        except Exception as error:
+            logger.exception(FANOUT_SEND_FAILURE_MESSAGE, chat_id, error)
+            ok = False
+        FANOUT_SENDS.inc(result='ok' if ok else 'failed')
+        return ok, time.monotonic() - started, expired
+
+    def deliver(self, chat_ids: list, message: str, send,
+                key=None) -> FanOutResult:
+        """Отправляет message во все чаты функцией send(chat_id) -> bool.
+
+        key отличает рассылку от других с тем же текстом (например, имя
+        подписчика и текст); по умолчанию это чаты и текст. В результат
+        попадают только чаты, куда отправка шла сейчас. Если send бросила
+        DeadlineExceeded, доставленные чаты запоминаются, а исключение
+        бросается дальше.
+        """
+        if key is None:
+            key = (tuple(chat_ids), message)
+        started = time.monotonic()
+        with self._lock:
+            done = self._pending.get(key, set())
+        targets = [chat_id for chat_id in chat_ids if chat_id not in done]
+        if len(targets) == 1:
+            sends = [self._send(send, targets[0])]
+        else:
+            sends = list(self.executor.map(
+                lambda chat_id: self._send(send, chat_id), targets))
+        result = FanOutResult(
+            {chat_id: (ok, latency)
+             for chat_id, (ok, latency, _) in zip(targets, sends)},
+            time.monotonic() - started)
+        FANOUT_SECONDS.observe(result.duration)
+        self._remember(key, result)
+        for _, _, expired in sends:
+            if expired is not None:
+                raise expired
+        return result
+
+    def _remember(self, key, result: FanOutResult) -> None:
+        with self._lock:
+            if result.delivered:
+                self._pending.pop(key, None)
+                return
+            done = self._pending.pop(key, set())
+            done.update(
+                chat_id for chat_id, (ok, _) in result.results.items() if ok)
+            self._pending[key] = done
+            while len(self._pending) > self.pending_limit:
+                del self._pending[next(iter(self._pending))]
+        logger.warning(
+            FANOUT_PARTIAL_MESSAGE, ', '.join(map(str, result.failed)),
+            len(result.results) - len(result.failed), len(result.results),
+            result.duration)
+
+    def pending(self) -> int:
+        """Число рассылок, дошедших не до всех чатов."""
+        return len(self._pending)
+
+    def close(self) -> None:
+        """Останавливает пул потоков."""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import status_server
+from metrics import REGISTRY
+
+load_dotenv()
+
+WATCHDOG_TIMEOUT = float(os.getenv('WATCHDOG_TIMEOUT', 300))
+WATCHDOG_INTERVAL = float(os.getenv('WATCHDOG_INTERVAL', 5))
+WATCHDOG_RESTART = os.getenv('WATCHDOG_RESTART', '') == '1'
+WATCHDOG_EXIT_CODE = 70
+
+# Сообщения проверки работоспособности
+CYCLE_STALLED_REASON = 'цикл опроса идёт {age:.0f} с'
+LOOP_STALLED_REASON = 'новый цикл опроса не начат уже {age:.0f} с'
+STALL_MESSAGE = 'Опрос завис: %s'
+STALL_RECOVERED_MESSAGE = 'Опрос возобновился'
+WATCHDOG_RESTART_MESSAGE = 'Процесс перезапускается сторожем: %s'
+WATCHDOG_START_MESSAGE = 'Сторож запущен: зависанием считается %.0f с'
+
+STALLED = REGISTRY.gauge(
+    'homework_bot_stalled', 'Опрос завис по оценке сторожа (1) или нет (0)')
+
+logger = logging.getLogger(__name__)
+
+
+class LoopHealth:
+    """Отметки о ходе цикла опроса для /health и сторожа.
+
+    Цикл отмечает начало и конец каждого прохода и время, к которому
+    ожидается следующий; запрос к API и отправка в Telegram отмечают
+    свои успехи. Отметки - просто время по часам clock, поэтому их
+    выставление ничего не стоит.
+    """
+
+    def __init__(self, clock=time.time) -> None:
+        self.clock = clock
+        self.started_at = clock()
+        self.cycle_started_at = None
+        self.next_cycle_at = None
+        self.last_cycle_at = None
+        self.last_poll_at = None
+        self.last_send_at = None
+        self.backlog = lambda: 0
+
+    def cycle_started(self, at: float = None) -> None:
+        """Отмечает начало прохода цикла, по умолчанию - сейчас."""
+        self.cycle_started_at = self.clock() if at is None else at
+
+    def cycle_finished(self, next_cycle_in: float) -> None:
+        """Отмечает конец прохода и через сколько секунд будет следующий."""
+        now = self.clock()
+        self.cycle_started_at = None
+        self.last_cycle_at = now
+        self.next_cycle_at = now + next_cycle_in
+
+    def polled(self) -> None:
+        """Отмечает успешный ответ API."""
+        self.last_poll_at = self.clock()
+
+    def sent(self) -> None:
+        """Отмечает успешную отправку в Telegram."""
+        self.last_send_at = self.clock()
+
+    def set_backlog(self, function) -> None:
+        """Задаёт функцию без аргументов, возвращающую размер очереди."""
+        self.backlog = function
+
+    def stall(self, timeout: float = WATCHDOG_TIMEOUT):
+        """Причина зависания или None, если опрос идёт нормально.
+
+        Зависанием считается проход, который длится дольше timeout, и
+        проход, не начатый через timeout после ожидаемого времени.
+        """
+        now = self.clock()
+        started = self.cycle_started_at
+        if started is not None:
+            if now - started > timeout:
+                return CYCLE_STALLED_REASON.format(age=now - started)
+            return None
+        expected = self.next_cycle_at
+        if expected is not None and now - expected > timeout:
+            return LOOP_STALLED_REASON.format(
+                age=now - (self.last_cycle_at or self.started_at))
+        return None
+
+    def snapshot(self, timeout: float = WATCHDOG_TIMEOUT) -> dict:
+        """Состояние опроса для ответа /health."""
+        now = self.clock()
+
+        def age(moment):
+            return None if moment is None else round(now - moment, 3)
+
+        reason = self.stall(timeout)
+        return {
+            'status': 'stalled' if reason else 'ok',
+            'reason': reason,
+            'uptime': age(self.started_at),
+            'cycle_age': age(self.cycle_started_at),
+            'last_cycle_age': age(self.last_cycle_at),
+            'last_poll_age': age(self.last_poll_at),
+            'last_send_age': age(self.last_send_at),
+            'last_poll': self.last_poll_at,
+            'last_send': self.last_send_at,
+            'backlog': self.backlog(),
+        }
+
+
+HEALTH = LoopHealth()
+
+
+def render_health() -> tuple:
+    """Ответ /health: 200, если опрос идёт, и 503, если он завис."""
+    snapshot = HEALTH.snapshot()
+    status = 200 if snapshot['status'] == 'ok' else 503
+    return status, 'application/json', json.dumps(snapshot) + '\n'
+
+
+class Watchdog:
+    """Фоновый поток, проверяющий, что опрос не завис.
+
+    Раз в interval секунд спрашивает LoopHealth о зависании, выставляет
+    метрику homework_bot_stalled и пишет в лог. С restart=True завершает
+    процесс с кодом WATCHDOG_EXIT_CODE, чтобы его перезапустил
+    менеджер процессов: зависший сетевой вызов из потока не прервать.
+    """
+
+    def __init__(self, health: LoopHealth = HEALTH,
+                 timeout: float = WATCHDOG_TIMEOUT,
+                 interval: float = WATCHDOG_INTERVAL,
+                 restart: bool = WATCHDOG_RESTART, exit=os._exit) -> None:
+        self.health = health
+        self.timeout = timeout
+        self.interval = interval
+        self.restart = restart
+        self.exit = exit
+        self.reason = None
+        self.thread = None
+        self._stopped = threading.Event()
+
+    def check(self):
+        """Проверяет опрос один раз и возвращает причину зависания."""
+        reason = self.health.stall(self.timeout)
+        STALLED.set(1 if reason else 0)
+        if reason and self.reason is None:
+            logger.critical(STALL_MESSAGE, reason)
+        elif reason is None and self.reason is not None:
+            logger.warning(STALL_RECOVERED_MESSAGE)
+        self.reason = reason
+        if reason and self.restart:
+            logger.critical(WATCHDOG_RESTART_MESSAGE, reason)
+            self.exit(WATCHDOG_EXIT_CODE)
+        return reason
+
+    def run(self) -> None:
+        """Проверяет опрос, пока сторож не остановлен."""
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def start(self) -> 'Watchdog':
+        """Запускает сторожа в фоновом потоке."""
+        self.thread = threading.Thread(
+            target=self.run, name='watchdog', daemon=True)
+        self.thread.start()
+        logger.info(WATCHDOG_START_MESSAGE, self.timeout)
+        return self
+
+    def stop(self) -> None:
+        """Останавливает сторожа."""
+        self._stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+def start_watchdog():
+    """Запускает сторожа, если WATCHDOG_TIMEOUT больше нуля."""
+    if WATCHDOG_TIMEOUT <= 0:
+        return None
+    return Watchdog().start()
+
+
+status_server.ROUTES['/health'] = render_health
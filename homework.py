@@ -1,6 +1,6 @@
+import atexit
 import logging
 import os
-import sys
 import time
 
 from dotenv import load_dotenv
@@ -9,6 +9,22 @@ from requests.exceptions import RequestException
 import telegram
 from telegram import Bot
 
+from alerts import FailureNotifier
+from backfill import fetch_backfill
+from cassette import default_recorder
+from commands import StatusCache, start_command_listener
+from deadline import (CONNECT_TIMEOUT, READ_TIMEOUT, SEND_TIMEOUT, Deadline,
+                      DeadlineExceeded)
+from fanout import FanOut, parse_chat_ids
+from health import HEALTH, start_watchdog
+from log_config import setup_logging
+from metrics import CYCLE_SECONDS, STAGE_ERRORS, observe
+from profiling import PROFILER, install_profile_signal
+from singleflight import SingleFlight
+from state import HomeworkStateStore
+from status_server import start_status_server
+from storage import StateStorage
+
 load_dotenv()
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
@@ -18,6 +34,7 @@ TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 RETRY_PERIOD = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+TENANTS_FILE = os.getenv('TENANTS_FILE')
 
 # Сообщения для функции check_tokens
 START_MESSAGE_CHECK_TOKENS = 'Проверка переменных окружения'
@@ -26,12 +43,11 @@ ERROR_MESSAGE_TOKENS = 'Переменная окружения {0} не най
 
 # Сообщения для функции send_message
 MESSAGE_SEND_START = 'Начало отправки'
-MESSAGE_SEND_SUCCESSFULLY = 'Сообщение: {message} отправлено'
-MESSAGE_SEND_ERROR = 'Не удалось отправить сообщение: {message}. {error}'
+MESSAGE_SEND_SUCCESSFULLY = 'Сообщение: %s отправлено'
+MESSAGE_SEND_ERROR = 'Не удалось отправить сообщение: %s. %s'
 
 # Сообщения для функции get_api_answer
-API_ANSWER_LOG = (
-    'Начало запроса к {url}, {headers}, c значениями {params}')
+API_ANSWER_LOG = 'Начало запроса к %s, %s, c значениями %s'
 ERROR_ANSWER = (
     'Ошибка подключения {url}, {headers}, c значениями {params}, '
     'ошибка: {error}')
@@ -63,6 +79,7 @@ PROGRAMM_FAILURE_ERROR_MESSAGE = 'Сбой в работе программы: {
 NO_HOMEWORK_MESSAGE = 'Домашние работы отсутствуют'
 HOMEWORK_STATUS_NOT_CHANGED = 'Статус домашней работы не изменился'
 MESSAGE_NOT_SENT_ERROR = 'Повторение последней ошибки'
+BACKFILL_FAILURE_MESSAGE = 'Не удалось догнать пропущенные изменения: %s'
 
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -72,6 +89,10 @@ HOMEWORK_VERDICTS = {
 
 TOKENS_LIST = ['PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID']
 
+# Одновременные запросы с одним токеном и курсором делят один вызов API
+API_FLIGHT = SingleFlight('get_api_answer')
+FANOUT = FanOut()
+
 logger = logging.getLogger(__name__)
 
 
@@ -83,46 +104,108 @@ def check_tokens() -> bool:
         if globals()[token] == '' or globals()[token] is None
     ]
     if non_exists_variables:
-        logger.critical(ERROR_MESSAGE_TOKENS.format(non_exists_variables))
-        raise ValueError(
-            ERROR_MESSAGE_TOKENS.format(non_exists_variables))
+        message = ERROR_MESSAGE_TOKENS.format(non_exists_variables)
+        logger.critical(message)
+        raise ValueError(message)
     logger.debug(END_MESSAGE_CHECK_TOKENS)
 
 
 def send_message(bot: Bot, message: str) -> bool:
-    """Отправляет сообщения в чат, определяемый переменной окружения."""
+    """Отправляет сообщения в чаты, определяемые переменной окружения.
+
+    В TELEGRAM_CHAT_ID можно перечислить несколько чатов через запятую:
+    сообщение уходит во все параллельно и считается отправленным, когда
+    дошло до каждого.
+    """
+    chat_ids = parse_chat_ids(TELEGRAM_CHAT_ID) or [TELEGRAM_CHAT_ID]
+    return FANOUT.deliver(
+        chat_ids, message,
+        lambda chat_id: send_message_to(bot, chat_id, message)).delivered
+
+
+@observe('send_message')
+def send_message_to(bot: Bot, chat_id: str, message: str,
+                    deadline: Deadline = None) -> bool:
+    """Отправляет сообщение в указанный чат.
+
+    Таймаут отправки ограничен остатком срока deadline; если срок уже
+    истёк, бросается DeadlineExceeded.
+    """
     logger.debug(MESSAGE_SEND_START)
+    timeout = deadline.timeout('send_message') if deadline else SEND_TIMEOUT
     try:
         bot.send_message(
-            TELEGRAM_CHAT_ID, message)
-        logger.debug(
-            MESSAGE_SEND_SUCCESSFULLY.format(
-                message=message))
+            chat_id, message, timeout=timeout)
+        logger.debug(MESSAGE_SEND_SUCCESSFULLY, message)
+        HEALTH.sent()
         return True
     except telegram.error.TelegramError as error:
-        logger.exception(MESSAGE_SEND_ERROR.format(
-            message=message, error=error))
+        STAGE_ERRORS.inc(stage='send_message', type=type(error).__name__)
+        logger.exception(MESSAGE_SEND_ERROR, message, error)
         return False
 
 
+def make_headers(token: str) -> dict:
+    """Собирает заголовки авторизации для токена Практикума."""
+    return {'Authorization': f'OAuth {token}'}
+
+
 def get_api_answer(timestamp: int) -> dict:
     """Делает запрос к эндпоинту API-сервиса."""
+    return API_FLIGHT.do(
+        (HEADERS['Authorization'], timestamp),
+        request_api_answer, timestamp, HEADERS)
+
+
+@observe('get_api_answer')
+def request_api_answer(timestamp: int, headers: dict, get=None,
+                       decode=None, deadline: Deadline = None) -> dict:
+    """Делает запрос к API-сервису с заголовками конкретного токена.
+
+    get - функция с интерфейсом requests.get, по умолчанию requests.get.
+    Если задана переменная RECORD_CASSETTE, запросы пишутся в кассету.
+    decode - функция разбора тела ответа, по умолчанию response.json();
+    она читает потоковый ответ, поэтому с ней ответ закрывается при любом
+    исходе и соединение возвращается в пул.
+    deadline - срок цикла, до остатка которого урезаются таймауты;
+    таймаут после его истечения бросает DeadlineExceeded.
+    """
     params = dict(
         url=ENDPOINT,
-        headers=HEADERS,
-        params={'from_date': timestamp}
+        headers=headers,
+        params={'from_date': timestamp},
+        timeout=(
+            deadline.timeouts('get_api_answer') if deadline
+            else (CONNECT_TIMEOUT, READ_TIMEOUT)),
     )
-    logger.debug(API_ANSWER_LOG.format(**params))
+    logger.debug(API_ANSWER_LOG, ENDPOINT, headers, params['params'])
+    get = get or requests.get
+    if deadline is not None:
+        get = deadline.guard(get, 'get_api_answer')
+    recorder = default_recorder()
+    if recorder is not None:
+        get = recorder.wrap(get)
     try:
-        response = requests.get(**params)
+        response = get(**params)
     except RequestException as error:
         raise ConnectionError(
             ERROR_ANSWER.format(error=error, **params))
+    try:
+        data = read_api_answer(response, params, decode)
+    finally:
+        if decode is not None:
+            response.close()
+    HEALTH.polled()
+    return data
+
+
+def read_api_answer(response, params: dict, decode=None) -> dict:
+    """Проверяет код и тело ответа API и возвращает разобранные данные."""
     if response.status_code != 200:
         raise RuntimeError(
             REQUEST_FAILED_MESSAGE.format(
                 status=response.status_code, **params))
-    data = response.json()
+    data = decode(response) if decode else response.json()
     for error in ('code', 'error'):
         if error in data:
             raise RuntimeError(
@@ -131,6 +214,7 @@ def get_api_answer(timestamp: int) -> dict:
     return data
 
 
+@observe('check_response')
 def check_response(response: dict) -> list:
     """Проверяет ответ API на соответствие документации."""
     logger.debug(CHECK_RESPONSE_START_MESSAGE)
@@ -146,6 +230,7 @@ def check_response(response: dict) -> list:
     return homeworks
 
 
+@observe('parse_status')
 def parse_status(homework: dict) -> str:
     """Извлекает из информации о домашней работе статус этой работы."""
     logger.debug(PARSE_STATUS_START_MESSAGE)
@@ -162,51 +247,117 @@ def parse_status(homework: dict) -> str:
         homework.get('homework_name'), HOMEWORK_VERDICTS[status])
 
 
+def collect_updates(state: HomeworkStateStore, homeworks: list) -> list:
+    """Возвращает пары (работа, сообщение) для изменившихся статусов."""
+    return [
+        (homework, parse_status(homework))
+        for homework in state.diff(homeworks)
+    ]
+
+
+def send_updates(bot: Bot, state: HomeworkStateStore, updates: list,
+                 deadline: Deadline = None) -> bool:
+    """Отправляет сообщения об изменениях и запоминает доставленные.
+
+    Возвращает True, если доставлены все сообщения. Когда срок deadline
+    истекает, оставшиеся сообщения откладываются до следующего цикла.
+    """
+    delivered = True
+    for homework, message in updates:
+        if deadline is not None:
+            try:
+                deadline.check('send_message')
+            except DeadlineExceeded:
+                return False
+        if send_message(bot, message):
+            state.commit(homework)
+        else:
+            delivered = False
+    return delivered
+
+
+def catch_up(bot: Bot, state: HomeworkStateStore, timestamp: int) -> int:
+    """Досылает изменения, пропущенные, пока бот не работал.
+
+    Изменения с сохранённого курсора запрашиваются одним запросом и
+    отправляются по порядку дат. Возвращает новый курсор; если запрос не
+    удался, ответ не разобрался или доставлено не всё, курсор остаётся
+    прежним и пропуск догонит обычный опрос.
+    """
+    def fetch(since: int) -> tuple:
+        response = get_api_answer(since)
+        return check_response(response), response.get('current_date')
+
+    try:
+        backfill = fetch_backfill(fetch, timestamp, int(time.time()))
+        if backfill is None:
+            return timestamp
+        homeworks, current_date = backfill
+        if send_updates(bot, state, collect_updates(state, homeworks)):
+            return current_date or timestamp
+    except Exception as error:
+        logger.exception(BACKFILL_FAILURE_MESSAGE, error)
+    return timestamp
+
+
 def main():
     """Основная логика работы бота."""
     logger.info(BOT_START_MESSAGE)
     check_tokens()
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    last_message = ''
+    cache = StatusCache(HOMEWORK_VERDICTS)
+    start_command_listener(
+        bot, cache, parse_chat_ids(TELEGRAM_CHAT_ID), str(TELEGRAM_CHAT_ID))
+    state = HomeworkStateStore()
+    storage = StateStorage()
+    atexit.register(storage.close)
+    timestamp, alerts = storage.restore(
+        str(TELEGRAM_CHAT_ID), state, default=int(time.time()))
+    timestamp = catch_up(bot, state, timestamp)
+    notifier = FailureNotifier(PROGRAMM_FAILURE_ERROR_MESSAGE)
+    notifier.restore(alerts)
+    HEALTH.set_backlog(FANOUT.pending)
     while True:
+        HEALTH.cycle_started()
+        PROFILER.cycle_started()
+        cycle_started = time.monotonic()
+        deadline = Deadline()
         try:
             response = get_api_answer(timestamp)
             homeworks = check_response(response)
-            if homeworks:
-                message = parse_status(homeworks[0])
-            else:
+            cache.checked(str(TELEGRAM_CHAT_ID), homeworks)
+            if not homeworks:
                 logger.debug(NO_HOMEWORK_MESSAGE)
-            if message != last_message:
-                if send_message(bot, message):
-                    last_message = message
-                    timestamp = response.get('current_date', timestamp)
-            else:
+            updates = collect_updates(state, homeworks)
+            if not updates:
                 logger.debug(HOMEWORK_STATUS_NOT_CHANGED)
+            if send_updates(bot, state, updates, deadline):
+                timestamp = response.get('current_date', timestamp)
         except Exception as error:
-            message = PROGRAMM_FAILURE_ERROR_MESSAGE.format(error=error)
-            logger.exception(message)
-            if message != last_message:
-                if send_message(bot, message):
-                    last_message = message
+            logger.exception(PROGRAMM_FAILURE_ERROR_MESSAGE.format(
+                error=error))
+            message = notifier.check(error)
+            if message is None:
+                logger.debug(MESSAGE_NOT_SENT_ERROR)
+            elif send_message(bot, message):
+                notifier.delivered(error)
         finally:
+            CYCLE_SECONDS.observe(time.monotonic() - cycle_started)
+            deadline.finish()
+            storage.remember(
+                str(TELEGRAM_CHAT_ID), timestamp, notifier.dump(), state)
+            PROFILER.cycle_finished()
+            HEALTH.cycle_finished(RETRY_PERIOD)
             time.sleep(RETRY_PERIOD)
 
 
 if __name__ == '__main__':
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    FILENAME = os.path.join(BASE_DIR, 'homework_result.log')
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format=(
-            '%(asctime)s - %(levelname)s -'
-            '%(funcName)s - %(lineno)d - %(message)s'
-        ),
-        handlers=[
-            logging.FileHandler(
-                FILENAME, encoding='UTF-8', mode='w'
-            ),
-            logging.StreamHandler(sys.stdout)
-        ],
-    )
-    main()
+    setup_logging()
+    start_status_server()
+    start_watchdog()
+    install_profile_signal()
+    if TENANTS_FILE:
+        from engine import run_engine
+        run_engine(TENANTS_FILE)
+    else:
+        main()
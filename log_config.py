@@ -0,0 +1,79 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import sys
+from logging.handlers import (QueueHandler, QueueListener,
+                              RotatingFileHandler, TimedRotatingFileHandler)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.getenv('LOG_FILE', os.path.join(BASE_DIR, 'homework_result.log'))
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+LOG_FORMAT = (
+    '%(asctime)s - %(levelname)s -'
+    '%(funcName)s - %(lineno)d - %(message)s'
+)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Ставит запись в очередь, не форматируя её в потоке вызова.
+
+    В вызывающем потоке только подставляются аргументы сообщения; время,
+    трассировка исключения и запись на диск - забота потока-слушателя.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Фиксирует текст сообщения, оставляя остальное слушателю."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def make_file_handler(filename: str = LOG_FILE,
+                      rotation: str = LOG_ROTATION) -> logging.Handler:
+    """Файловый обработчик с ротацией по размеру или по времени."""
+    if rotation == 'time':
+        return TimedRotatingFileHandler(
+            filename, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT,
+            encoding='UTF-8')
+    return RotatingFileHandler(
+        filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+        encoding='UTF-8')
+
+
+def stop_listener(listener: QueueListener) -> None:
+    """Дописывает очередь и останавливает слушателя, если он запущен."""
+    if listener._thread is not None:
+        listener.stop()
+
+
+def setup_logging(filename: str = LOG_FILE, level: str = LOG_LEVEL,
+                  rotation: str = LOG_ROTATION) -> QueueListener:
+    """Настраивает логирование через очередь и фоновый поток.
+
+    Вызовы logger.* только кладут запись в очередь, поэтому запись в файл
+    и stdout никогда не задерживает цикл опроса. Слушатель останавливается
+    при завершении процесса, дописав очередь.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [make_file_handler(filename, rotation),
+                logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    logging.basicConfig(
+        level=level, handlers=[DeferredQueueHandler(log_queue)], force=True)
+    return listener
@@ -0,0 +1,250 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import status_server
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [
+        '{0}="{1}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """Базовая метрика с набором меток."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str,
+                 labels: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def samples(self):
+        """Пары (суффикс и метки, значение) для текстового формата."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield _format_labels(self.labels, key), value
+
+    def render(self) -> list:
+        """Строки метрики в текстовом формате Prometheus."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines.extend(
+            f'{self.name}{labels} {value}'
+            for labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Увеличивает счётчик."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Текущее значение счётчика."""
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Мгновенное значение, например глубина очереди."""
+
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._functions = {}
+
+    def set(self, value: float, **labels) -> None:
+        """Устанавливает значение."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function, **labels) -> None:
+        """Вычисляет значение вызовом function при каждом чтении."""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels) -> float:
+        """Текущее значение."""
+        key = self._key(labels)
+        function = self._functions.get(key)
+        return function() if function else self._values.get(key, 0)
+
+    def samples(self):
+        """Пары (метки, значение), включая вычисляемые значения."""
+        yield from super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            yield _format_labels(self.labels, key), function()
+
+
+class Histogram(Metric):
+    """Гистограмма длительностей с накопительными корзинами."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """Учитывает одно наблюдение."""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [
+                    [0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Измеряет длительность блока with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        """Число наблюдений."""
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def render(self) -> list:
+        """Строки гистограммы в текстовом формате Prometheus."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            items = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            ]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Набор метрик процесса."""
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str,
+                labels: tuple = ()) -> Counter:
+        """Возвращает счётчик, создавая его при первом обращении."""
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str,
+              labels: tuple = ()) -> Gauge:
+        """Возвращает мгновенную метрику."""
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """Возвращает гистограмму."""
+        return self._get_or_create(
+            Histogram, name, documentation, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    'homework_bot_stage_seconds', 'Длительность этапов конвейера',
+    ('stage',))
+STAGE_ERRORS = REGISTRY.counter(
+    'homework_bot_stage_errors_total', 'Ошибки этапов конвейера по типам',
+    ('stage', 'type'))
+CYCLE_SECONDS = REGISTRY.histogram(
+    'homework_bot_cycle_seconds', 'Длительность цикла опроса',
+    buckets=DEFAULT_BUCKETS + (60.0, 120.0, 300.0))
+QUEUE_DEPTH = REGISTRY.gauge(
+    'homework_bot_queue_depth', 'Глубина очередей', ('queue',))
+
+
+def observe(stage: str):
+    """Декоратор: измеряет длительность этапа и считает его ошибки."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                STAGE_ERRORS.inc(stage=stage, type=type(error).__name__)
+                raise
+            finally:
+                STAGE_SECONDS.observe(
+                    time.perf_counter() - started, stage=stage)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> tuple:
+    """Ответ эндпоинта /metrics."""
+    return 200, 'text/plain; version=0.0.4', REGISTRY.render()
+
+
+status_server.ROUTES['/metrics'] = render_metrics
@@ -0,0 +1,281 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import telegram
+
+import homework
+from deadline import SEND_TIMEOUT
+from health import HEALTH
+from metrics import observe
+
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', 3))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 4))
+OUTBOX_MAX_SIZE = int(os.getenv('OUTBOX_MAX_SIZE', 10000))
+MAX_SEND_ATTEMPTS = 5
+RETRY_DELAY = 1.0
+
+# Сообщения очереди отправки
+OUTBOX_FULL_MESSAGE = (
+    'Очередь отправки заполнена, сообщение для %s отложено')
+RETRY_AFTER_MESSAGE = 'Telegram просит подождать %s с перед отправкой в %s'
+SEND_RETRY_MESSAGE = 'Повтор отправки в %s (попытка %d): %s'
+MESSAGE_DROPPED = 'Сообщение для %s отброшено после %d попыток: %s'
+OUTBOX_STATS_MESSAGE = (
+    'Очередь отправки: в очереди %(depth)d, отправлено %(sent)d, '
+    'повторов %(retried)d, отброшено %(dropped)d, '
+    '%(rate).1f сообщений/с')
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Забирает токен и возвращает 0 или время ожидания токена."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Возвращает взятый токен."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def block(self, until: float) -> None:
+        """Запрещает выдачу токенов до момента until."""
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class TelegramOutbox:
+    """Очередь исходящих сообщений с ограничением частоты отправки.
+
+    Общее ведро токенов ограничивает бота целиком, ведро каждого чата -
+    отдельный чат. Ответ Telegram RetryAfter откладывает отправку в чат на
+    указанное время, сетевые ошибки повторяются несколько раз. Очередь
+    разбирают рабочие потоки; сообщения, которые ещё нельзя отправить,
+    ждут в куче по времени готовности и не блокируют остальные чаты.
+
+    put() возвращает Future, которое получает True после отправки и False,
+    если сообщение отброшено: так вызывающий сохраняет состояние только
+    после настоящей доставки. Повторная постановка сообщения, которое ещё
+    в очереди, возвращает то же Future и не дублирует его.
+    """
+
+    def __init__(self, bot: telegram.Bot, workers: int = OUTBOX_WORKERS,
+                 global_rate: float = GLOBAL_RATE,
+                 chat_rate: float = CHAT_RATE, chat_burst: int = CHAT_BURST,
+                 max_size: int = OUTBOX_MAX_SIZE) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_size = max_size
+        self.global_bucket = TokenBucket(
+            global_rate, global_rate, time.monotonic())
+        self.chat_buckets = {}
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+        self._heap = []
+        self._futures = {}
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._started = None
+        self._threads = []
+
+    def start(self) -> 'TelegramOutbox':
+        """Запускает рабочие потоки."""
+        self._started = time.monotonic()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'outbox-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, chat_id: str, message: str):
+        """Ставит сообщение в очередь и возвращает Future с итогом доставки.
+
+        При переполнении очереди возвращает None.
+        """
+        with self._condition:
+            future = self._futures.get((chat_id, message))
+            if future is not None:
+                return future
+            if len(self._heap) >= self.max_size:
+                logger.warning(OUTBOX_FULL_MESSAGE, chat_id)
+                return None
+            future = self._futures[chat_id, message] = Future()
+            self._push(time.monotonic(), chat_id, message, 0)
+            self._condition.notify()
+        return future
+
+    def set_global_rate(self, rate: float) -> None:
+        """Меняет общее ограничение частоты отправки."""
+        with self._condition:
+            self.global_bucket = TokenBucket(rate, rate, time.monotonic())
+            self._condition.notify_all()
+
+    @property
+    def depth(self) -> int:
+        """Число сообщений в очереди и в отправке."""
+        with self._condition:
+            return len(self._heap) + self._in_flight
+
+    def stats(self) -> dict:
+        """Счётчики очереди и средняя скорость отправки."""
+        elapsed = time.monotonic() - (self._started or time.monotonic())
+        return {
+            'depth': self.depth,
+            'sent': self.sent,
+            'retried': self.retried,
+            'dropped': self.dropped,
+            'rate': self.sent / elapsed if elapsed else 0.0,
+        }
+
+    def join(self, timeout: float = None) -> bool:
+        """Ждёт опустошения очереди. Возвращает True, если дождались."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._heap or self._in_flight:
+                remaining = (
+                    None if deadline is None else deadline - time.monotonic())
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = None) -> None:
+        """Дожидается отправки очереди и останавливает потоки."""
+        self.join(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _push(self, ready_at: float, chat_id: str, message: str,
+              attempt: int) -> None:
+        heapq.heappush(
+            self._heap,
+            (ready_at, next(self._sequence), chat_id, message, attempt))
+
+    def _next(self):
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                item = heapq.heappop(self._heap)
+                delay = self._reserve(item[2])
+                if delay:
+                    self._push(time.monotonic() + delay, *item[2:])
+                    continue
+                self._in_flight += 1
+                return item
+
+    def _reserve(self, chat_id: str) -> float:
+        now = time.monotonic()
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(
+                self.chat_rate, self.chat_burst, now)
+        delay = bucket.reserve(now)
+        if delay:
+            return delay
+        delay = self.global_bucket.reserve(now)
+        if delay:
+            bucket.refund()
+        return delay
+
+    def _work(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            _, _, chat_id, message, attempt = item
+            try:
+                self._send(chat_id, message, attempt + 1)
+            except Exception as error:
+                self._drop(chat_id, message, attempt + 1, error)
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    @observe('send_message')
+    def _deliver(self, chat_id: str, message: str) -> None:
+        self.bot.send_message(chat_id, message, timeout=SEND_TIMEOUT)
+
+    def _send(self, chat_id: str, message: str, attempt: int) -> None:
+        try:
+            self._deliver(chat_id, message)
+        except telegram.error.RetryAfter as error:
+            logger.warning(RETRY_AFTER_MESSAGE, error.retry_after, chat_id)
+            ready_at = time.monotonic() + error.retry_after
+            with self._condition:
+                self.chat_buckets[chat_id].block(ready_at)
+                self.retried += 1
+                self._push(ready_at, chat_id, message, attempt - 1)
+            return
+        except telegram.error.BadRequest as error:
+            self._drop(chat_id, message, attempt, error)
+            return
+        except telegram.error.NetworkError as error:
+            if attempt < MAX_SEND_ATTEMPTS:
+                logger.warning(SEND_RETRY_MESSAGE, chat_id, attempt, error)
+                with self._condition:
+                    self.retried += 1
+                    self._push(
+                        time.monotonic() + RETRY_DELAY * 2 ** attempt,
+                        chat_id, message, attempt)
+                return
+            self._drop(chat_id, message, attempt, error)
+            return
+        except telegram.error.TelegramError as error:
+            self._drop(chat_id, message, attempt, error)
+            return
+        with self._condition:
+            self.sent += 1
+            future = self._futures.pop((chat_id, message))
+        future.set_result(True)
+        HEALTH.sent()
+        logger.debug(homework.MESSAGE_SEND_SUCCESSFULLY, message)
+
+    def _drop(self, chat_id: str, message: str, attempt: int,
+              error: Exception) -> None:
+        logger.error(MESSAGE_DROPPED, chat_id, attempt, error)
+        with self._condition:
+            self.dropped += 1
+            future = self._futures.pop((chat_id, message))
+        future.set_result(False)
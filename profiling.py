@@ -0,0 +1,161 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+
+import status_server
+
+load_dotenv()
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_CYCLES = int(os.getenv('PROFILE_CYCLES', 3))
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', 40))
+PROFILE_SIGNAL = 'SIGUSR1'
+TRACEMALLOC_FRAMES = 5
+
+# Сообщения профилирования
+PROFILE_REQUESTED_MESSAGE = 'Профилирование запрошено на %d циклов'
+PROFILE_STARTED_MESSAGE = 'Профилирование начато, результаты - в %s'
+PROFILE_SAVED_MESSAGE = 'Профиль сохранён: %s'
+MEMORY_DIFF_SAVED_MESSAGE = 'Разница памяти за цикл %d сохранена: %s'
+PROFILE_SAVE_FAILURE_MESSAGE = 'Не удалось сохранить профиль в %s: %s'
+PROFILE_ACCEPTED = 'Профилирование следующих {cycles} циклов запрошено\n'
+
+logger = logging.getLogger(__name__)
+
+
+class CycleProfiler:
+    """Профилирует несколько следующих циклов опроса по запросу.
+
+    request() только запоминает число циклов и не берёт блокировок: Python
+    выполняет обработчик сигнала в главном потоке, возможно посреди
+    cycle_started, и блокировка там привела бы к взаимоблокировке. Поэтому
+    request() можно вызывать из обработчика сигнала или HTTP-запроса, не
+    останавливая опрос. В начале следующего цикла включаются cProfile (для
+    потока цикла, паузы между циклами не учитываются) и tracemalloc. После
+    каждого цикла в directory пишется разница снимков памяти с предыдущим,
+    а после последнего - статистика по функциям в формате pstats (.prof) и
+    текстом (.txt). Ошибка записи не прерывает опрос.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, top: int = PROFILE_TOP,
+                 clock=time.time) -> None:
+        self.directory = directory
+        self.top = top
+        self.clock = clock
+        self.requested = 0
+        self.remaining = 0
+        self.cycle = 0
+        self.profile = None
+        self.snapshot = None
+        self.stamp = None
+        self.started_tracing = False
+
+    @property
+    def active(self) -> bool:
+        """Идёт ли профилирование."""
+        return self.profile is not None
+
+    def request(self, cycles: int = PROFILE_CYCLES) -> None:
+        """Просит профилировать cycles следующих циклов."""
+        self.requested = max(self.requested, cycles)
+        logger.info(PROFILE_REQUESTED_MESSAGE, cycles)
+
+    def _path(self, suffix: str) -> str:
+        return os.path.join(
+            self.directory, f'profile-{self.stamp}{suffix}')
+
+    def cycle_started(self) -> None:
+        """Включает профилирование, если оно запрошено или уже идёт."""
+        if self.active:
+            self.profile.enable()
+            return
+        cycles = self.requested
+        if not cycles:
+            return
+        self.requested = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.stamp = time.strftime(
+            '%Y%m%d-%H%M%S', time.localtime(self.clock()))
+        self.remaining = cycles
+        self.cycle = 0
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.snapshot = tracemalloc.take_snapshot()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        logger.info(PROFILE_STARTED_MESSAGE, self.directory)
+
+    def cycle_finished(self) -> None:
+        """Сохраняет разницу памяти за цикл, а после последнего - профиль."""
+        if not self.active:
+            return
+        self.profile.disable()
+        self.cycle += 1
+        self.remaining -= 1
+        try:
+            self._save_memory_diff()
+            if self.remaining <= 0:
+                self._save_profile()
+        except OSError as error:
+            logger.exception(
+                PROFILE_SAVE_FAILURE_MESSAGE, self.directory, error)
+        if self.remaining > 0:
+            return
+        self.profile = None
+        self.snapshot = None
+        if self.started_tracing:
+            tracemalloc.stop()
+
+    def _save_memory_diff(self) -> None:
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        path = self._path(f'-memory-{self.cycle}.txt')
+        with open(path, 'w', encoding='UTF-8') as file:
+            for stat in snapshot.compare_to(
+                    self.snapshot, 'lineno')[:self.top]:
+                file.write(f'{stat}\n')
+        self.snapshot = snapshot
+        logger.info(MEMORY_DIFF_SAVED_MESSAGE, self.cycle, path)
+
+    def _save_profile(self) -> None:
+        path = self._path('.prof')
+        self.profile.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(self.profile, stream=text).sort_stats(
+            'cumulative').print_stats(self.top)
+        with open(self._path('.txt'), 'w', encoding='UTF-8') as file:
+            file.write(text.getvalue())
+        logger.info(PROFILE_SAVED_MESSAGE, path)
+
+
+PROFILER = CycleProfiler()
+
+
+def render_profile() -> tuple:
+    """Ответ /profile: запрашивает профилирование PROFILE_CYCLES циклов."""
+    PROFILER.request(PROFILE_CYCLES)
+    return 202, 'text/plain', PROFILE_ACCEPTED.format(cycles=PROFILE_CYCLES)
+
+
+def install_profile_signal(profiler: CycleProfiler = PROFILER):
+    """Запрашивает профилирование по сигналу SIGUSR1.
+
+    Вызывается из главного потока. Где сигнала нет, ничего не делает.
+    """
+    signum = getattr(signal, PROFILE_SIGNAL, None)
+    if signum is None:
+        return None
+    return signal.signal(
+        signum, lambda *args: profiler.request(PROFILE_CYCLES))
+
+
+status_server.ROUTES['/profile'] = render_profile
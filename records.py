@@ -0,0 +1,62 @@
+import zlib
+from datetime import datetime
+
+# Коды статусов из HOMEWORK_VERDICTS. Код сохраняется в базе состояния,
+# поэтому новые статусы можно только дописывать в конец.
+STATUS_CODES = (None, 'approved', 'reviewing', 'rejected')
+STATUS_INDEX = {status: code for code, status in enumerate(STATUS_CODES)}
+STATUS_BITS = 3
+
+
+def encode_date(date_updated) -> int:
+    """Переводит date_updated из ответа API в целое число.
+
+    Дата в формате ISO 8601 становится unix-временем; нераспознанная
+    строка - её контрольной суммой, чтобы смена значения была заметна.
+    """
+    if not date_updated:
+        return 0
+    try:
+        return int(datetime.fromisoformat(
+            date_updated.replace('Z', '+00:00')).timestamp())
+    except (TypeError, ValueError, AttributeError):
+        return zlib.crc32(str(date_updated).encode())
+
+
+def pack_state(status, date_updated) -> int:
+    """Упаковывает статус и дату обновления работы в одно целое."""
+    return (encode_date(date_updated) << STATUS_BITS) | STATUS_INDEX.get(
+        status, 0)
+
+
+def unpack_status(state: int):
+    """Статус работы из упакованного состояния."""
+    return STATUS_CODES[state & ((1 << STATUS_BITS) - 1)]
+
+
+def unpack_updated(state: int) -> int:
+    """Дата обновления работы (unix-время) из упакованного состояния."""
+    return state >> STATUS_BITS
+
+
+class HomeworkRecord:
+    """Запись о домашней работе: ключ и упакованное состояние."""
+
+    __slots__ = ('key', 'state')
+
+    def __init__(self, key, state: int) -> None:
+        self.key = key
+        self.state = state
+
+    @property
+    def status(self):
+        """Статус работы."""
+        return unpack_status(self.state)
+
+    @property
+    def updated(self) -> int:
+        """Дата обновления работы в unix-времени."""
+        return unpack_updated(self.state)
+
+    def __repr__(self) -> str:
+        return f'HomeworkRecord({self.key!r}, {self.status!r})'
@@ -0,0 +1,78 @@
+import heapq
+import itertools
+import os
+import random
+
+import homework
+
+REVIEWING_PERIOD = int(os.getenv('REVIEWING_PERIOD', 120))
+IDLE_PERIOD = int(os.getenv('IDLE_PERIOD', 3600))
+ERROR_BASE_PERIOD = int(os.getenv('ERROR_BASE_PERIOD', 30))
+ERROR_MAX_PERIOD = int(os.getenv('ERROR_MAX_PERIOD', 3600))
+
+
+class PollPolicy:
+    """Выбирает интервал до следующего опроса по состоянию подписчика.
+
+    Работа на проверке опрашивается часто, а если все работы приняты -
+    редко. После ошибок интервал растёт экспоненциально со случайным
+    разбросом, чтобы подписчики не били в API одновременно.
+    """
+
+    def __init__(self, default: float = homework.RETRY_PERIOD,
+                 reviewing: float = REVIEWING_PERIOD,
+                 idle: float = IDLE_PERIOD,
+                 error_base: float = ERROR_BASE_PERIOD,
+                 error_max: float = ERROR_MAX_PERIOD,
+                 rng: random.Random = None) -> None:
+        self.default = default
+        self.reviewing = reviewing
+        self.idle = idle
+        self.error_base = error_base
+        self.error_max = error_max
+        self.rng = rng or random.Random()
+
+    def next_interval(self, tenant) -> float:
+        """Интервал в секундах до следующего опроса подписчика."""
+        if tenant.failures:
+            ceiling = min(
+                self.error_max,
+                self.error_base * 2 ** (tenant.failures - 1))
+            return self.rng.uniform(ceiling / 2, ceiling)
+        statuses = tenant.homeworks.statuses()
+        if 'reviewing' in statuses:
+            return self.reviewing
+        if statuses == {'approved'}:
+            return self.idle
+        return self.default
+
+
+class PollScheduler:
+    """Очередь подписчиков, упорядоченная по времени следующего опроса."""
+
+    def __init__(self, policy: PollPolicy = None) -> None:
+        self.policy = policy or PollPolicy()
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def schedule(self, tenant, now: float, delay: float = None) -> float:
+        """Планирует опрос подписчика и возвращает его время."""
+        if delay is None:
+            delay = self.policy.next_interval(tenant)
+        due = now + delay
+        heapq.heappush(self._heap, (due, next(self._sequence), tenant))
+        return due
+
+    def pop_due(self, now: float) -> list:
+        """Извлекает подписчиков, время опроса которых наступило."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def next_due(self):
+        """Ближайшее запланированное время опроса или None."""
+        return self._heap[0][0] if self._heap else None
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -0,0 +1,69 @@
+import threading
+
+from metrics import REGISTRY
+
+SINGLEFLIGHT_CALLS = REGISTRY.counter(
+    'homework_bot_singleflight_total',
+    'Вызовы через single-flight: miss - выполнен запрос, '
+    'hit - получен результат чужого запроса', ('flight', 'result'))
+
+
+class _Call:
+    """Выполняющийся вызов и его результат."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Склеивает одновременные одинаковые вызовы в один.
+
+    Первый вызов с ключом выполняет функцию, а вызовы с тем же ключом,
+    пришедшие до его завершения, ждут и получают тот же результат или то
+    же исключение. Результат не кэшируется: следующий вызов после
+    завершения снова идёт к источнику. Все ждущие получают один и тот же
+    объект, поэтому менять его нельзя.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def do(self, key, function, *args, **kwargs):
+        """Вызывает function или присоединяется к такому же вызову."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.misses += 1
+            else:
+                self.hits += 1
+        SINGLEFLIGHT_CALLS.inc(
+            flight=self.name, result='miss' if leader else 'hit')
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Счётчики вызовов: hits - сэкономленные запросы."""
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,177 @@
+import logging
+import os
+import queue
+import threading
+
+from deadline import Deadline, DeadlineExceeded
+from engine import CycleStats, PollingEngine, persist_tenants, status_updates
+from metrics import CYCLE_SECONDS, QUEUE_DEPTH
+
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', 32))
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', 2))
+SEND_WORKERS = int(os.getenv('SEND_WORKERS', 8))
+STAGE_QUEUE_SIZE = int(os.getenv('STAGE_QUEUE_SIZE', 256))
+
+# Сообщения конвейера этапов
+STAGE_FAILURE_MESSAGE = 'Сбой этапа %s: %s'
+STAGED_ENGINE_START_MESSAGE = (
+    'Конвейер запущен: запрос %d, разбор %d, отправка %d потоков, '
+    'очереди по %d')
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """Этап конвейера: потоки, разбирающие ограниченную очередь.
+
+    Обработчик получает элемент и возвращает элементы для следующего
+    этапа (или None). Если очередь следующего этапа заполнена, потоки
+    этапа ждут: так медленный этап притормаживает предыдущие, а не
+    копит в памяти неограниченную очередь.
+    """
+
+    def __init__(self, name: str, handler, workers: int,
+                 maxsize: int = STAGE_QUEUE_SIZE,
+                 output: 'Stage' = None) -> None:
+        self.name = name
+        self.handler = handler
+        self.output = output
+        self.queue = queue.Queue(maxsize)
+        self.threads = [
+            threading.Thread(
+                target=self._work, name=f'{name}-{index}', daemon=True)
+            for index in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+        QUEUE_DEPTH.set_function(self.queue.qsize, queue=name)
+
+    def put(self, item) -> None:
+        """Ставит элемент в очередь, ожидая места в ней."""
+        self.queue.put(item)
+
+    def _work(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                for result in self.handler(item) or ():
+                    self.output.put(result)
+            except Exception as error:
+                logger.exception(STAGE_FAILURE_MESSAGE, self.name, error)
+            finally:
+                self.queue.task_done()
+
+    def join(self) -> None:
+        """Ждёт, пока все поставленные элементы будут обработаны."""
+        self.queue.join()
+
+    def close(self) -> None:
+        """Останавливает потоки этапа, доработав очередь."""
+        for _ in self.threads:
+            self.queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+
+class _Cycle:
+    """Общие для элементов одного цикла срок и итоги.
+
+    results - пары (подписчик, результат шага, как у poll_tenant).
+    """
+
+    __slots__ = ('deadline', 'results')
+
+    def __init__(self, deadline: Deadline) -> None:
+        self.deadline = deadline
+        self.results = []
+
+
+class StagedPollingEngine(PollingEngine):
+    """Движок, в котором запрос, разбор и отправка - отдельные этапы.
+
+    Этапы связаны ограниченными очередями и имеют собственные пулы
+    потоков, поэтому медленная отправка в Telegram не задерживает
+    запросы к API других подписчиков, и наоборот: пропускная
+    способность определяется самым медленным этапом, а не суммой
+    этапов. Сообщения одного подписчика отправляются одним потоком по
+    порядку, курсор сдвигается только после отправки всех.
+    """
+
+    def __init__(self, bot, registry, fetch_workers: int = FETCH_WORKERS,
+                 parse_workers: int = PARSE_WORKERS,
+                 send_workers: int = SEND_WORKERS,
+                 queue_size: int = STAGE_QUEUE_SIZE, **kwargs) -> None:
+        super().__init__(bot, registry, workers=fetch_workers, **kwargs)
+        self.send_stage = Stage(
+            'send', self._send, send_workers, queue_size)
+        self.parse_stage = Stage(
+            'parse', self._parse, parse_workers, queue_size,
+            output=self.send_stage)
+        self.fetch_stage = Stage(
+            'fetch', self._fetch, fetch_workers, queue_size,
+            output=self.parse_stage)
+        self.stages = (self.fetch_stage, self.parse_stage, self.send_stage)
+        logger.info(
+            STAGED_ENGINE_START_MESSAGE, fetch_workers, parse_workers,
+            send_workers, queue_size)
+
+    def _fetch(self, item: tuple):
+        cycle, tenant = item
+        try:
+            response = self.fetch(tenant, cycle.deadline)
+        except DeadlineExceeded:
+            cycle.results.append((tenant, (0, False, True)))
+            return None
+        except Exception as error:
+            return [(cycle, tenant, None, error)]
+        return [(cycle, tenant, response, None)]
+
+    def _parse(self, item: tuple):
+        cycle, tenant, response, error = item
+        if error is not None:
+            return [(cycle, tenant, None, None, error)]
+        try:
+            updates = status_updates(tenant, response)
+        except Exception as error:
+            return [(cycle, tenant, None, None, error)]
+        return [(cycle, tenant, response, updates, None)]
+
+    def _send(self, item: tuple) -> None:
+        cycle, tenant, response, updates, error = item
+        if error is not None:
+            self.fail(tenant, error, cycle.deadline)
+            cycle.results.append((tenant, (0, True, False)))
+            return
+        try:
+            sent = self.deliver(tenant, response, updates, cycle.deadline)
+        except Exception as error:
+            self.fail(tenant, error, cycle.deadline)
+            cycle.results.append((tenant, (0, True, False)))
+            return
+        cycle.results.append((tenant, (sent, False, False)))
+
+    def run_cycle(self, tenants: list = None) -> CycleStats:
+        """Пропускает подписчиков через этапы и возвращает итоги цикла."""
+        if tenants is None:
+            tenants = list(self.registry)
+        started = self.clock.monotonic()
+        cycle = _Cycle(Deadline(self.cycle_deadline, self.clock.monotonic))
+        for tenant in tenants:
+            self.fetch_stage.put((cycle, tenant))
+        for stage in self.stages:
+            stage.join()
+        persist_tenants(self.storage, tenants)
+        duration = self.clock.monotonic() - started
+        CYCLE_SECONDS.observe(duration)
+        cycle.deadline.finish()
+        return CycleStats.collect(cycle.results, duration)
+
+    def close(self) -> None:
+        """Останавливает этапы, затем пул соединений и хранилище."""
+        for stage in self.stages:
+            stage.close()
+        super().close()
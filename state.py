@@ -0,0 +1,83 @@
+from records import HomeworkRecord, pack_state, unpack_status
+
+
+class HomeworkStateStore:
+    """Последние известные статусы домашних работ.
+
+    Ключ - id работы, а если его нет - homework_name. Значение - статус и
+    дата обновления, упакованные в одно целое (см. records.pack_state):
+    так запись занимает вдвое меньше памяти, чем кортеж со строками.
+    Ответ API сравнивается с хранилищем за один проход, поэтому сообщения
+    формируются только для реальных изменений.
+    """
+
+    __slots__ = ('_states', '_changes')
+
+    def __init__(self) -> None:
+        self._states = {}
+        self._changes = {}
+
+    @staticmethod
+    def key(homework: dict):
+        """Ключ домашней работы в хранилище."""
+        return homework.get('id', homework.get('homework_name'))
+
+    def diff(self, homeworks: list) -> list:
+        """Возвращает работы, статус или дата обновления которых изменились.
+
+        Если работа встречается в ответе несколько раз, учитывается
+        последнее вхождение. Хранилище при этом не меняется.
+        """
+        changed = {}
+        states = self._states
+        for homework in homeworks:
+            key = self.key(homework)
+            state = pack_state(
+                homework.get('status'), homework.get('date_updated'))
+            if states.get(key) != state:
+                changed[key] = homework
+            else:
+                changed.pop(key, None)
+        return list(changed.values())
+
+    def commit(self, homework: dict) -> None:
+        """Запоминает статус доставленной работы."""
+        key = self.key(homework)
+        state = pack_state(
+            homework.get('status'), homework.get('date_updated'))
+        self._states[key] = state
+        self._changes[key] = state
+
+    def restore(self, states: dict) -> None:
+        """Загружает сохранённые упакованные состояния {ключ: состояние}."""
+        self._states.update(states)
+
+    def snapshot(self) -> dict:
+        """Копия упакованных состояний {ключ: состояние} для restore."""
+        return dict(self._states)
+
+    def drain_changes(self) -> list:
+        """Возвращает и сбрасывает статусы, изменённые с прошлого вызова."""
+        changes, self._changes = self._changes, {}
+        return list(changes.items())
+
+    def status(self, key):
+        """Последний известный статус работы или None."""
+        state = self._states.get(key)
+        return None if state is None else unpack_status(state)
+
+    def statuses(self) -> set:
+        """Множество статусов всех известных работ."""
+        return {unpack_status(state) for state in set(self._states.values())}
+
+    def records(self) -> list:
+        """Записи обо всех известных работах."""
+        return [
+            HomeworkRecord(key, state) for key, state in self._states.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, key) -> bool:
+        return key in self._states
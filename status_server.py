@@ -0,0 +1,66 @@
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+STATUS_HOST = os.getenv('STATUS_HOST', '127.0.0.1')
+STATUS_PORT = os.getenv('STATUS_PORT')
+
+# Сообщения служебного HTTP-сервера
+STATUS_SERVER_START_MESSAGE = 'Служебный HTTP-сервер слушает %s:%d'
+ROUTE_FAILURE_MESSAGE = 'Ошибка обработчика %s: %s'
+
+# Путь -> функция без аргументов, возвращающая (код, content-type, тело)
+ROUTES = {}
+
+logger = logging.getLogger(__name__)
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """Отдаёт ответы зарегистрированных в ROUTES обработчиков."""
+
+    def do_GET(self):
+        """Вызывает обработчик пути или отвечает 404."""
+        path = urlparse(self.path).path
+        route = ROUTES.get(path)
+        if route is None:
+            status, content_type, body = 404, 'text/plain', 'Not found\n'
+        else:
+            try:
+                status, content_type, body = route()
+            except Exception as error:
+                logger.exception(ROUTE_FAILURE_MESSAGE, path, error)
+                status, content_type, body = 500, 'text/plain', f'{error}\n'
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        """Отключает журнал запросов http.server."""
+
+
+def start_status_server(port: int = None,
+                        host: str = STATUS_HOST) -> ThreadingHTTPServer:
+    """Запускает служебный HTTP-сервер в фоновом потоке.
+
+    Если порт не передан и не задан в STATUS_PORT, сервер не запускается.
+    """
+    if port is None:
+        if not STATUS_PORT:
+            return None
+        port = int(STATUS_PORT)
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='status-server',
+        daemon=True).start()
+    logger.info(STATUS_SERVER_START_MESSAGE, host, server.server_address[1])
+    return server
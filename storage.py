@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_DB = os.getenv(
+    'STATE_DB', os.path.join(BASE_DIR, 'homework_state.sqlite3'))
+FLUSH_INTERVAL = int(os.getenv('STATE_FLUSH_INTERVAL', 60))
+FLUSH_BATCH_SIZE = int(os.getenv('STATE_FLUSH_BATCH_SIZE', 500))
+
+# Сообщения хранилища состояния
+STATE_RESTORED_MESSAGE = (
+    'Состояние восстановлено из %s: подписчиков %d, работ %d, %.3f с')
+STATE_FLUSHED_MESSAGE = 'Записано в %s: курсоров %d, статусов %d'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    tenant TEXT PRIMARY KEY,
+    cursor INTEGER NOT NULL,
+    alerts TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS homework_states (
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    state INTEGER NOT NULL,
+    PRIMARY KEY (tenant, homework)
+);
+'''
+
+logger = logging.getLogger(__name__)
+
+
+class StateStorage:
+    """Хранилище курсоров и статусов в SQLite в режиме WAL.
+
+    Изменения копятся в памяти и записываются одной транзакцией, когда
+    накопилось batch_size записей или прошло flush_interval секунд,
+    поэтому диск не трогается на каждом цикле опроса.
+    """
+
+    def __init__(self, path: str = STATE_DB,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 batch_size: int = FLUSH_BATCH_SIZE) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self._cursors = {}
+        self._statuses = {}
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def load(self) -> dict:
+        """Читает сохранённое состояние всех подписчиков.
+
+        Возвращает словарь {подписчик: (курсор, отпечатки сбоев,
+        {ключ работы: упакованное состояние})}. Отпечатки - строка
+        FailureNotifier.dump.
+        """
+        started = time.monotonic()
+        tenants = {
+            tenant: (current_date, alerts, {})
+            for tenant, current_date, alerts in self.connection.execute(
+                'SELECT tenant, cursor, alerts FROM cursors')
+        }
+        homeworks = 0
+        for tenant, key, state in self.connection.execute(
+                'SELECT tenant, homework, state FROM homework_states'):
+            if tenant in tenants:
+                tenants[tenant][2][json.loads(key)] = state
+                homeworks += 1
+        logger.info(
+            STATE_RESTORED_MESSAGE, self.path, len(tenants), homeworks,
+            time.monotonic() - started)
+        return tenants
+
+    def restore(self, tenant: str, state, default: int) -> tuple:
+        """Восстанавливает состояние одного подписчика.
+
+        Заполняет хранилище статусов state и возвращает пару
+        (курсор, отпечатки сбоев). Если подписчик не сохранялся,
+        курсор равен default.
+        """
+        current_date, alerts, homeworks = self.load().get(
+            tenant, (default, '', {}))
+        state.restore(homeworks)
+        return current_date, alerts
+
+    def remember(self, tenant: str, current_date: int, alerts: str,
+                 state) -> None:
+        """Ставит состояние подписчика в очередь на запись."""
+        with self._lock:
+            self._cursors[tenant] = (current_date, alerts)
+            for key, status in state.drain_changes():
+                self._statuses[(tenant, key)] = status
+        self.maybe_flush()
+
+    def maybe_flush(self) -> bool:
+        """Записывает накопленные изменения, если пора."""
+        pending = len(self._cursors) + len(self._statuses)
+        expired = (
+            time.monotonic() - self._flushed_at >= self.flush_interval)
+        if pending and (pending >= self.batch_size or expired):
+            self.flush()
+            return True
+        return False
+
+    def flush(self) -> None:
+        """Записывает накопленные изменения одной транзакцией."""
+        with self._lock:
+            cursors, self._cursors = self._cursors, {}
+            statuses, self._statuses = self._statuses, {}
+            self._flushed_at = time.monotonic()
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)',
+                    [(tenant, current_date, alerts)
+                     for tenant, (current_date, alerts)
+                     in cursors.items()])
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO homework_states VALUES (?, ?, ?)',
+                    [(tenant, json.dumps(key), state)
+                     for (tenant, key), state in statuses.items()])
+        logger.debug(
+            STATE_FLUSHED_MESSAGE, self.path, len(cursors), len(statuses))
+
+    def close(self) -> None:
+        """Записывает остаток изменений и закрывает базу."""
+        if self.connection is None:
+            return
+        self.flush()
+        self.connection.close()
+        self.connection = None
@@ -0,0 +1,142 @@
+import codecs
+import json
+
+import homework
+
+CHUNK_SIZE = 64 * 1024
+HOMEWORK_FIELDS = ('id', 'homework_name', 'status', 'date_updated')
+ENVELOPE_FIELDS = ('current_date', 'code', 'error')
+
+# Сообщения потокового разбора
+UNEXPECTED_CHARACTER_MESSAGE = (
+    'Ответ API повреждён: ожидался символ {expected}, получен {actual!r}')
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    """Посимвольное чтение JSON из потока кусков байт."""
+
+    def __init__(self, chunks) -> None:
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self) -> bool:
+        """Дочитывает следующий кусок. Возвращает False в конце потока."""
+        if self.exhausted:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.exhausted = True
+            text = self.decoder.decode(b'', final=True)
+        else:
+            text = self.decoder.decode(chunk)
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Следующий значимый символ или пустая строка в конце потока."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position] in _WHITESPACE):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    def expect(self, expected: str) -> None:
+        """Пропускает ожидаемый символ-разделитель."""
+        actual = self.peek()
+        if actual != expected:
+            raise ValueError(UNEXPECTED_CHARACTER_MESSAGE.format(
+                expected=expected, actual=actual))
+        self.position += 1
+
+    def value(self):
+        """Разбирает очередное JSON-значение целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            if end == len(self.buffer) and self.fill():
+                # Число или литерал на границе куска может быть неполным.
+                continue
+            self.position = end
+            return value
+
+
+def _project(item, fields: tuple):
+    if not isinstance(item, dict):
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def iter_answer(chunks, fields: tuple = HOMEWORK_FIELDS):
+    """Разбирает ответ API по мере чтения.
+
+    Выдаёт пары ('homework', работа) для каждого элемента списка homeworks,
+    причём от работы остаются только поля fields, и пары (ключ, значение)
+    для полей конверта из ENVELOPE_FIELDS. Если homeworks не список,
+    выдаётся ('homeworks', значение). Структура проверяется сразу:
+    ответ не словарь - TypeError.
+    """
+    reader = _Reader(chunks)
+    if reader.peek() != '{':
+        response = reader.value()
+        raise TypeError(homework.NOT_DICT_MESSAGE.format(
+            type_name=type(response)))
+    reader.expect('{')
+    while reader.peek() != '}':
+        key = reader.value()
+        reader.expect(':')
+        if key == 'homeworks' and reader.peek() == '[':
+            reader.expect('[')
+            while reader.peek() != ']':
+                yield 'homework', _project(reader.value(), fields)
+                if reader.peek() == ',':
+                    reader.expect(',')
+            reader.expect(']')
+            yield 'homeworks', None
+        else:
+            value = reader.value()
+            if key in ENVELOPE_FIELDS or key == 'homeworks':
+                yield key, value
+        if reader.peek() == ',':
+            reader.expect(',')
+    reader.expect('}')
+
+
+def decode_answer(chunks, fields: tuple = HOMEWORK_FIELDS) -> dict:
+    """Собирает ответ API из потока, сохраняя только нужные поля.
+
+    Результат имеет ту же форму, что и response.json(), и проходит
+    check_response: homeworks - список работ с полями fields.
+    """
+    answer = {}
+    homeworks = []
+    for key, value in iter_answer(chunks, fields):
+        if key == 'homework':
+            homeworks.append(value)
+        elif key == 'homeworks':
+            answer['homeworks'] = homeworks if value is None else value
+        else:
+            answer[key] = value
+    return answer
+
+
+def decode_response(response) -> dict:
+    """Потоково разбирает тело ответа requests, открытого с stream=True."""
+    try:
+        return decode_answer(response.iter_content(CHUNK_SIZE))
+    finally:
+        response.close()
@@ -0,0 +1,568 @@
+import bisect
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import homework
+import status_server
+from engine import create_engine, persist_tenants
+from health import HEALTH, start_watchdog
+from log_config import LOG_FILE, setup_logging
+from metrics import REGISTRY
+from outbox import GLOBAL_RATE
+from profiling import PROFILE_DIR, PROFILER, install_profile_signal
+from tenants import Tenant, TenantRegistry, parse_tenants, tenant_name
+
+load_dotenv()
+
+RING_REPLICAS = int(os.getenv('RING_REPLICAS', 64))
+SHARD_REPORT_INTERVAL = float(os.getenv('SHARD_REPORT_INTERVAL', 10))
+SHARD_REPLY_TIMEOUT = float(os.getenv('SHARD_REPLY_TIMEOUT', 60))
+SHARD_REPORT_TIMEOUT = float(os.getenv(
+    'SHARD_REPORT_TIMEOUT', 6 * SHARD_REPORT_INTERVAL))
+
+# Сообщения супервизора
+SUPERVISOR_START_MESSAGE = 'Супервизор запущен: процессов %d, подписчиков %d'
+SHARD_START_MESSAGE = 'Процесс шарда %d запущен: pid %d, подписчиков %d'
+SHARD_DIED_MESSAGE = 'Процесс шарда %d завершился с кодом %s, перезапуск'
+SHARD_TIMEOUT_MESSAGE = 'Шард %d не ответил за %.0f с'
+REBALANCE_MESSAGE = (
+    'Перебалансировка: процессов %d -> %d, перенесено подписчиков %d')
+SHARD_ASSIGN_MESSAGE = 'Шард %d: добавлено подписчиков %d, снято %d'
+SHARD_DEAD_REASON = 'процесс не работает'
+SHARD_SILENT_REASON = 'нет отчёта {age:.0f} с'
+PROFILE_FORWARDED_MESSAGE = 'Профилирование %d циклов передано шардам: %d'
+
+logger = logging.getLogger(__name__)
+
+
+def ring_hash(key: str) -> int:
+    """Положение ключа на кольце, одинаковое во всех процессах."""
+    return int.from_bytes(
+        hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """Кольцо согласованного хеширования подписчиков по шардам.
+
+    Каждый шард занимает replicas точек кольца, подписчик достаётся
+    шарду первой точки по часовой стрелке. При добавлении или удалении
+    шарда переезжает только примерно 1/N подписчиков.
+    """
+
+    def __init__(self, shards=(), replicas: int = RING_REPLICAS) -> None:
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+        self.shards = set()
+        for shard in shards:
+            self.add(shard)
+
+    def add(self, shard: int) -> None:
+        """Добавляет шард на кольцо."""
+        self.shards.add(shard)
+        for replica in range(self.replicas):
+            point = ring_hash(f'{shard}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, shard)
+
+    def remove(self, shard: int) -> None:
+        """Удаляет шард с кольца."""
+        self.shards.discard(shard)
+        kept = [
+            (point, owner) for point, owner in zip(self._points, self._owners)
+            if owner != shard
+        ]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def shard_for(self, key: str) -> int:
+        """Шард, которому принадлежит ключ."""
+        if not self._points:
+            raise LookupError('На кольце нет ни одного шарда')
+        index = bisect.bisect(self._points, ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def assign(self, names) -> dict:
+        """Раскладывает имена подписчиков по шардам: {шард: множество}."""
+        assignment = {shard: set() for shard in self.shards}
+        for name in names:
+            assignment[self.shard_for(name)].add(name)
+        return assignment
+
+
+def tenant_snapshot(tenant: Tenant) -> tuple:
+    """Состояние подписчика для переноса в другой процесс."""
+    return tenant.timestamp, tenant.alerts, tenant.homeworks.snapshot()
+
+
+def label_metrics(text: str, shard) -> list:
+    """Добавляет метку shard ко всем сэмплам текста метрик Prometheus."""
+    lines = []
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            lines.append(line)
+            continue
+        series, value = line.rsplit(' ', 1)
+        if series.endswith('}'):
+            series = series.replace('{', f'{{shard="{shard}",', 1)
+        else:
+            series = f'{series}{{shard="{shard}"}}'
+        lines.append(f'{series} {value}')
+    return lines
+
+
+def merge_metrics(texts: dict) -> str:
+    """Объединяет метрики шардов {шард: текст} в один ответ /metrics.
+
+    Строки HELP и TYPE каждой метрики выводятся один раз, сэмплы всех
+    шардов идут под ними с меткой shard.
+    """
+    families = {}
+    current = None
+    for shard, text in sorted(texts.items()):
+        for line in label_metrics(text, shard):
+            if line.startswith('# HELP '):
+                current = line.split(' ', 3)[2]
+                families.setdefault(current, ([], []))
+                if not families[current][0]:
+                    families[current][0].append(line)
+            elif line.startswith('# TYPE '):
+                if len(families[current][0]) == 1:
+                    families[current][0].append(line)
+            elif line:
+                families[current][1].append(line)
+    lines = []
+    for header, samples in families.values():
+        lines.extend(header)
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+class ShardWorker:
+    """Цикл опроса в процессе шарда с приёмом команд супервизора.
+
+    Между опросами процесс ждёт команду из очереди commands, а не спит,
+    поэтому перебалансировка не ждёт следующего срока опроса. Каждые
+    report_interval секунд в очередь reports уходит отчёт о здоровье.
+    Каждый шаг отмечается в HEALTH, чтобы сторож процесса видел зависание,
+    и считается циклом для PROFILER.
+    """
+
+    def __init__(self, shard: int, engine, commands, reports,
+                 items: dict, report_interval: float = SHARD_REPORT_INTERVAL
+                 ) -> None:
+        self.shard = shard
+        self.engine = engine
+        self.commands = commands
+        self.reports = reports
+        self.items = items
+        self.report_interval = report_interval
+        self.next_report = 0.0
+        self.totals = {
+            'cycles': 0, 'polled': 0, 'sent': 0, 'errors': 0, 'skipped': 0}
+
+    def assign(self, items: dict, snapshots: dict) -> dict:
+        """Приводит набор подписчиков шарда к items {имя: запись реестра}.
+
+        Новые подписчики восстанавливаются из snapshots, а при их
+        отсутствии - из хранилища. Возвращает снимки снятых подписчиков.
+        """
+        engine = self.engine
+        removed = [
+            engine.registry.remove(name)
+            for name in set(self.items) - set(items)
+        ]
+        released = {}
+        for tenant in removed:
+            released[tenant.name] = tenant_snapshot(tenant)
+            engine.transport.forget(tenant.headers)
+        if removed:
+            persist_tenants(engine.storage, removed)
+            engine.storage.flush()
+        new = [item for name, item in items.items() if name not in self.items]
+        added = parse_tenants(new, timestamp=int(time.time()))
+        saved = engine.storage.load() if len(added) else {}
+        now = time.time()
+        for tenant in added:
+            state = snapshots.get(tenant.name) or saved.get(tenant.name)
+            if state is not None:
+                tenant.timestamp, tenant.alerts, states = state
+                tenant.homeworks.restore(states)
+            engine.registry.add(tenant)
+            engine.scheduler.schedule(tenant, now, delay=0)
+        self.items = dict(items)
+        logger.info(SHARD_ASSIGN_MESSAGE, self.shard, len(added),
+                    len(released))
+        return released
+
+    def health(self) -> dict:
+        """Отчёт о здоровье шарда для супервизора."""
+        return dict(
+            self.totals, pid=os.getpid(), tenants=len(self.engine.registry),
+            updated=time.time(), stall=HEALTH.stall(),
+            metrics=REGISTRY.render())
+
+    def report(self) -> None:
+        """Отправляет отчёт о здоровье."""
+        self.reports.put(('health', self.shard, self.health()))
+        self.next_report = time.monotonic() + self.report_interval
+
+    def handle(self, command: tuple) -> bool:
+        """Выполняет команду супервизора. Возвращает False для остановки."""
+        kind, items, snapshots = command
+        if kind == 'resize':
+            if self.engine.outbox is not None:
+                self.engine.outbox.set_global_rate(GLOBAL_RATE / items)
+            return True
+        if kind == 'profile':
+            PROFILER.request(items)
+            return True
+        if kind == 'assign':
+            released = self.assign(items, snapshots)
+            self.reports.put(('released', self.shard, released))
+            return True
+        released = {
+            tenant.name: tenant_snapshot(tenant)
+            for tenant in self.engine.registry
+        }
+        self.engine.close()
+        self.reports.put(('stopped', self.shard, released))
+        return False
+
+    def step(self) -> bool:
+        """Опрашивает подписчиков, чей срок наступил, и ждёт команду."""
+        HEALTH.cycle_started()
+        PROFILER.cycle_started()
+        next_due = self.engine.scheduler.next_due()
+        stats = None
+        if next_due is not None and next_due <= time.time():
+            stats = self.engine.poll_due(time.time())
+        if stats is not None and stats.tenants:
+            self.totals['cycles'] += 1
+            self.totals['polled'] += stats.tenants
+            self.totals['sent'] += stats.sent
+            self.totals['errors'] += stats.errors
+            self.totals['skipped'] += len(stats.skipped)
+            self.engine.log_stats(stats)
+        if time.monotonic() >= self.next_report:
+            self.report()
+        next_due = self.engine.scheduler.next_due() or (
+            time.time() + homework.RETRY_PERIOD)
+        timeout = max(0.0, min(
+            next_due - time.time(), self.next_report - time.monotonic()))
+        PROFILER.cycle_finished()
+        HEALTH.cycle_finished(timeout)
+        try:
+            command = self.commands.get(timeout=timeout)
+        except queue.Empty:
+            return True
+        return self.handle(command)
+
+    def run(self) -> None:
+        """Работает, пока супервизор не пришлёт команду stop."""
+        now = time.time()
+        for tenant in self.engine.registry:
+            self.engine.scheduler.schedule(tenant, now, delay=0)
+        while self.step():
+            pass
+
+
+def run_worker(shard: int, items: dict, snapshots: dict, commands, reports,
+               report_interval: float = SHARD_REPORT_INTERVAL,
+               processes: int = 1) -> None:
+    """Точка входа процесса шарда.
+
+    Общий лимит отправки в Telegram делится на processes шардов, а сторож
+    процесса следит, чтобы цикл шарда не завис. SIGUSR1 профилирует шард,
+    профили пишутся в отдельный для шарда каталог.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    install_profile_signal()
+    PROFILER.directory = os.path.join(PROFILE_DIR, f'shard{shard}')
+    setup_logging(f'{LOG_FILE}.shard{shard}')
+    engine = create_engine(TenantRegistry(), processes)
+    start_watchdog()
+    worker = ShardWorker(
+        shard, engine, commands, reports, {}, report_interval)
+    worker.assign(items, snapshots)
+    try:
+        worker.run()
+    finally:
+        engine.outbox.close()
+
+
+class Supervisor:
+    """Распределяет подписчиков по процессам-шардам и следит за ними.
+
+    Подписчики раскладываются по шардам кольцом согласованного
+    хеширования. При изменении числа процессов (SIGTTIN добавляет процесс,
+    SIGTTOU убирает) переезжает лишь часть подписчиков: старый шард
+    сначала снимает их и возвращает снимки состояния, затем новый шард
+    принимает их вместе со снимками. Упавший процесс перезапускается с
+    тем же набором подписчиков. Лимит отправки бота делится между
+    процессами и пересчитывается при изменении их числа. Отчёты шардов
+    объединяются в /metrics, /workers и /health служебного HTTP-сервера, а
+    запрос профилирования через /profile или SIGUSR1 передаётся всем шардам.
+    """
+
+    def __init__(self, items: dict, processes: int, context=None,
+                 report_interval: float = SHARD_REPORT_INTERVAL,
+                 target=run_worker) -> None:
+        self.items = items
+        self.processes = processes
+        self.target_processes = processes
+        self.context = context or multiprocessing.get_context('spawn')
+        self.report_interval = report_interval
+        self.target = target
+        self.ring = HashRing(range(processes))
+        self.assignment = {}
+        self.workers = {}
+        self.health = {}
+        self.spawned = {}
+        self.reports = self.context.Queue()
+        self._lock = threading.Lock()
+        status_server.ROUTES['/metrics'] = self.render_metrics
+        status_server.ROUTES['/workers'] = self.render_workers
+        status_server.ROUTES['/health'] = self.render_health
+
+    def spawn(self, shard: int, names: set, snapshots: dict = None,
+              processes: int = None) -> None:
+        """Запускает процесс шарда с указанными подписчиками."""
+        commands = self.context.Queue()
+        process = self.context.Process(
+            target=self.target, name=f'shard-{shard}', daemon=True,
+            args=(shard, {name: self.items[name] for name in names},
+                  snapshots or {}, commands, self.reports,
+                  self.report_interval, processes or self.processes))
+        process.start()
+        self.workers[shard] = (process, commands)
+        self.assignment[shard] = set(names)
+        self.spawned[shard] = time.time()
+        logger.info(SHARD_START_MESSAGE, shard, process.pid, len(names))
+
+    def start(self) -> 'Supervisor':
+        """Запускает процессы всех шардов."""
+        for shard, names in self.ring.assign(self.items).items():
+            self.spawn(shard, names)
+        return self
+
+    def handle(self, message: tuple) -> None:
+        """Учитывает отчёт шарда о здоровье."""
+        kind, shard, payload = message
+        if kind == 'health':
+            with self._lock:
+                self.health[shard] = payload
+
+    def wait_for(self, kind: str, shards: set) -> dict:
+        """Ждёт ответы вида kind от шардов и объединяет их снимки."""
+        snapshots = {}
+        pending = set(shards)
+        deadline = time.monotonic() + SHARD_REPLY_TIMEOUT
+        while pending:
+            timeout = deadline - time.monotonic()
+            try:
+                message = self.reports.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                for shard in pending:
+                    logger.error(
+                        SHARD_TIMEOUT_MESSAGE, shard, SHARD_REPLY_TIMEOUT)
+                break
+            reply, shard, payload = message
+            if reply == kind and shard in pending:
+                pending.discard(shard)
+                snapshots.update(payload)
+            else:
+                self.handle(message)
+        return snapshots
+
+    def rebalance(self, processes: int) -> int:
+        """Меняет число процессов и переносит подписчиков между шардами.
+
+        Возвращает число перенесённых подписчиков.
+        """
+        ring = HashRing(range(processes))
+        target = ring.assign(self.items)
+        releasing = set()
+        stopping = set()
+        for shard, names in self.assignment.items():
+            keep = names & target.get(shard, set())
+            if shard not in target:
+                self.workers[shard][1].put(('stop', None, None))
+                stopping.add(shard)
+            elif keep != names:
+                self.workers[shard][1].put((
+                    'assign', {name: self.items[name] for name in keep}, {}))
+                self.assignment[shard] = keep
+                releasing.add(shard)
+        snapshots = self.wait_for('released', releasing)
+        snapshots.update(self.wait_for('stopped', stopping))
+        for shard in stopping:
+            process, _ = self.workers.pop(shard)
+            process.join(SHARD_REPLY_TIMEOUT)
+            del self.assignment[shard]
+            with self._lock:
+                self.health.pop(shard, None)
+        moved = 0
+        for shard, names in target.items():
+            if shard not in self.workers:
+                self.spawn(shard, names, {
+                    name: snapshots[name]
+                    for name in names if name in snapshots}, processes)
+                moved += len(names)
+                continue
+            self.workers[shard][1].put(('resize', processes, None))
+            incoming = names - self.assignment[shard]
+            if incoming:
+                self.workers[shard][1].put((
+                    'assign', {name: self.items[name] for name in names},
+                    {name: snapshots[name]
+                     for name in incoming if name in snapshots}))
+                moved += len(incoming)
+            self.assignment[shard] = set(names)
+        logger.info(REBALANCE_MESSAGE, self.processes, processes, moved)
+        self.ring = ring
+        self.processes = processes
+        return moved
+
+    def forward_profile(self) -> int:
+        """Передаёт шардам запрос профилирования, полученный супервизором.
+
+        Сам супервизор циклов опроса не выполняет, поэтому запрос из
+        PROFILER забирается и рассылается командой profile. Возвращает
+        число запрошенных циклов или 0.
+        """
+        cycles = PROFILER.requested
+        if not cycles:
+            return 0
+        PROFILER.requested = 0
+        for _, commands in self.workers.values():
+            commands.put(('profile', cycles, None))
+        logger.info(PROFILE_FORWARDED_MESSAGE, cycles, len(self.workers))
+        return cycles
+
+    def check_workers(self) -> None:
+        """Перезапускает завершившиеся процессы шардов."""
+        for shard, (process, _) in list(self.workers.items()):
+            if not process.is_alive():
+                logger.error(SHARD_DIED_MESSAGE, shard, process.exitcode)
+                self.spawn(shard, self.assignment[shard])
+
+    def resize(self, delta: int) -> None:
+        """Запрашивает изменение числа процессов, не меньше одного."""
+        self.target_processes = max(1, self.target_processes + delta)
+
+    def run(self) -> None:
+        """Следит за шардами, пока процесс не будет остановлен."""
+        signal.signal(signal.SIGTTIN, lambda *args: self.resize(1))
+        signal.signal(signal.SIGTTOU, lambda *args: self.resize(-1))
+        logger.info(SUPERVISOR_START_MESSAGE, self.processes, len(self.items))
+        while True:
+            try:
+                self.handle(self.reports.get(timeout=1))
+            except queue.Empty:
+                pass
+            if self.target_processes != self.processes:
+                self.rebalance(self.target_processes)
+            self.forward_profile()
+            self.check_workers()
+
+    def close(self) -> None:
+        """Останавливает все шарды, дождавшись записи их состояния."""
+        for process, commands in self.workers.values():
+            commands.put(('stop', None, None))
+        self.wait_for('stopped', set(self.workers))
+        for process, _ in self.workers.values():
+            process.join(SHARD_REPLY_TIMEOUT)
+        self.workers.clear()
+
+    def render_metrics(self) -> tuple:
+        """Ответ /metrics: метрики всех шардов с меткой shard."""
+        with self._lock:
+            texts = {
+                shard: report['metrics']
+                for shard, report in self.health.items()
+            }
+        return 200, 'text/plain; version=0.0.4', merge_metrics(texts)
+
+    def render_workers(self) -> tuple:
+        """Ответ /workers: состояние процессов шардов в JSON."""
+        now = time.time()
+        workers = {}
+        with self._lock:
+            health = dict(self.health)
+        for shard, (process, _) in sorted(self.workers.items()):
+            report = health.get(shard, {})
+            workers[str(shard)] = {
+                'pid': process.pid,
+                'alive': process.is_alive(),
+                'assigned': len(self.assignment.get(shard, ())),
+                'tenants': report.get('tenants'),
+                'cycles': report.get('cycles'),
+                'polled': report.get('polled'),
+                'sent': report.get('sent'),
+                'errors': report.get('errors'),
+                'skipped': report.get('skipped'),
+                'report_age': (
+                    now - report['updated'] if report else None),
+            }
+        return 200, 'application/json', json.dumps(workers, indent=2)
+
+    def shard_problem(self, shard: int, process, report: dict, now: float):
+        """Причина, по которой шард нездоров, или None.
+
+        Шард нездоров, если его процесс не работает, его сторож видит
+        зависание или отчёта нет дольше SHARD_REPORT_TIMEOUT секунд.
+        """
+        if not process.is_alive():
+            return SHARD_DEAD_REASON
+        if report.get('stall'):
+            return report['stall']
+        updated = report.get('updated', self.spawned.get(shard, now))
+        if now - updated > SHARD_REPORT_TIMEOUT:
+            return SHARD_SILENT_REASON.format(age=now - updated)
+        return None
+
+    def render_health(self) -> tuple:
+        """Ответ /health: 503, если хотя бы один шард нездоров."""
+        now = time.time()
+        with self._lock:
+            health = dict(self.health)
+        problems = {
+            str(shard): self.shard_problem(
+                shard, process, health.get(shard, {}), now)
+            for shard, (process, _) in sorted(self.workers.items())
+        }
+        stalled = any(problems.values())
+        body = {
+            'status': 'stalled' if stalled else 'ok',
+            'shards': problems,
+        }
+        return 503 if stalled else 200, 'application/json', (
+            json.dumps(body) + '\n')
+
+
+def load_items(path: str) -> dict:
+    """Читает записи реестра {имя подписчика: запись} из JSON-файла."""
+    with open(path, encoding='UTF-8') as file:
+        data = json.load(file)
+    parse_tenants(data)
+    return {tenant_name(item): item for item in data}
+
+
+def run_supervisor(tenants_file: str, processes: int) -> None:
+    """Запускает опрос подписчиков в нескольких процессах."""
+    supervisor = Supervisor(load_items(tenants_file), processes).start()
+    try:
+        supervisor.run()
+    finally:
+        supervisor.close()
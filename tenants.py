@@ -0,0 +1,133 @@
+import json
+import logging
+import tracemalloc
+
+from fanout import parse_chat_ids
+from homework import make_headers
+from state import HomeworkStateStore
+
+logger = logging.getLogger(__name__)
+
+# Сообщения реестра подписчиков
+TENANTS_LOADED_MESSAGE = 'Загружено подписчиков: %d из %s'
+TENANT_FIELD_ERROR = 'У подписчика №{index} не заполнено поле {field}'
+TENANTS_NOT_LIST_MESSAGE = (
+    'Ожидаемый тип данных - список подписчиков, но получен (тип {type_name})')
+DUPLICATE_TENANT_MESSAGE = 'Подписчик {name} уже зарегистрирован'
+
+TENANT_REQUIRED_FIELDS = ('token', 'chat_id')
+
+
+class Tenant:
+    """Подписчик: токен Практикума, чаты Telegram и курсор опроса.
+
+    chat_id - один чат, список чатов или строка с чатами через запятую;
+    первый чат считается основным, сообщения уходят во все.
+    """
+
+    __slots__ = ('name', 'token', 'chat_id', 'chat_ids', 'headers',
+                 'timestamp', 'alerts', 'homeworks', 'failures',
+                 'notifier')
+
+    def __init__(self, name: str, token: str, chat_id,
+                 timestamp: int = 0, alerts: str = '') -> None:
+        self.name = name
+        self.token = token
+        self.chat_ids = parse_chat_ids(chat_id)
+        self.chat_id = self.chat_ids[0] if self.chat_ids else chat_id
+        self.headers = make_headers(token)
+        self.timestamp = timestamp
+        self.alerts = alerts
+        self.homeworks = HomeworkStateStore()
+        self.failures = 0
+        self.notifier = None
+
+    def __repr__(self) -> str:
+        return f'Tenant({self.name!r}, chat_id={self.chat_id!r})'
+
+
+class TenantRegistry:
+    """Реестр подписчиков, опрашиваемых одним процессом."""
+
+    def __init__(self, tenants=()) -> None:
+        self._tenants = {}
+        for tenant in tenants:
+            self.add(tenant)
+
+    def add(self, tenant: Tenant) -> None:
+        """Регистрирует подписчика под его уникальным именем."""
+        if tenant.name in self._tenants:
+            raise ValueError(DUPLICATE_TENANT_MESSAGE.format(
+                name=tenant.name))
+        self._tenants[tenant.name] = tenant
+
+    def remove(self, name: str) -> Tenant:
+        """Исключает подписчика из опроса."""
+        return self._tenants.pop(name)
+
+    def get(self, name: str) -> Tenant:
+        """Возвращает подписчика по имени."""
+        return self._tenants[name]
+
+    def __iter__(self):
+        return iter(list(self._tenants.values()))
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tenants
+
+
+def tenant_name(item: dict) -> str:
+    """Имя подписчика из записи реестра: поле name или основной чат."""
+    if 'name' in item:
+        return str(item['name'])
+    return parse_chat_ids(item['chat_id'])[0]
+
+
+def parse_tenants(data: list, timestamp: int = 0) -> TenantRegistry:
+    """Строит реестр из списка словарей с полями token и chat_id."""
+    if not isinstance(data, list):
+        raise TypeError(TENANTS_NOT_LIST_MESSAGE.format(
+            type_name=type(data)))
+    registry = TenantRegistry()
+    for index, item in enumerate(data):
+        for field in TENANT_REQUIRED_FIELDS:
+            if not item.get(field):
+                raise ValueError(TENANT_FIELD_ERROR.format(
+                    index=index, field=field))
+        registry.add(Tenant(
+            name=tenant_name(item),
+            token=item['token'],
+            chat_id=item['chat_id'],
+            timestamp=timestamp,
+        ))
+    return registry
+
+
+def load_tenants(path: str, timestamp: int = 0) -> TenantRegistry:
+    """Читает реестр подписчиков из JSON-файла."""
+    with open(path, encoding='UTF-8') as file:
+        registry = parse_tenants(json.load(file), timestamp)
+    logger.info(TENANTS_LOADED_MESSAGE, len(registry), path)
+    return registry
+
+
+def measure_tenant_footprint(count: int = 1000) -> float:
+    """Оценивает память в байтах, занимаемую одним подписчиком в реестре."""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        registry = TenantRegistry(
+            Tenant(f'tenant-{index}', f'token-{index:032d}', str(index))
+            for index in range(count)
+        )
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    del registry
+    return (after - before) / count
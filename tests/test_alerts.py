@@ -0,0 +1,72 @@
+import homework
+from alerts import FailureNotifier, error_fingerprint
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def __call__(self):
+        return self.now
+
+
+def api_error(timestamp):
+    return ConnectionError(homework.ERROR_ANSWER.format(
+        url=homework.ENDPOINT, headers={'Authorization': 'OAuth x'},
+        params={'from_date': timestamp}, error='timed out'))
+
+
+def test_fingerprint_ignores_variable_details():
+    assert error_fingerprint(api_error(1)) == error_fingerprint(
+        api_error(1700000000))
+    assert error_fingerprint(api_error(1)) != error_fingerprint(
+        RuntimeError(str(api_error(1))))
+    assert error_fingerprint(RuntimeError('Ошибка сервера: 1')) != (
+        error_fingerprint(RuntimeError('Неожиданный статус API - 1')))
+
+
+def test_notifier_bounds_repeated_failures():
+    clock = Clock()
+    notifier = FailureNotifier(
+        homework.PROGRAMM_FAILURE_ERROR_MESSAGE, window=3600, clock=clock)
+    sent = []
+    for minute in range(24 * 60):
+        clock.now += 60
+        error = api_error(minute)
+        message = notifier.check(error)
+        if message is not None:
+            sent.append(message)
+            notifier.delivered(error)
+    assert len(sent) == 24
+    assert sent[0].startswith('Сбой в работе программы: ')
+    assert 'повторился 60 раз' in sent[1]
+
+
+def test_notifier_retries_undelivered_message():
+    notifier = FailureNotifier('{error}', clock=Clock())
+    error = ValueError('boom')
+    assert notifier.check(error) == 'boom'
+    assert notifier.check(error) == 'boom'
+    notifier.delivered(error)
+    assert notifier.check(error) is None
+    assert notifier.check(TypeError('boom')) == 'boom'
+
+
+def test_notifier_forgets_old_fingerprints():
+    notifier = FailureNotifier('{error}', limit=2, clock=Clock())
+    for error in (ValueError('a'), TypeError('b'), KeyError('c')):
+        notifier.delivered(error)
+    assert notifier.check(ValueError('a')) == 'a'
+    assert notifier.check(KeyError('c')) is None
+
+
+def test_notifier_survives_restart():
+    clock = Clock()
+    notifier = FailureNotifier('{error}', clock=clock)
+    notifier.delivered(api_error(1))
+    restarted = FailureNotifier('{error}', clock=clock)
+    restarted.restore(notifier.dump())
+    assert restarted.check(api_error(2)) is None
+    broken = FailureNotifier('{error}', clock=clock)
+    broken.restore('Сбой в работе программы')
+    assert broken.check(api_error(2)) is not None
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import async_engine
+import homework
+import utils
+from async_engine import AsyncPollingEngine
+from health import LoopHealth
+from profiling import CycleProfiler
+from storage import StateStorage
+from tenants import Tenant, TenantRegistry
+
+
+class PracticumHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        token = self.headers['Authorization'].split()[-1]
+        from_date = parse_qs(urlparse(self.path).query)['from_date'][0]
+        status = 200
+        data = {
+            'homeworks': [{'homework_name': token, 'status': 'reviewing'}],
+            'current_date': int(from_date) + 1,
+        }
+        if token == 'broken':
+            status, data = 500, {}
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def test_async_engine_against_local_server(monkeypatch):
+    registry = TenantRegistry(
+        Tenant(f't{index}', f'token{index}', str(index), timestamp=10)
+        for index in range(50)
+    )
+    registry.add(Tenant('broken', 'broken', 'broken'))
+    bot = RecordingBot()
+    with utils.LocalHTTPServer(PracticumHandler) as server:
+        monkeypatch.setattr(homework, 'ENDPOINT', server.url + '/api/')
+        engine = AsyncPollingEngine(bot, registry, workers=8)
+        stats = asyncio.run(engine.run_cycle())
+        repeated = asyncio.run(engine.run_cycle())
+        engine.close()
+    assert stats.tenants == 51
+    assert stats.sent == 50
+    assert stats.errors == 1
+    assert repeated.sent == 0
+    assert repeated.errors == 1
+    assert len(bot.sent) == 51
+    assert registry.get('t0').timestamp == 12
+    assert registry.get('t0').homeworks.status('token0') == 'reviewing'
+    assert 'Работа взята на проверку ревьюером.' in bot.sent[0][1]
+
+
+class ThreadRecordingStorage(StateStorage):
+    def __init__(self):
+        super().__init__(':memory:')
+        self.threads = []
+
+    def remember(self, *args):
+        self.threads.append(threading.current_thread())
+        super().remember(*args)
+
+
+def test_run_tenant_tracks_polls_and_saves_off_loop(monkeypatch):
+    registry = TenantRegistry([Tenant('t0', 'token0', '0', timestamp=10)])
+    storage = ThreadRecordingStorage()
+    with utils.LocalHTTPServer(PracticumHandler) as server:
+        monkeypatch.setattr(homework, 'ENDPOINT', server.url + '/api/')
+        engine = AsyncPollingEngine(
+            RecordingBot(), registry, workers=2, storage=storage)
+
+        async def poll_once():
+            task = asyncio.create_task(engine.run_tenant(registry.get('t0')))
+            while not storage.threads or engine.in_flight:
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        asyncio.run(asyncio.wait_for(poll_once(), 10))
+        engine.close()
+    assert threading.main_thread() not in storage.threads
+
+
+def test_heartbeat_reports_oldest_poll_in_flight(monkeypatch, tmp_path):
+    clock = iter(range(1000, 2000)).__next__
+    loop = LoopHealth(clock=clock)
+    monkeypatch.setattr(async_engine, 'HEALTH', loop)
+    profiler = CycleProfiler(str(tmp_path))
+    profiler.request(2)
+    monkeypatch.setattr(async_engine, 'PROFILER', profiler)
+    engine = AsyncPollingEngine(
+        RecordingBot(), TenantRegistry(), storage=StateStorage(':memory:'))
+    engine.in_flight.update(slow=100, fast=990)
+
+    async def beat():
+        task = asyncio.create_task(engine.heartbeat(0.01))
+        await asyncio.sleep(0.05)
+        assert loop.cycle_started_at == 100
+        assert 'идёт' in loop.stall(300)
+        engine.in_flight.clear()
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(beat(), 10))
+    engine.close()
+    assert loop.cycle_started_at is None
+    assert loop.stall(300) is None
+    assert not profiler.active
+    assert (tmp_path / f'profile-{profiler.stamp}.prof').exists()
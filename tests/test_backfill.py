@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import homework
+from backfill import fetch_backfill
+from state import HomeworkStateStore
+
+DAY = 24 * 60 * 60
+START = 1700000000
+
+
+def iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%SZ')
+
+
+def api(events):
+    """Ответы API: работы, последний статус которых обновлён после since."""
+    def fetch(since):
+        return [
+            {'homework_name': name, 'status': status,
+             'date_updated': iso(moment)}
+            for name, status, moment in events if moment >= since
+        ], START + 3 * DAY
+    return fetch
+
+
+def test_fetch_backfill_sorts_single_answer():
+    events = [
+        ('late', 'approved', START + 2 * DAY + 10),
+        ('early', 'rejected', START + 100),
+        ('middle', 'reviewing', START + DAY + 5),
+    ]
+    requests = []
+    fetch = api(events)
+
+    def counting_fetch(since):
+        requests.append(since)
+        return fetch(since)
+
+    homeworks, current_date = fetch_backfill(
+        counting_fetch, START, START + 3 * DAY, window=DAY)
+    assert [work['homework_name'] for work in homeworks] == [
+        'early', 'middle', 'late']
+    assert current_date == START + 3 * DAY
+    assert requests == [START]
+
+
+def test_fetch_backfill_skips_short_gap():
+    assert fetch_backfill(api([]), START, START + 60, window=DAY) is None
+
+
+def test_catch_up_delivers_missed_updates(monkeypatch):
+    events = [
+        ('hw2', 'approved', START + DAY + 5),
+        ('hw1', 'rejected', START + 100),
+    ]
+    fetch = api(events)
+    monkeypatch.setattr(homework.time, 'time', lambda: START + 3 * DAY)
+    monkeypatch.setattr(
+        homework, 'get_api_answer',
+        lambda since: dict(zip(('homeworks', 'current_date'), fetch(since))))
+    sent = []
+    monkeypatch.setattr(
+        homework, 'send_message',
+        lambda bot, message: sent.append(message) or True)
+    state = HomeworkStateStore()
+    assert homework.catch_up(None, state, START) == START + 3 * DAY
+    assert ['hw1' in sent[0], 'hw2' in sent[1]] == [True, True]
+    assert len(state) == 2
+
+
+def test_catch_up_keeps_cursor_when_request_fails(monkeypatch):
+    monkeypatch.setattr(homework.time, 'time', lambda: START + 3 * DAY)
+
+    def get_api_answer(since):
+        raise ConnectionError('down')
+
+    monkeypatch.setattr(homework, 'get_api_answer', get_api_answer)
+    assert homework.catch_up(None, HomeworkStateStore(), START) == START
+
+
+def test_catch_up_keeps_cursor_on_unexpected_status(monkeypatch):
+    fetch = api([('hw1', 'pending', START + 100)])
+    monkeypatch.setattr(homework.time, 'time', lambda: START + 3 * DAY)
+    monkeypatch.setattr(
+        homework, 'get_api_answer',
+        lambda since: dict(zip(('homeworks', 'current_date'), fetch(since))))
+    sent = []
+    monkeypatch.setattr(
+        homework, 'send_message',
+        lambda bot, message: sent.append(message) or True)
+    state = HomeworkStateStore()
+    assert homework.catch_up(None, state, START) == START
+    assert sent == []
+    assert len(state) == 0
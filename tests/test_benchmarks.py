@@ -0,0 +1,76 @@
+import json
+
+from benchmarks import decode, pipeline, records, replay, simulate
+
+
+def test_pipeline_benchmark_smoke(tmp_path):
+    output = tmp_path / 'result.json'
+    result = pipeline.main([
+        '--tenants', '5', '--cycles', '2', '--workers', '4',
+        '--output', str(output),
+    ])
+    assert output.exists()
+    assert result['api_requests'] == 10
+    assert result['messages_delivered'] == 10
+    assert result['transport']['connections_reused'] > 0
+    assert 0 <= result['latency_p50'] <= result['latency_p99']
+
+
+def test_pipeline_benchmark_staged_engine(tmp_path):
+    result = pipeline.main([
+        '--tenants', '5', '--cycles', '2', '--workers', '4',
+        '--engine', 'staged', '--output', str(tmp_path / 'staged.json'),
+    ])
+    assert result['config']['engine'] == 'StagedPollingEngine'
+    assert result['messages_delivered'] == 10
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert pipeline.percentile(values, 0.5) == 50
+    assert pipeline.percentile(values, 0.99) == 99
+    assert pipeline.percentile([], 0.5) == 0.0
+
+
+def test_decode_benchmark_smoke(tmp_path):
+    result = decode.main([
+        '--homeworks', '2000', '--repeat', '1',
+        '--output', str(tmp_path / 'decode.json'),
+    ])
+    assert result['streaming']['peak_bytes'] < result['json']['peak_bytes']
+
+
+def test_records_benchmark_smoke(tmp_path):
+    result = records.main([
+        '--homeworks', '2000', '--output', str(tmp_path / 'records.json')])
+    assert (result['packed_bytes_per_homework']
+            < result['tuple_bytes_per_homework'])
+
+
+def test_simulate_benchmark_smoke(tmp_path):
+    result = simulate.main([
+        '--tenants', '5', '--days', '1', '--outage-start', '0.5',
+        '--output', str(tmp_path / 'simulate.json')])
+    assert result['api_requests_failed'] > 0
+    assert result['breaker_rejected'] > 0
+    assert result['status_notifications'] > 0
+    assert result['simulated_seconds_per_wall_second'] > 1000
+
+
+def test_replay_benchmark_smoke(tmp_path):
+    path = tmp_path / 'api.jsonl'
+    homeworks = [{
+        'homework_name': 'hw', 'status': 'approved',
+        'date_updated': '2023-01-01T00:00:00Z'}]
+    body = json.dumps({'homeworks': homeworks, 'current_date': 1})
+    path.write_text(
+        '{"version": 1, "started": 0}\n'
+        + json.dumps([0, 0.01, 'abc', 0, 200, body]) + '\n'
+        + json.dumps([0, 0.01, 'abc', 0, None, 'ReadTimeout: slow']) + '\n',
+        encoding='UTF-8')
+    result = replay.main([
+        str(path), '--tenants', '4', '--cycles', '2', '--workers', '2',
+        '--speed', '10', '--output', str(tmp_path / 'replay.json')])
+    assert result['transport'] == {'requests': 8, 'errors': 4}
+    assert result['poll_errors'] == 4
+    assert result['messages_delivered'] > 0
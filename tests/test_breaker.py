@@ -0,0 +1,88 @@
+import pytest
+import requests
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from engine import PollingEngine
+from test_engine import FakeTransport, RecordingBot, make_registry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def json(self):
+        return {'homeworks': [], 'current_date': 1}
+
+
+def failing_get(calls):
+    def get(*args, **kwargs):
+        calls.append(kwargs)
+        raise requests.ConnectionError('down')
+    return get
+
+
+def test_breaker_opens_and_probes():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        'test', failure_threshold=3, recovery_timeout=10, clock=clock)
+    calls = []
+    get = breaker.wrap(failing_get(calls))
+    for _ in range(10):
+        with pytest.raises(requests.RequestException):
+            get(url='x')
+    assert len(calls) == 3
+    assert breaker.state == OPEN
+    clock.now = 10
+    with pytest.raises(requests.ConnectionError):
+        get(url='x')
+    assert len(calls) == 4
+    assert breaker.state == OPEN
+    assert breaker.timeout == 20
+    clock.now = 30
+    assert breaker.wrap(lambda **kwargs: Response(200))(url='x').status_code
+    assert breaker.state == CLOSED
+    assert breaker.timeout == 10
+
+
+def test_breaker_half_open_limits_probes():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        'probes', failure_threshold=1, recovery_timeout=1, clock=clock)
+    breaker.record_failure()
+    clock.now = 1
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_breaker_ignores_client_errors():
+    breaker = CircuitBreaker('client', failure_threshold=1)
+    get = breaker.wrap(lambda **kwargs: Response(401))
+    for _ in range(3):
+        get(url='x')
+    assert breaker.state == CLOSED
+    breaker.wrap(lambda **kwargs: Response(503))(url='x')
+    assert breaker.state == OPEN
+
+
+def test_engine_shares_breaker_between_tenants():
+    calls = []
+    polling = PollingEngine(
+        RecordingBot(), make_registry(50), workers=1,
+        transport=FakeTransport(failing_get(calls)),
+        breaker=CircuitBreaker('engine', failure_threshold=5))
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.errors == 50
+    assert len(calls) == 5
+    assert len(polling.bot.sent) == 50
+    assert all(tenant.failures == 1 for tenant in polling.registry)
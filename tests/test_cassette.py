@@ -0,0 +1,129 @@
+import json
+
+import pytest
+import requests
+
+import cassette
+import homework
+from breaker import CircuitBreaker
+from cassette import CassetteRecorder, ReplayTransport, load_cassette
+from clock import VirtualClock
+
+
+class Response:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def record(path, clock):
+    recorder = CassetteRecorder(str(path), clock=clock)
+    answers = iter([
+        Response(200, {'homeworks': [], 'current_date': 1}),
+        requests.ConnectTimeout('connect timed out'),
+        Response(500, {'code': 'boom'}),
+    ])
+
+    def get(url=None, headers=None, params=None, **kwargs):
+        clock.sleep(2)
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    recording = recorder.wrap(get)
+    headers = {'Authorization': 'OAuth secret'}
+    assert recording(headers=headers, params={'from_date': 10}).json() == {
+        'homeworks': [], 'current_date': 1}
+    with pytest.raises(requests.ConnectTimeout):
+        recording(headers=headers, params={'from_date': 20})
+    recording(headers=headers, params={'from_date': 30})
+    recorder.close()
+
+
+@pytest.mark.parametrize('name', ['api.jsonl', 'api.jsonl.gz'])
+def test_record_writes_compact_log_without_token(tmp_path, name):
+    path = tmp_path / name
+    record(path, VirtualClock(0))
+    entries = load_cassette(str(path))
+    assert [entry[:5] for entry in entries] == [
+        [0, 2, cassette.tenant_key({'Authorization': 'OAuth secret'}), 10,
+         200],
+        [2, 2, entries[0][2], 20, None],
+        [4, 2, entries[0][2], 30, 500],
+    ]
+    assert entries[1][5] == 'ConnectTimeout: connect timed out'
+    if not name.endswith('.gz'):
+        assert 'secret' not in path.read_text(encoding='UTF-8')
+
+
+def test_replay_reproduces_answers_errors_and_latency(tmp_path):
+    path = tmp_path / 'api.jsonl'
+    record(path, VirtualClock(0))
+    clock = VirtualClock(0)
+    transport = ReplayTransport(str(path), speed=4, loop=False, clock=clock)
+    assert transport.get(params={'from_date': 0}).json() == {
+        'homeworks': [], 'current_date': 1}
+    with pytest.raises(requests.ConnectTimeout):
+        transport.get()
+    assert transport.get().status_code == 500
+    assert clock.time() == 1.5
+    assert transport.stats() == {'requests': 3, 'errors': 1}
+    with pytest.raises(StopIteration):
+        transport.get()
+
+
+def test_replay_feeds_request_api_answer(tmp_path):
+    path = tmp_path / 'api.jsonl'
+    record(path, VirtualClock(0))
+    transport = ReplayTransport(str(path), speed=0)
+    assert homework.request_api_answer(0, {}, get=transport.get) == {
+        'homeworks': [], 'current_date': 1}
+    with pytest.raises(ConnectionError):
+        homework.request_api_answer(0, {}, get=transport.get)
+    with pytest.raises(RuntimeError):
+        homework.request_api_answer(0, {}, get=transport.get)
+
+
+def test_request_api_answer_records_when_enabled(tmp_path, monkeypatch):
+    path = tmp_path / 'api.jsonl'
+    monkeypatch.setattr(cassette, 'RECORD_CASSETTE', str(path))
+    monkeypatch.setattr(cassette, '_default_recorder', None)
+
+    def get(**kwargs):
+        return Response(200, {'homeworks': [], 'current_date': 5})
+
+    homework.request_api_answer(7, {'Authorization': 'OAuth t'}, get=get)
+    cassette.default_recorder().close()
+    [entry] = load_cassette(str(path))
+    assert entry[3:] == [7, 200, '{"homeworks": [], "current_date": 5}']
+
+
+def test_breaker_rejections_are_not_recorded(tmp_path):
+    path = tmp_path / 'api.jsonl'
+    recorder = CassetteRecorder(str(path), VirtualClock(0))
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=3600)
+
+    def get(**kwargs):
+        raise requests.ConnectionError('down')
+
+    guarded = recorder.wrap(breaker.wrap(get))
+    for _ in range(3):
+        with pytest.raises(requests.RequestException):
+            guarded(headers={}, params={'from_date': 0})
+    recorder.close()
+    [entry] = load_cassette(str(path))
+    assert entry[5] == 'ConnectionError: down'
+
+
+def test_load_cassette_rejects_empty_and_unknown_version(tmp_path):
+    path = tmp_path / 'api.jsonl'
+    path.write_text('{"version": 1, "started": 0}\n', encoding='UTF-8')
+    with pytest.raises(ValueError):
+        load_cassette(str(path))
+    path.write_text('{"version": 99}\n[0,0,"",0,200,"{}"]\n')
+    with pytest.raises(ValueError):
+        load_cassette(str(path))
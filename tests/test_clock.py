@@ -0,0 +1,39 @@
+import random
+
+from clock import VirtualClock
+from engine import PollingEngine
+from scheduler import PollPolicy, PollScheduler
+from test_engine import FakeTransport, RecordingBot, make_registry, mock_get
+
+
+def test_virtual_clock_sleep_advances_time():
+    clock = VirtualClock(100)
+    clock.sleep(600)
+    clock.sleep(-1)
+    assert clock.time() == clock.monotonic() == 700
+
+
+def simulate(hours):
+    clock = VirtualClock(0)
+    requests = []
+    get = mock_get(lambda headers: [])
+
+    def counting_get(*args, **kwargs):
+        requests.append(clock.time())
+        return get(*args, **kwargs)
+
+    polling = PollingEngine(
+        RecordingBot(), make_registry(10), workers=2,
+        transport=FakeTransport(counting_get),
+        scheduler=PollScheduler(PollPolicy(default=600, rng=random.Random(1))),
+        clock=clock)
+    polling.run(until=hours * 3600)
+    polling.close()
+    return clock.time(), requests
+
+
+def test_engine_runs_on_virtual_clock():
+    now, requests = simulate(24)
+    assert now == 24 * 3600
+    assert len(requests) == 10 * 24 * 6
+    assert simulate(24)[1] == requests
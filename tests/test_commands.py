@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import homework
+from commands import (HISTORY_EMPTY, STATUS_NOT_CHECKED, UNKNOWN_COMMAND,
+                      CommandListener, StatusCache)
+
+
+def update(update_id, chat_id, text):
+    return SimpleNamespace(
+        update_id=update_id,
+        effective_message=SimpleNamespace(chat_id=chat_id, text=text))
+
+
+class CommandBot:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.offsets = []
+        self.sent = []
+
+    def get_updates(self, offset=None, timeout=None, **kwargs):
+        self.offsets.append(offset)
+        return self.batches.pop(0) if self.batches else []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def test_status_cache_tracks_statuses_and_history():
+    cache = StatusCache(homework.HOMEWORK_VERDICTS, history_size=2)
+    assert cache.render_status('1') == STATUS_NOT_CHECKED
+    assert cache.render_history('1') == HISTORY_EMPTY
+    for status in ('reviewing', 'reviewing', 'rejected', 'approved'):
+        cache.checked('1', [{
+            'homework_name': 'hw', 'status': status,
+            'date_updated': f'2024-01-01 {status}'}])
+    status = cache.render_status('1')
+    assert homework.HOMEWORK_VERDICTS['approved'] in status
+    assert homework.HOMEWORK_VERDICTS['reviewing'] not in status
+    history = cache.render_history('1').splitlines()
+    assert len(history) == 2
+    assert history[0].endswith(homework.HOMEWORK_VERDICTS['rejected'])
+    assert history[1].endswith(homework.HOMEWORK_VERDICTS['approved'])
+
+
+def test_listener_answers_known_chats_from_cache():
+    cache = StatusCache(homework.HOMEWORK_VERDICTS)
+    cache.checked('1', [{'homework_name': 'hw', 'status': 'approved'}])
+    bot = CommandBot([[
+        update(10, 1, '/status'),
+        update(11, 2, '/status'),
+        update(12, 1, 'привет'),
+        update(13, 1, '/history@homework_bot'),
+        update(14, 1, '/start'),
+    ]])
+    listener = CommandListener(bot, cache, ['1'])
+    assert listener.poll() == 5
+    listener.poll()
+    assert bot.offsets == [None, 15]
+    assert [chat_id for chat_id, _ in bot.sent] == [1, 1, 1]
+    assert homework.HOMEWORK_VERDICTS['approved'] in bot.sent[0][1]
+    assert '"hw"' in bot.sent[1][1]
+    assert bot.sent[2][1] == UNKNOWN_COMMAND
+
+
+def test_listener_survives_failed_reply():
+    class FailingBot(CommandBot):
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            raise RuntimeError('blocked by user')
+
+    bot = FailingBot([[update(1, 1, '/status'), update(2, 1, '/status')]])
+    listener = CommandListener(bot, StatusCache({}), ['1'])
+    assert listener.poll() == 2
+    assert listener.offset == 3
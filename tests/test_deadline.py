@@ -0,0 +1,117 @@
+import time
+from collections import Counter
+
+import pytest
+from requests.exceptions import ReadTimeout
+
+import homework
+from breaker import CLOSED, CircuitBreaker
+from clock import VirtualClock
+from deadline import (DEADLINE_OVERRUNS, SKIPPED_TENANTS, Deadline,
+                      DeadlineExceeded)
+from engine import PollingEngine
+from test_engine import FakeTransport, RecordingBot, make_registry, mock_get
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_clips_timeouts():
+    clock = Clock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.timeouts('get', connect=5, read=30) == (5, 10)
+    clock.now = 8
+    assert deadline.timeouts('get', connect=5, read=30) == (2, 2)
+    assert deadline.timeout('send', limit=20) == 2
+    clock.now = 12
+    before = DEADLINE_OVERRUNS.value(stage='send')
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout('send')
+    assert DEADLINE_OVERRUNS.value(stage='send') == before + 1
+    assert deadline.finish() == 2
+
+
+def test_request_passes_timeouts():
+    calls = []
+
+    def get(**kwargs):
+        calls.append(kwargs)
+        return mock_get(lambda headers: [])(**kwargs)
+
+    homework.request_api_answer(0, {}, get=get)
+    assert calls[0]['timeout'] == (
+        homework.CONNECT_TIMEOUT, homework.READ_TIMEOUT)
+    deadline = Deadline(1)
+    homework.request_api_answer(0, {}, get=get, deadline=deadline)
+    assert max(calls[1]['timeout']) <= 1
+
+
+def test_engine_cancels_work_after_deadline():
+    slow = mock_get(lambda headers: [
+        {'homework_name': 'hw', 'status': 'approved'}])
+
+    def get(**kwargs):
+        time.sleep(0.05)
+        return slow(**kwargs)
+
+    bot = RecordingBot()
+    polling = PollingEngine(
+        bot, make_registry(20), workers=1, transport=FakeTransport(get),
+        cycle_deadline=0.12)
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.errors == 0
+    assert 0 < stats.sent < 20
+    assert stats.duration < 0.5
+    skipped = [
+        tenant for tenant in polling.registry if tenant.timestamp != 100]
+    assert skipped and all(not tenant.homeworks for tenant in skipped)
+
+
+def test_timeouts_clipped_by_deadline_are_skips():
+    answer = mock_get(lambda headers: [])
+
+    def get(**kwargs):
+        read = kwargs['timeout'][1]
+        time.sleep(min(read, 0.5))
+        if read < 0.5:
+            raise ReadTimeout('read timed out')
+        return answer(**kwargs)
+
+    bot = RecordingBot()
+    breaker = CircuitBreaker(failure_threshold=2)
+    polling = PollingEngine(
+        bot, make_registry(6), workers=6, transport=FakeTransport(get),
+        breaker=breaker, cycle_deadline=0.2)
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.errors == 0
+    assert len(stats.skipped) == 6
+    assert breaker.state == CLOSED and breaker.failures == 0
+    assert bot.sent == []
+
+
+def test_tenants_skipped_by_deadline_are_polled_next():
+    clock = VirtualClock(0)
+    polls = Counter()
+    answer = mock_get(lambda headers: [])
+
+    def get(**kwargs):
+        clock.advance(10)
+        polls[kwargs['headers']['Authorization']] += 1
+        return answer(**kwargs)
+
+    polling = PollingEngine(
+        RecordingBot(), make_registry(10), workers=1,
+        transport=FakeTransport(get), cycle_deadline=60, clock=clock)
+    before = SKIPPED_TENANTS.value()
+    polling.run(until=24 * 60 * 60)
+    polling.close()
+    assert len(polls) == 10
+    assert max(polls.values()) - min(polls.values()) <= 1
+    assert SKIPPED_TENANTS.value() > before
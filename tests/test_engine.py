@@ -0,0 +1,168 @@
+import requests
+
+import engine
+import utils
+from tenants import Tenant, TenantRegistry, parse_tenants
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def mock_get(homeworks):
+    def get(*args, **kwargs):
+        response = utils.MockResponseGET(*args, random_timestamp=100)
+        response.json = lambda: {
+            'homeworks': homeworks(kwargs['headers']), 'current_date': 100}
+        return response
+    return get
+
+
+class FakeTransport:
+    def __init__(self, get):
+        self.get = get
+
+    def stats(self):
+        return {}
+
+    def forget(self, headers):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_engine(bot, count, get, workers=2):
+    return engine.PollingEngine(
+        bot, make_registry(count), workers=workers,
+        transport=FakeTransport(get))
+
+
+def make_registry(count):
+    return TenantRegistry(
+        Tenant(f't{index}', f'token{index}', str(index))
+        for index in range(count)
+    )
+
+
+def test_parse_tenants_requires_fields():
+    registry = parse_tenants([{'token': 'a', 'chat_id': 1}])
+    assert '1' in registry
+    try:
+        parse_tenants([{'token': 'a'}])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('Подписчик без chat_id должен быть отклонён.')
+
+
+def test_engine_polls_every_tenant():
+    bot = RecordingBot()
+    polling = make_engine(bot, 20, mock_get(lambda headers: [
+        {'homework_name': headers['Authorization'], 'status': 'approved'}]),
+        workers=4)
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.tenants == 20
+    assert stats.sent == 20
+    assert stats.errors == 0
+    assert {chat_id for chat_id, _ in bot.sent} == {
+        str(index) for index in range(20)}
+    assert all(tenant.timestamp == 100 for tenant in polling.registry)
+
+
+def test_engine_does_not_repeat_messages():
+    bot = RecordingBot()
+    polling = make_engine(bot, 3, mock_get(lambda headers: [
+        {'homework_name': 'hw', 'status': 'reviewing'}]))
+    polling.run_cycle()
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.sent == 0
+    assert len(bot.sent) == 3
+
+
+def test_engine_counts_errors():
+    def get_with_error(*args, **kwargs):
+        raise requests.RequestException('Something wrong')
+
+    bot = RecordingBot()
+    polling = make_engine(bot, 2, get_with_error)
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.errors == 2
+    assert len(bot.sent) == 2
+
+
+def test_engine_sends_every_changed_homework():
+    responses = iter([
+        [{'id': 1, 'homework_name': 'a', 'status': 'reviewing'},
+         {'id': 2, 'homework_name': 'b', 'status': 'reviewing'}],
+        [{'id': 2, 'homework_name': 'b', 'status': 'approved'}],
+    ])
+    bot = RecordingBot()
+    polling = make_engine(bot, 1, mock_get(lambda headers: next(responses)))
+    first = polling.run_cycle()
+    second = polling.run_cycle()
+    polling.close()
+    assert first.sent == 2
+    assert second.sent == 1
+    assert 'Ура!' in bot.sent[-1][1]
+
+
+def test_engine_restores_cursor_from_storage(tmp_path):
+    from storage import StateStorage
+
+    path = str(tmp_path / 'state.db')
+    get = mock_get(lambda headers: [
+        {'id': 1, 'homework_name': 'hw', 'status': 'approved'}])
+    first = engine.PollingEngine(
+        RecordingBot(), make_registry(1), workers=1,
+        transport=FakeTransport(get), storage=StateStorage(path))
+    first.run_cycle()
+    first.close()
+    bot = RecordingBot()
+    second = engine.PollingEngine(
+        bot, make_registry(1), workers=1,
+        transport=FakeTransport(get), storage=StateStorage(path))
+    assert second.registry.get('t0').timestamp == 100
+    stats = second.run_cycle()
+    second.close()
+    assert stats.sent == 0
+
+
+def test_engine_restores_suppressed_failures(tmp_path):
+    from storage import StateStorage
+
+    def get_with_error(*args, **kwargs):
+        raise requests.RequestException('Something wrong')
+
+    path = str(tmp_path / 'state.db')
+    bots = []
+    for _ in range(2):
+        bots.append(RecordingBot())
+        polling = engine.PollingEngine(
+            bots[-1], make_registry(1), workers=1,
+            transport=FakeTransport(get_with_error),
+            storage=StateStorage(path))
+        assert polling.run_cycle().errors == 1
+        polling.close()
+    assert [len(bot.sent) for bot in bots] == [1, 0]
+
+
+def test_engine_backs_off_failing_tenant():
+    def get_with_error(*args, **kwargs):
+        raise requests.RequestException('Something wrong')
+
+    polling = make_engine(RecordingBot(), 1, get_with_error)
+    tenant = polling.registry.get('t0')
+    polling.scheduler.schedule(tenant, now=0, delay=0)
+    stats = polling.poll_due(now=0)
+    polling.close()
+    assert stats.errors == 1
+    assert tenant.failures == 1
+    assert len(polling.scheduler) == 1
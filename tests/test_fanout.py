@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+import engine
+from deadline import DeadlineExceeded
+from fanout import FanOut, parse_chat_ids
+from tenants import Tenant, TenantRegistry, parse_tenants
+from test_engine import FakeTransport, RecordingBot, mock_get
+
+
+def test_parse_chat_ids():
+    assert parse_chat_ids('1, 2,,3') == ['1', '2', '3']
+    assert parse_chat_ids([1, '2']) == ['1', '2']
+    assert parse_chat_ids(None) == []
+    registry = parse_tenants([{'token': 'a', 'chat_id': [10, 20]}])
+    assert registry.get('10').chat_ids == ['10', '20']
+
+
+def test_slow_chat_does_not_delay_others():
+    fanout = FanOut(workers=3)
+    finished = {}
+
+    def send(chat_id):
+        if chat_id == 'slow':
+            time.sleep(0.3)
+        finished[chat_id] = time.monotonic()
+        return True
+
+    started = time.monotonic()
+    result = fanout.deliver(['student', 'slow', 'group'], 'msg', send)
+    fanout.close()
+    assert result.delivered
+    assert finished['student'] - started < 0.2
+    assert finished['group'] - started < 0.2
+    assert result.results['slow'][1] >= 0.3
+    assert result.results['student'][1] < 0.2
+    assert result.duration >= 0.3
+
+
+def test_failed_chat_is_retried_alone():
+    fanout = FanOut(workers=2)
+    calls = []
+    broken = {'mentor'}
+
+    def send(chat_id):
+        calls.append(chat_id)
+        if chat_id == 'group':
+            raise RuntimeError('chat not found')
+        return chat_id not in broken
+
+    result = fanout.deliver(['student', 'mentor', 'group'], 'msg', send)
+    assert not result.delivered
+    assert sorted(result.failed) == ['group', 'mentor']
+    calls.clear()
+    broken.clear()
+    result = fanout.deliver(['student', 'mentor', 'group'], 'msg', send)
+    assert sorted(calls) == ['group', 'mentor']
+    assert result.failed == ['group']
+    fanout.close()
+
+
+def test_deadline_is_raised_after_remembering_delivered_chats():
+    fanout = FanOut(workers=2)
+
+    def send(chat_id):
+        if chat_id == 'late':
+            raise DeadlineExceeded('late')
+        return True
+
+    with pytest.raises(DeadlineExceeded):
+        fanout.deliver(['first', 'late'], 'msg', send)
+    calls = []
+    fanout.deliver(
+        ['first', 'late'], 'msg',
+        lambda chat_id: calls.append(chat_id) or True)
+    assert calls == ['late']
+    fanout.close()
+
+
+def test_engine_sends_updates_to_every_chat():
+    class FlakyBot(RecordingBot):
+        failing = {'mentor'}
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            if chat_id in self.failing:
+                raise RuntimeError('blocked')
+            super().send_message(chat_id, text)
+
+    bot = FlakyBot()
+    get = mock_get(lambda headers: [
+        {'homework_name': 'hw', 'status': 'approved'}])
+    polling = engine.PollingEngine(
+        bot, TenantRegistry([Tenant('t', 'token', 'student,mentor,group')]),
+        workers=2, transport=FakeTransport(get))
+    try:
+        assert polling.run_cycle().sent == 0
+        assert sorted(chat for chat, _ in bot.sent) == ['group', 'student']
+        bot.failing.clear()
+        bot.sent.clear()
+        assert polling.run_cycle().sent == 1
+        assert [chat for chat, _ in bot.sent] == ['mentor']
+        assert polling.run_cycle().sent == 0
+    finally:
+        polling.close()
+
+
+def test_same_text_of_other_tenant_reaches_shared_chat():
+    class FlakyBot(RecordingBot):
+        failing = {'studentA'}
+
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            if chat_id in self.failing:
+                raise RuntimeError('blocked')
+            super().send_message(chat_id, text)
+
+    bot = FlakyBot()
+    polling = engine.PollingEngine(
+        bot, TenantRegistry([]), workers=2,
+        transport=FakeTransport(mock_get(lambda headers: [])))
+    first = Tenant('a', 'token-a', 'studentA,group')
+    second = Tenant('b', 'token-b', 'studentB,group')
+    try:
+        assert not polling.notify(first, 'hw05_final: approved')
+        assert polling.notify(second, 'hw05_final: approved')
+        assert sorted(chat for chat, _ in bot.sent) == [
+            'group', 'group', 'studentB']
+    finally:
+        polling.close()
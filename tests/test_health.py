@@ -0,0 +1,76 @@
+import json
+
+import health
+import status_server
+from health import STALLED, LoopHealth, Watchdog
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_loop_health_detects_long_cycle_and_missed_cycle():
+    clock = Clock()
+    loop = LoopHealth(clock)
+    assert loop.stall(60) is None
+    loop.cycle_started()
+    clock.now += 61
+    assert 'идёт 61' in loop.stall(60)
+    loop.cycle_finished(600)
+    clock.now += 600 + 60
+    assert loop.stall(60) is None
+    clock.now += 1
+    assert 'не начат' in loop.stall(60)
+    loop.cycle_started()
+    assert loop.stall(60) is None
+
+
+def test_snapshot_reports_progress_and_backlog():
+    clock = Clock()
+    loop = LoopHealth(clock)
+    loop.set_backlog(lambda: 3)
+    loop.polled()
+    clock.now += 5
+    loop.sent()
+    loop.cycle_started()
+    clock.now += 2
+    snapshot = loop.snapshot(60)
+    assert snapshot['status'] == 'ok'
+    assert snapshot['last_poll_age'] == 7
+    assert snapshot['last_send_age'] == 2
+    assert snapshot['cycle_age'] == 2
+    assert snapshot['backlog'] == 3
+
+
+def test_health_route_returns_503_when_stalled(monkeypatch):
+    clock = Clock()
+    loop = LoopHealth(clock)
+    monkeypatch.setattr(health, 'HEALTH', loop)
+    route = status_server.ROUTES['/health']
+    status, content_type, body = route()
+    assert (status, json.loads(body)['status']) == (200, 'ok')
+    loop.cycle_started()
+    clock.now += health.WATCHDOG_TIMEOUT + 1
+    status, _, body = route()
+    assert content_type == 'application/json'
+    assert (status, json.loads(body)['status']) == (503, 'stalled')
+
+
+def test_watchdog_flags_and_restarts_stalled_loop():
+    clock = Clock()
+    loop = LoopHealth(clock)
+    exits = []
+    watchdog = Watchdog(loop, timeout=10, restart=True, exit=exits.append)
+    assert watchdog.check() is None
+    loop.cycle_started()
+    clock.now += 11
+    assert watchdog.check()
+    assert STALLED.value() == 1
+    assert exits == [health.WATCHDOG_EXIT_CODE]
+    loop.cycle_finished(600)
+    assert watchdog.check() is None
+    assert STALLED.value() == 0
@@ -0,0 +1,48 @@
+import logging
+import threading
+
+import log_config
+
+
+def test_logging_goes_through_queue_and_rotates(tmp_path):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    filename = tmp_path / 'bot.log'
+    log_config.LOG_MAX_BYTES, max_bytes = 2000, log_config.LOG_MAX_BYTES
+    try:
+        listener = log_config.setup_logging(str(filename), level='INFO')
+        assert isinstance(
+            root.handlers[0], log_config.DeferredQueueHandler)
+        logger = logging.getLogger('test_log_config')
+        for index in range(100):
+            logger.info('Сообщение номер %d', index)
+        logger.debug('Не попадёт в файл %s', 'debug')
+        log_config.stop_listener(listener)
+    finally:
+        log_config.LOG_MAX_BYTES = max_bytes
+        root.handlers[:] = handlers
+        root.setLevel(level)
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert 'bot.log' in files
+    assert 'bot.log.1' in files
+    text = filename.read_text(encoding='UTF-8')
+    assert 'Сообщение номер 99' in text
+    assert 'debug' not in text
+
+
+def test_deferred_handler_merges_args_in_caller_thread():
+    records = []
+
+    class Queue:
+        def put_nowait(self, record):
+            records.append((threading.current_thread(), record))
+
+    handler = log_config.DeferredQueueHandler(Queue())
+    record = logging.LogRecord(
+        'x', logging.INFO, __file__, 1, 'value %s', ('a',), None)
+    handler.handle(record)
+    thread, queued = records[0]
+    assert thread is threading.current_thread()
+    assert queued.msg == 'value a'
+    assert queued.args is None
+    assert record.args == ('a',)
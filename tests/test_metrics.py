@@ -0,0 +1,59 @@
+import requests
+
+import homework
+import metrics
+from status_server import start_status_server
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.MetricsRegistry()
+    histogram = registry.histogram(
+        'latency_seconds', 'Задержка', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='a')
+    histogram.observe(0.5, stage='a')
+    histogram.observe(5, stage='a')
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="a"} 3' in text
+
+
+def test_gauge_function_and_counter():
+    registry = metrics.MetricsRegistry()
+    registry.gauge('depth', 'Очередь', ('queue',)).set_function(
+        lambda: 7, queue='outbox')
+    counter = registry.counter('errors_total', 'Ошибки', ('type',))
+    counter.inc(type='KeyError')
+    counter.inc(type='KeyError')
+    text = registry.render()
+    assert 'depth{queue="outbox"} 7' in text
+    assert 'errors_total{type="KeyError"} 2' in text
+
+
+def test_stages_are_instrumented():
+    before = metrics.STAGE_SECONDS.count(stage='parse_status')
+    errors = metrics.STAGE_ERRORS.value(stage='parse_status', type='KeyError')
+    homework.parse_status({'homework_name': 'hw', 'status': 'approved'})
+    try:
+        homework.parse_status({'status': 'approved'})
+    except KeyError:
+        pass
+    assert metrics.STAGE_SECONDS.count(stage='parse_status') == before + 2
+    assert metrics.STAGE_ERRORS.value(
+        stage='parse_status', type='KeyError') == errors + 1
+
+
+def test_metrics_endpoint():
+    server = start_status_server(port=0)
+    try:
+        host, port = server.server_address
+        response = requests.get(f'http://{host}:{port}/metrics', timeout=5)
+        missing = requests.get(f'http://{host}:{port}/missing', timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 200
+    assert 'homework_bot_stage_seconds' in response.text
+    assert missing.status_code == 404
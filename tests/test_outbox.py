@@ -0,0 +1,144 @@
+import threading
+import time
+
+import requests
+import telegram
+
+import engine
+from metrics import STAGE_ERRORS, STAGE_SECONDS
+from outbox import TelegramOutbox, TokenBucket
+from test_engine import FakeTransport, make_registry, mock_get
+
+
+class FlakyBot:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.sent.append((chat_id, text, time.monotonic()))
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=2, capacity=1, now=0)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(0) == 0.5
+    assert bucket.reserve(0.5) == 0
+    bucket.block(10)
+    assert bucket.reserve(1) == 9
+
+
+def test_outbox_respects_chat_rate():
+    bot = FlakyBot()
+    outbox = TelegramOutbox(
+        bot, workers=4, global_rate=1000, chat_rate=50, chat_burst=1).start()
+    for index in range(5):
+        outbox.put('chat', str(index))
+    outbox.put('other', 'x')
+    assert outbox.join(timeout=5)
+    outbox.close()
+    chat_times = [sent for chat, _, sent in bot.sent if chat == 'chat']
+    assert len(chat_times) == 5
+    assert chat_times[-1] - chat_times[0] >= 4 / 50 * 0.9
+    assert outbox.stats()['sent'] == 6
+    assert outbox.depth == 0
+
+
+def test_outbox_retries_after_flood_limit():
+    bot = FlakyBot([telegram.error.RetryAfter(0.05)])
+    outbox = TelegramOutbox(bot, workers=1, chat_rate=100).start()
+    outbox.put('chat', 'hello')
+    assert outbox.join(timeout=5)
+    outbox.close()
+    assert [text for _, text, _ in bot.sent] == ['hello']
+    assert outbox.retried == 1
+    assert outbox.dropped == 0
+
+
+def test_outbox_drops_on_permanent_error():
+    bot = FlakyBot([telegram.error.BadRequest('chat not found')])
+    outbox = TelegramOutbox(bot, workers=1).start()
+    outbox.put('chat', 'hello')
+    assert outbox.join(timeout=5)
+    outbox.close()
+    assert outbox.dropped == 1
+    assert not bot.sent
+
+
+def test_outbox_rejects_when_full():
+    outbox = TelegramOutbox(FlakyBot(), max_size=1)
+    assert outbox.put('chat', 'first')
+    assert not outbox.put('chat', 'second')
+
+
+def test_outbox_future_reports_delivery():
+    bot = FlakyBot([telegram.error.BadRequest('chat not found')])
+    outbox = TelegramOutbox(bot, workers=1)
+    dropped = outbox.put('chat', 'hello')
+    assert outbox.put('chat', 'hello') is dropped
+    outbox.start()
+    assert dropped.result(timeout=5) is False
+    assert outbox.put('chat', 'hello').result(timeout=5) is True
+    outbox.close()
+    assert [text for _, text, _ in bot.sent] == ['hello']
+
+
+def test_engine_keeps_state_until_outbox_delivers():
+    bot = FlakyBot([telegram.error.BadRequest('blocked')])
+    outbox = TelegramOutbox(bot, workers=1, chat_rate=100).start()
+    polling = engine.PollingEngine(
+        bot, make_registry(1), workers=1, outbox=outbox,
+        transport=FakeTransport(mock_get(lambda headers: [
+            {'homework_name': 'hw', 'status': 'approved'}])))
+    tenant = polling.registry.get('t0')
+    try:
+        assert polling.run_cycle().sent == 0
+        assert not tenant.homeworks
+        assert tenant.timestamp != 100
+        assert polling.run_cycle().sent == 1
+        assert tenant.timestamp == 100
+    finally:
+        polling.close()
+        outbox.close()
+    assert len(bot.sent) == 1
+
+
+def test_outbox_sends_are_measured_as_send_message_stage():
+    bot = FlakyBot([telegram.error.BadRequest('chat not found')])
+    outbox = TelegramOutbox(bot, workers=1).start()
+    sends = STAGE_SECONDS.count(stage='send_message')
+    errors = STAGE_ERRORS.value(stage='send_message', type='BadRequest')
+    outbox.put('chat', 'first')
+    outbox.put('chat', 'second')
+    assert outbox.join(timeout=5)
+    outbox.close()
+    assert STAGE_SECONDS.count(stage='send_message') == sends + 2
+    assert STAGE_ERRORS.value(
+        stage='send_message', type='BadRequest') == errors + 1
+
+
+def test_failure_notice_waits_for_outbox_within_deadline():
+    def get(**kwargs):
+        raise requests.ConnectionError('api down')
+
+    outbox = TelegramOutbox(FlakyBot(), workers=1)
+    polling = engine.PollingEngine(
+        FlakyBot(), make_registry(1), workers=1, outbox=outbox,
+        transport=FakeTransport(get), cycle_deadline=0.2)
+    results = []
+    cycle = threading.Thread(
+        target=lambda: results.append(polling.run_cycle()), daemon=True)
+    cycle.start()
+    cycle.join(timeout=5)
+    try:
+        assert results and results[0].errors == 1
+        assert outbox.depth == 1
+        assert polling.registry.get('t0').alerts == ''
+    finally:
+        outbox.start()
+        polling.close()
+        outbox.close()
@@ -0,0 +1,84 @@
+import os
+import signal
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+import profiling
+import status_server
+from profiling import CycleProfiler
+
+
+def busy_cycle(garbage):
+    garbage.append([str(number) for number in range(20000)])
+    return sum(len(item) for item in garbage[-1])
+
+
+def test_profiler_covers_requested_cycles(tmp_path):
+    profiler = CycleProfiler(str(tmp_path / 'profiles'), clock=lambda: 0)
+    garbage = []
+    profiler.cycle_started()
+    profiler.cycle_finished()
+    assert not os.path.exists(tmp_path / 'profiles')
+    profiler.request(2)
+    for _ in range(3):
+        profiler.cycle_started()
+        busy_cycle(garbage)
+        profiler.cycle_finished()
+    prefix = tmp_path / 'profiles' / f'profile-{profiler.stamp}'
+    assert sorted(os.listdir(tmp_path / 'profiles')) == sorted(
+        os.path.basename(f'{prefix}{suffix}')
+        for suffix in ('-memory-1.txt', '-memory-2.txt', '.prof', '.txt'))
+    assert 'busy_cycle' in Path(f'{prefix}.txt').read_text()
+    assert 'test_profiling.py' in Path(
+        f'{prefix}-memory-1.txt').read_text()
+    assert not profiler.active
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiler_survives_unwritable_directory(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    profiler = CycleProfiler(str(tmp_path))
+    profiler.request(1)
+    profiler.cycle_started()
+    profiler.directory = str(blocker)
+    profiler.cycle_finished()
+    assert not profiler.active
+
+
+@pytest.mark.skipif(
+    not hasattr(signal, 'SIGUSR1'), reason='нет сигнала SIGUSR1')
+def test_signal_and_endpoint_request_profiling(monkeypatch):
+    profiler = CycleProfiler()
+    previous = profiling.install_profile_signal(profiler)
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        assert profiler.requested == profiling.PROFILE_CYCLES
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+    monkeypatch.setattr(profiling, 'PROFILER', profiler)
+    profiler.requested = 0
+    status, _, _ = status_server.ROUTES['/profile']()
+    assert status == 202
+    assert profiler.requested == profiling.PROFILE_CYCLES
+
+
+@pytest.mark.skipif(
+    not hasattr(signal, 'SIGUSR1'), reason='нет сигнала SIGUSR1')
+def test_signal_during_cycle_start_does_not_block(tmp_path):
+    def clock():
+        os.kill(os.getpid(), signal.SIGUSR1)
+        return 0
+
+    profiler = CycleProfiler(str(tmp_path), clock=clock)
+    previous = profiling.install_profile_signal(profiler)
+    try:
+        profiler.request(1)
+        profiler.cycle_started()
+        profiler.cycle_finished()
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+    assert not profiler.active
+    assert profiler.requested == profiling.PROFILE_CYCLES
@@ -0,0 +1,35 @@
+import homework
+from records import (STATUS_CODES, HomeworkRecord, encode_date, pack_state,
+                     unpack_status, unpack_updated)
+from state import HomeworkStateStore
+
+
+def test_status_codes_cover_verdicts():
+    assert STATUS_CODES[0] is None
+    assert set(STATUS_CODES[1:]) == set(homework.HOMEWORK_VERDICTS)
+
+
+def test_pack_state_round_trip():
+    state = pack_state('reviewing', '2020-02-13T14:40:57Z')
+    assert unpack_status(state) == 'reviewing'
+    assert unpack_updated(state) == 1581604857
+    assert unpack_status(pack_state('unknown', None)) is None
+    assert pack_state(None, None) == 0
+
+
+def test_encode_date_fallback_detects_changes():
+    assert encode_date(None) == 0
+    assert encode_date('later') == encode_date('later')
+    assert encode_date('later') != encode_date('earlier')
+
+
+def test_store_records():
+    store = HomeworkStateStore()
+    store.commit({'id': 1, 'status': 'approved',
+                  'date_updated': '2023-01-01T00:00:00Z'})
+    [record] = store.records()
+    assert isinstance(record, HomeworkRecord)
+    assert (record.key, record.status, record.updated) == (
+        1, 'approved', 1672531200)
+    assert not hasattr(record, '__dict__')
+
@@ -0,0 +1,44 @@
+import random
+
+from scheduler import PollPolicy, PollScheduler
+from tenants import Tenant
+
+
+def make_tenant(*statuses, failures=0):
+    tenant = Tenant('t', 'token', 'chat')
+    for index, status in enumerate(statuses):
+        tenant.homeworks.commit({'id': index, 'status': status})
+    tenant.failures = failures
+    return tenant
+
+
+def test_policy_depends_on_state():
+    policy = PollPolicy(default=600, reviewing=60, idle=3600)
+    assert policy.next_interval(make_tenant()) == 600
+    assert policy.next_interval(make_tenant('approved', 'reviewing')) == 60
+    assert policy.next_interval(make_tenant('approved')) == 3600
+    assert policy.next_interval(make_tenant('rejected')) == 600
+
+
+def test_error_backoff_grows_with_jitter():
+    policy = PollPolicy(error_base=10, error_max=100, rng=random.Random(1))
+    intervals = [
+        policy.next_interval(make_tenant(failures=failures))
+        for failures in range(1, 7)
+    ]
+    assert 5 <= intervals[0] <= 10
+    assert 20 <= intervals[2] <= 40
+    assert all(50 <= interval <= 100 for interval in intervals[4:])
+
+
+def test_scheduler_orders_by_due_time():
+    scheduler = PollScheduler(PollPolicy(default=600, reviewing=60))
+    idle = make_tenant()
+    active = make_tenant('reviewing')
+    scheduler.schedule(idle, now=0)
+    scheduler.schedule(active, now=0)
+    assert scheduler.next_due() == 60
+    assert scheduler.pop_due(59) == []
+    assert scheduler.pop_due(60) == [active]
+    assert scheduler.pop_due(1000) == [idle]
+    assert scheduler.next_due() is None
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import engine
+from singleflight import SINGLEFLIGHT_CALLS, SingleFlight
+from tenants import Tenant, TenantRegistry
+from test_engine import FakeTransport, RecordingBot, mock_get
+
+
+def wait_for(condition, timeout=5):
+    stopped = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < stopped
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    calls = []
+
+    def fetch(value):
+        calls.append(value)
+        release.wait()
+        return {'value': value}
+
+    with ThreadPoolExecutor(3) as executor:
+        futures = [executor.submit(flight.do, 'key', fetch, 1)
+                   for _ in range(3)]
+        wait_for(lambda: flight.hits == 2)
+        release.set()
+        results = [future.result() for future in futures]
+    assert calls == [1]
+    assert results[0] is results[1] is results[2]
+    assert flight.stats() == {'hits': 2, 'misses': 1}
+    assert SINGLEFLIGHT_CALLS.value(flight='test', result='hit') >= 2
+
+
+def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight('errors')
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ConnectionError('down')
+
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(flight.do, 'key', fail) for _ in range(2)]
+        wait_for(lambda: flight.hits == 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ConnectionError):
+                future.result()
+    assert flight.do('key', lambda: 'ok') == 'ok'
+    assert flight.do('other', lambda: 'ok') == 'ok'
+    assert flight.stats() == {'hits': 1, 'misses': 3}
+
+
+def test_engine_coalesces_tenants_with_shared_token():
+    requests = []
+    get = mock_get(lambda headers: [
+        {'homework_name': 'hw', 'status': 'approved'}])
+
+    def slow_get(*args, **kwargs):
+        requests.append(kwargs['headers'])
+        time.sleep(0.2)
+        return get(*args, **kwargs)
+
+    bot = RecordingBot()
+    polling = engine.PollingEngine(
+        bot, TenantRegistry(
+            Tenant(f'chat{index}', 'shared', str(index))
+            for index in range(3)),
+        workers=3, transport=FakeTransport(slow_get))
+    try:
+        stats = polling.run_cycle()
+    finally:
+        polling.close()
+    assert len(requests) == 1
+    assert stats.sent == 3
+    assert sorted(chat_id for chat_id, _ in bot.sent) == ['0', '1', '2']
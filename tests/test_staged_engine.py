@@ -0,0 +1,92 @@
+import threading
+import time
+
+from staged_engine import Stage, StagedPollingEngine
+from test_engine import FakeTransport, RecordingBot, make_registry, mock_get
+
+
+class SlowBot(RecordingBot):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        time.sleep(self.delay)
+        with self.lock:
+            super().send_message(chat_id, text, **kwargs)
+
+
+def slow_get(delay, homeworks):
+    get = mock_get(homeworks)
+
+    def slow(*args, **kwargs):
+        time.sleep(delay)
+        return get(*args, **kwargs)
+    return slow
+
+
+def make_staged(bot, count, get, **kwargs):
+    return StagedPollingEngine(
+        bot, make_registry(count), transport=FakeTransport(get), **kwargs)
+
+
+def test_stage_applies_backpressure():
+    release = threading.Event()
+    done = []
+    sink = Stage('test_sink', lambda item: release.wait() and done.append(
+        item), workers=1, maxsize=1)
+    source = Stage('test_source', lambda item: [item], workers=1,
+                   maxsize=1, output=sink)
+    for item in range(2):
+        source.put(item)
+    time.sleep(0.05)
+    assert source.queue.full() or sink.queue.full()
+    release.set()
+    source.join()
+    sink.join()
+    source.close()
+    sink.close()
+    assert sorted(done) == [0, 1]
+
+
+def test_staged_engine_delivers_updates_in_order():
+    bot = RecordingBot()
+    polling = make_staged(bot, 10, mock_get(lambda headers: [
+        {'id': 1, 'homework_name': 'a', 'status': 'reviewing'},
+        {'id': 2, 'homework_name': 'b', 'status': 'approved'}]),
+        fetch_workers=3, parse_workers=2, send_workers=2)
+    stats = polling.run_cycle()
+    again = polling.run_cycle()
+    polling.close()
+    assert (stats.tenants, stats.sent, stats.errors) == (10, 20, 0)
+    assert again.sent == 0
+    for chat_id in map(str, range(10)):
+        texts = [text for chat, text in bot.sent if chat == chat_id]
+        assert '"a"' in texts[0] and '"b"' in texts[1]
+    assert all(tenant.timestamp == 100 for tenant in polling.registry)
+
+
+def test_staged_engine_reports_failures():
+    def get(*args, **kwargs):
+        raise ConnectionError('down')
+
+    bot = RecordingBot()
+    polling = make_staged(bot, 4, get, fetch_workers=2)
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.errors == 4
+    assert len(bot.sent) == 4
+
+
+def test_stages_overlap():
+    homeworks = lambda headers: [  # noqa: E731
+        {'homework_name': headers['Authorization'], 'status': 'approved'}]
+    delay, count = 0.02, 20
+    polling = make_staged(
+        SlowBot(delay), count, slow_get(delay, homeworks),
+        fetch_workers=1, parse_workers=1, send_workers=1)
+    stats = polling.run_cycle()
+    polling.close()
+    assert stats.sent == count
+    assert stats.duration < delay * count * 1.6
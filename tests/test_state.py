@@ -0,0 +1,39 @@
+from state import HomeworkStateStore
+
+
+def homework(id, status, date_updated='2023-01-01T00:00:00Z'):
+    return {
+        'id': id,
+        'homework_name': f'hw{id}',
+        'status': status,
+        'date_updated': date_updated,
+    }
+
+
+def test_diff_returns_only_transitions():
+    store = HomeworkStateStore()
+    first = [homework(1, 'reviewing'), homework(2, 'reviewing')]
+    assert store.diff(first) == first
+    for work in first:
+        store.commit(work)
+    assert store.diff(first) == []
+    second = [homework(1, 'reviewing'), homework(2, 'approved', 'later')]
+    assert store.diff(second) == [second[1]]
+
+
+def test_diff_keeps_last_occurrence():
+    store = HomeworkStateStore()
+    store.commit(homework(1, 'reviewing'))
+    updates = [homework(1, 'rejected', 'a'), homework(1, 'reviewing')]
+    assert store.diff(updates) == []
+    updates = [homework(1, 'reviewing'), homework(1, 'approved', 'b')]
+    assert store.diff(updates) == [updates[1]]
+
+
+def test_diff_uses_name_without_id():
+    store = HomeworkStateStore()
+    work = {'homework_name': 'hw', 'status': 'approved'}
+    store.commit(work)
+    assert 'hw' in store
+    assert store.status('hw') == 'approved'
+    assert store.diff([work]) == []
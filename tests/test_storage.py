@@ -0,0 +1,59 @@
+import time
+
+from state import HomeworkStateStore
+from storage import StateStorage
+
+
+def test_state_survives_restart(tmp_path):
+    path = str(tmp_path / 'state.db')
+    storage = StateStorage(path, flush_interval=3600, batch_size=1000)
+    state = HomeworkStateStore()
+    state.commit({'id': 1, 'homework_name': 'hw', 'status': 'reviewing'})
+    state.commit({'homework_name': 'named', 'status': 'approved'})
+    storage.remember('chat', 123, '{"ValueError: boom": [1, 0]}', state)
+    assert not storage.maybe_flush()
+    storage.close()
+
+    restarted = StateStorage(path)
+    restored = HomeworkStateStore()
+    cursor, alerts = restarted.restore('chat', restored, default=0)
+    restarted.close()
+    assert cursor == 123
+    assert alerts == '{"ValueError: boom": [1, 0]}'
+    assert restored.status(1) == 'reviewing'
+    assert restored.status('named') == 'approved'
+    assert restored.diff([{'id': 1, 'homework_name': 'hw',
+                           'status': 'reviewing'}]) == []
+
+
+def test_unknown_tenant_gets_default_cursor():
+    storage = StateStorage(':memory:')
+    cursor, alerts = storage.restore(
+        'chat', HomeworkStateStore(), default=42)
+    assert (cursor, alerts) == (42, '')
+
+
+def test_writes_are_batched(tmp_path):
+    storage = StateStorage(
+        str(tmp_path / 'state.db'), flush_interval=3600, batch_size=3)
+    for tenant in ('a', 'b'):
+        storage.remember(tenant, 1, '', HomeworkStateStore())
+    assert storage._cursors
+    storage.remember('c', 1, '', HomeworkStateStore())
+    assert not storage._cursors
+    storage.close()
+
+
+def test_warm_start_is_fast(tmp_path):
+    path = str(tmp_path / 'state.db')
+    storage = StateStorage(path, flush_interval=3600, batch_size=10 ** 6)
+    for tenant in range(1000):
+        state = HomeworkStateStore()
+        for work in range(10):
+            state.commit({'id': work, 'status': 'approved'})
+        storage.remember(str(tenant), tenant, '', state)
+    storage.close()
+    started = time.monotonic()
+    loaded = StateStorage(path).load()
+    assert len(loaded) == 1000
+    assert time.monotonic() - started < 2
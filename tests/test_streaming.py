@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+import homework
+import streaming
+
+
+def chunks(data, size):
+    raw = json.dumps(data, ensure_ascii=False).encode()
+    return [raw[index:index + size] for index in range(0, len(raw), size)]
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 4096])
+def test_decode_matches_json_with_projection(size):
+    data = {
+        'homeworks': [
+            {
+                'id': index,
+                'homework_name': f'Работа {index}',
+                'status': 'approved',
+                'reviewer_comment': 'Всё нравится' * 10,
+                'date_updated': '2023-01-01T00:00:00Z',
+                'lesson_name': 'Итоговый проект',
+            }
+            for index in range(5)
+        ],
+        'current_date': 1234567890,
+    }
+    answer = streaming.decode_answer(chunks(data, size))
+    assert answer['current_date'] == 1234567890
+    assert answer['homeworks'] == [
+        {field: work[field] for field in streaming.HOMEWORK_FIELDS}
+        for work in data['homeworks']
+    ]
+    assert homework.check_response(answer) == answer['homeworks']
+
+
+def test_envelope_errors_are_kept():
+    data = {'code': 'not_authenticated', 'message': 'Нет данных'}
+    answer = streaming.decode_answer(chunks(data, 2))
+    assert answer == {'code': 'not_authenticated'}
+    with pytest.raises(KeyError):
+        homework.check_response(answer)
+
+
+def test_invalid_shapes_are_rejected():
+    with pytest.raises(TypeError):
+        streaming.decode_answer(chunks([{'homeworks': []}], 2))
+    answer = streaming.decode_answer(
+        chunks({'homeworks': {'status': 'approved'}}, 2))
+    with pytest.raises(TypeError):
+        homework.check_response(answer)
+    with pytest.raises(ValueError):
+        streaming.decode_answer([b'{"homeworks": [1, 2'])
+
+
+def test_iter_answer_yields_homeworks_one_by_one():
+    data = {'current_date': 1, 'homeworks': [{'id': 1}, {'id': 2}]}
+    events = list(streaming.iter_answer(chunks(data, 5)))
+    assert events == [
+        ('current_date', 1),
+        ('homework', {'id': 1}),
+        ('homework', {'id': 2}),
+        ('homeworks', None),
+    ]
@@ -0,0 +1,207 @@
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+import pytest
+
+import engine
+import supervisor
+from health import LoopHealth
+from outbox import TelegramOutbox
+from profiling import CycleProfiler
+from storage import StateStorage
+from supervisor import HashRing, ShardWorker, Supervisor, merge_metrics
+from tenants import TenantRegistry
+from test_engine import FakeTransport, RecordingBot, make_engine, mock_get
+
+NAMES = [f'tenant-{index}' for index in range(1000)]
+
+
+@pytest.fixture(autouse=True)
+def routes(monkeypatch):
+    """Супервизор подменяет маршруты служебного сервера на время теста."""
+    monkeypatch.setattr(
+        supervisor.status_server, 'ROUTES',
+        dict(supervisor.status_server.ROUTES))
+
+
+def item(name):
+    return {'name': name, 'token': f'token-{name}', 'chat_id': name}
+
+
+def fake_worker(shard, items, snapshots, commands, reports,
+                report_interval, processes):
+    polling = make_engine(RecordingBot(), 0, mock_get(lambda headers: []))
+    worker = ShardWorker(
+        shard, polling, commands, reports, {}, report_interval)
+    worker.assign(items, snapshots)
+    worker.run()
+
+
+def test_ring_moves_only_a_fraction_of_tenants():
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+    moved = sum(
+        before.shard_for(name) != after.shard_for(name) for name in NAMES)
+    assert moved < len(NAMES) * 0.35
+    sizes = [len(names) for names in after.assign(NAMES).values()]
+    assert min(sizes) > len(NAMES) / 5 * 0.5
+    after.remove(4)
+    assert all(
+        before.shard_for(name) == after.shard_for(name) for name in NAMES)
+
+
+def test_merge_metrics_labels_shards():
+    text = (
+        '# HELP requests Requests\n# TYPE requests counter\n'
+        'requests{stage="a"} 1\nrequests_plain 2\n')
+    merged = merge_metrics({0: text, 1: text})
+    assert merged.count('# HELP requests') == 1
+    assert 'requests{shard="0",stage="a"} 1' in merged
+    assert 'requests_plain{shard="1"} 2' in merged
+
+
+def test_shard_worker_hands_over_state():
+    commands, reports = queue.Queue(), queue.Queue()
+    polling = make_engine(RecordingBot(), 0, mock_get(lambda headers: [
+        {'id': 1, 'homework_name': 'hw', 'status': 'approved'}]))
+    worker = ShardWorker(0, polling, commands, reports, {}, 60)
+    worker.assign({'a': item('a'), 'b': item('b')}, {})
+    commands.put(('assign', {'b': item('b')}, {}))
+    assert worker.step()
+    assert reports.get_nowait()[0] == 'health'
+    assert polling.registry.get('b').timestamp == 100
+    kind, shard, released = reports.get_nowait()
+    assert (kind, list(released)) == ('released', ['a'])
+    other = ShardWorker(1, make_engine(RecordingBot(), 0, mock_get(
+        lambda headers: [])), queue.Queue(), queue.Queue(), {}, 60)
+    other.assign({'a': item('a')}, released)
+    assert other.engine.registry.get('a').homeworks.status(1) == 'approved'
+    commands.put(('stop', None, None))
+    assert not worker.step()
+    assert list(reports.get_nowait()[2]) == ['b']
+
+
+def test_supervisor_rebalances_processes():
+    items = {name: item(name) for name in NAMES[:60]}
+    shards = Supervisor(
+        items, 2, context=multiprocessing.get_context('spawn'),
+        report_interval=0.1, target=fake_worker).start()
+    try:
+        moved = shards.rebalance(3)
+        assert 0 < moved < len(items)
+        assert sorted(shards.workers) == [0, 1, 2]
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            shards.handle(shards.reports.get(timeout=30))
+            if len(shards.health) == 3 and sum(
+                    report['tenants']
+                    for report in shards.health.values()) == len(items):
+                break
+        assert sum(
+            report['tenants'] for report in shards.health.values()
+        ) == len(items)
+        status, _, body = shards.render_workers()
+        assert status == 200 and '"alive": true' in body
+        assert 'shard="2"' in shards.render_metrics()[2]
+        shards.rebalance(1)
+        assert list(shards.workers) == [0]
+        assert shards.assignment[0] == set(items)
+    finally:
+        shards.close()
+    assert supervisor.status_server.ROUTES['/workers']
+
+
+def test_shard_worker_splits_send_rate_and_marks_cycles(monkeypatch):
+    loop = LoopHealth()
+    monkeypatch.setattr(supervisor, 'HEALTH', loop)
+    commands, reports = queue.Queue(), queue.Queue()
+    polling = make_engine(RecordingBot(), 0, mock_get(lambda headers: []))
+    polling.outbox = TelegramOutbox(RecordingBot(), global_rate=30)
+    worker = ShardWorker(0, polling, commands, reports, {}, 60)
+    worker.assign({'a': item('a')}, {})
+    commands.put(('resize', 3, None))
+    assert worker.step()
+    polling.close()
+    assert polling.outbox.global_bucket.rate == supervisor.GLOBAL_RATE / 3
+    assert loop.last_cycle_at is not None
+    assert loop.cycle_started_at is None
+
+
+def test_shard_worker_profiles_requested_steps(monkeypatch, tmp_path):
+    profiler = CycleProfiler(str(tmp_path))
+    monkeypatch.setattr(supervisor, 'PROFILER', profiler)
+    commands, reports = queue.Queue(), queue.Queue()
+    polling = make_engine(RecordingBot(), 0, mock_get(lambda headers: []))
+    worker = ShardWorker(0, polling, commands, reports, {}, 60)
+    worker.assign({'a': item('a')}, {})
+    commands.put(('profile', 1, None))
+    commands.put(('resize', 1, None))
+    assert worker.step() and worker.step()
+    polling.close()
+    assert not profiler.active
+    assert f'profile-{profiler.stamp}.prof' in os.listdir(tmp_path)
+
+
+def test_supervisor_forwards_profile_requests(monkeypatch):
+    profiler = CycleProfiler()
+    monkeypatch.setattr(supervisor, 'PROFILER', profiler)
+    shards = Supervisor({}, 2, target=fake_worker)
+    shards.workers = {shard: (None, queue.Queue()) for shard in (0, 1)}
+    assert shards.forward_profile() == 0
+    profiler.request(2)
+    assert shards.forward_profile() == 2
+    assert profiler.requested == 0
+    assert [commands.get_nowait() for _, commands in shards.workers.values()
+            ] == [('profile', 2, None)] * 2
+
+
+def test_restarted_shard_restores_state_from_storage(tmp_path):
+    path = str(tmp_path / 'state.db')
+    get = mock_get(lambda headers: [
+        {'id': 1, 'homework_name': 'hw', 'status': 'approved'}])
+
+    def start_worker():
+        polling = engine.PollingEngine(
+            RecordingBot(), TenantRegistry(), workers=1,
+            transport=FakeTransport(get), storage=StateStorage(path))
+        worker = ShardWorker(0, polling, queue.Queue(), queue.Queue(), {}, 0)
+        worker.assign({'a': item('a')}, {})
+        return worker
+
+    crashed = start_worker()
+    assert crashed.step()
+    crashed.engine.close()
+    restarted = start_worker()
+    tenant = restarted.engine.registry.get('a')
+    restarted.engine.close()
+    assert tenant.timestamp == 100
+    assert tenant.homeworks.status(1) == 'approved'
+
+
+def test_supervisor_health_flags_silent_and_stalled_shards():
+    class Process:
+        def __init__(self, alive=True):
+            self.alive = alive
+
+        def is_alive(self):
+            return self.alive
+
+    shards = Supervisor({}, 0)
+    now = time.time()
+    shards.workers = {0: (Process(), None), 1: (Process(), None)}
+    shards.health = {0: {'updated': now}, 1: {'updated': now}}
+    status, _, body = shards.render_health()
+    assert status == 200
+    shards.health[1]['updated'] = now - supervisor.SHARD_REPORT_TIMEOUT - 1
+    status, _, body = shards.render_health()
+    problems = json.loads(body)['shards']
+    assert status == 503
+    assert problems['0'] is None and 'нет отчёта' in problems['1']
+    shards.health[1] = {'updated': now, 'stall': 'цикл опроса идёт 400 с'}
+    shards.workers[0] = (Process(alive=False), None)
+    problems = json.loads(shards.render_health()[2])['shards']
+    assert problems == {
+        '0': supervisor.SHARD_DEAD_REASON, '1': 'цикл опроса идёт 400 с'}
@@ -0,0 +1,91 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import engine
+import homework
+import utils
+from transport import PooledTransport
+
+
+class HomeworkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({
+            'path': self.path,
+            'authorization': self.headers.get('Authorization'),
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_transport_reuses_connections():
+    transport = PooledTransport(pool_maxsize=2)
+    headers = {'Authorization': 'OAuth token'}
+    with utils.LocalHTTPServer(HomeworkHandler) as server:
+        for from_date in range(5):
+            response = transport.get(
+                server.url + '/api/', headers=headers,
+                params={'from_date': from_date}, timeout=5)
+            data = response.json()
+            assert data['path'] == f'/api/?from_date={from_date}'
+            assert data['authorization'] == 'OAuth token'
+        stats = transport.stats()
+        transport.close()
+    assert stats['requests'] == 5
+    assert stats['connections_opened'] == 1
+    assert stats['connections_reused'] == 4
+
+
+def test_transport_caches_prepared_request_per_token():
+    transport = PooledTransport()
+    first = transport.prepare(
+        'http://example.com/', {'Authorization': 'OAuth a'}, {'from_date': 1})
+    second = transport.prepare(
+        'http://example.com/', {'Authorization': 'OAuth a'}, {'from_date': 2})
+    assert first.url.endswith('from_date=1')
+    assert second.url.endswith('from_date=2')
+    assert len(transport._prepared) == 1
+    transport.forget({'Authorization': 'OAuth a'})
+    assert not transport._prepared
+
+
+class UnauthorizedHandler(HomeworkHandler):
+    def do_GET(self):
+        body = b'{"code": "not_authenticated"}'
+        self.send_response(401)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_streamed_error_responses_return_connections(monkeypatch):
+    monkeypatch.setattr(engine, 'STREAM_RESPONSES', True)
+    transport = PooledTransport(pool_maxsize=2)
+    failures = []
+
+    def poll():
+        for _ in range(4):
+            try:
+                homework.request_api_answer(
+                    0, {'Authorization': 'OAuth bad'},
+                    **engine.request_options(transport))
+            except RuntimeError as error:
+                failures.append(error)
+
+    with utils.LocalHTTPServer(UnauthorizedHandler) as server:
+        monkeypatch.setattr(homework, 'ENDPOINT', server.url + '/api/')
+        worker = threading.Thread(target=poll, daemon=True)
+        worker.start()
+        worker.join(5)
+        transport.close()
+    assert not worker.is_alive()
+    assert len(failures) == 4
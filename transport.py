@@ -0,0 +1,82 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+import requests
+from requests.adapters import HTTPAdapter
+
+load_dotenv()
+
+POOL_CONNECTIONS = int(os.getenv('POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.getenv('POOL_MAXSIZE', 32))
+
+
+class PooledTransport:
+    """Общая keep-alive сессия для запросов к API Практикума.
+
+    Соединения к одному хосту переиспользуются из пула, число одновременных
+    соединений к хосту ограничено pool_maxsize. Подготовленный запрос с
+    заголовками токена кэшируется, на каждом опросе меняется только
+    строка параметров. Метод get совместим с requests.get.
+    """
+
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS,
+                 pool_maxsize: int = POOL_MAXSIZE) -> None:
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._prepared = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, url: str, headers: dict,
+                params: dict) -> requests.PreparedRequest:
+        """Возвращает готовый запрос на основе кэшированного шаблона."""
+        key = (url, tuple(sorted(headers.items())))
+        template = self._prepared.get(key)
+        if template is None:
+            template = self.session.prepare_request(
+                requests.Request('GET', url, headers=headers))
+            with self._lock:
+                template = self._prepared.setdefault(key, template)
+        prepared = template.copy()
+        prepared.prepare_url(url, params)
+        return prepared
+
+    def get(self, url: str, headers: dict = None, params: dict = None,
+            timeout=None, stream: bool = False) -> requests.Response:
+        """Выполняет GET-запрос через пул соединений."""
+        return self.session.send(
+            self.prepare(url, headers or {}, params or {}),
+            timeout=timeout, stream=stream)
+
+    def forget(self, headers: dict) -> None:
+        """Удаляет из кэша шаблоны запросов с указанными заголовками."""
+        items = tuple(sorted(headers.items()))
+        with self._lock:
+            for key in [key for key in self._prepared if key[1] == items]:
+                del self._prepared[key]
+
+    def stats(self) -> dict:
+        """Счётчики открытых и переиспользованных соединений."""
+        pools = self.adapter.poolmanager.pools
+        opened = sent = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return {
+            'requests': sent,
+            'connections_opened': opened,
+            'connections_reused': max(sent - opened, 0),
+        }
+
+    def close(self) -> None:
+        """Закрывает все соединения пула."""
+        self.session.close()